@@ -1,8 +1,10 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .models import ChatMessage
 from courses.models import Lesson
+from .streaming import course_mentor_events, inquiry_events, rag_events
 
 
 class LessonChatConsumer(AsyncWebsocketConsumer):
@@ -76,6 +78,89 @@ class LessonChatConsumer(AsyncWebsocketConsumer):
         return message
 
 
+class MentorChatConsumer(AsyncWebsocketConsumer):
+    """
+    Streams mentor answers over a WebSocket.
+    Send {"mode": "course"|"rag"|"inquiry", "question": ..., "course_id": ..., "module_id": ...};
+    receive {"type": "token", "data": {"text": ...}} frames, then "done" or "error".
+    A new question cancels the one still streaming.
+    """
+    async def connect(self):
+        self.stream_task = None
+        await self.accept()
 
+    async def disconnect(self, close_code):
+        await self.cancel_stream()
 
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            await self.send_event({"event": "error", "reply": "Invalid JSON message.", "type": "error"})
+            return
+
+        events, error = self.mentor_events(data)
+        if error:
+            await self.send_event({"event": "error", "reply": error, "type": "error"})
+            return
+        await self.cancel_stream()
+        self.stream_task = asyncio.ensure_future(self.forward(events))
+
+    def mentor_events(self, data):
+        """(event stream, None) for a valid message, else (None, error reply)"""
+        mode = data.get('mode', 'course')
+        question = data.get('question', '') or data.get('message', '')
+        if not question:
+            return None, "Please provide a question."
+
+        if mode == 'course':
+            course_id = data.get('course_id', '')
+            if not course_id:
+                return None, "Please provide a course_id."
+            user = self.user()
+            return course_mentor_events(user, course_id, data.get('module_id'), question, self.user_key()), None
+        if mode == 'rag':
+            # The RAG engine is loaded once by chat.views
+            from . import views
+            if not views.RAG_MENTOR_AVAILABLE:
+                return None, "Sorry, the mentor is currently unavailable. Please check if Ollama is running and the model is installed."
+            return rag_events(question, views.stream_rag_response, self.user_key()), None
+        if mode == 'inquiry':
+            return inquiry_events(question, self.user_key()), None
+        return None, f"Unknown mode '{mode}'."
+
+    def user(self):
+        user = self.scope.get('user')
+        return user if user is not None and user.is_authenticated else None
+
+    def user_key(self):
+        """Fairness key for the LLM queue, as in llm_queue.user_key_for"""
+        user = self.user()
+        if user is not None:
+            return f"user:{user.pk}"
+        client = self.scope.get('client') or ('',)
+        return f"ip:{client[0]}"
+
+    async def forward(self, events):
+        try:
+            async for event in events:
+                await self.send_event(event)
+        finally:
+            await events.aclose()
+
+    async def send_event(self, event):
+        data = dict(event)
+        await self.send(text_data=json.dumps({
+            'type': data.pop('event'),
+            'data': data
+        }))
 
+    async def cancel_stream(self):
+        task = self.stream_task
+        self.stream_task = None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
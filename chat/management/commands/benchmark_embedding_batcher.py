@@ -0,0 +1,115 @@
+"""
+Management command to benchmark micro-batched query embedding
+Run: python manage.py benchmark_embedding_batcher [--threads 16] [--queries 20]
+
+Compares one encode() call per query against EmbeddingBatcher under
+concurrent load, and the latency of a single query with nothing else
+running. Uses the RAG mentor's SentenceTransformer when it is installed;
+otherwise (or with --simulate) an encoder that takes a fixed cost per call
+plus a cost per text, one call at a time like a CPU-bound model that
+already uses every core.
+"""
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from mentor_engine import mentor
+from mentor_engine.embedding_batcher import EmbeddingBatcher
+
+SAMPLE_QUESTIONS = [
+    "What is a SIP?", "How much should I keep in an emergency fund?", "Is a credit card bad?",
+    "What does diversification mean?", "How do index funds work?", "What is inflation?",
+    "Should I pay off debt or invest first?", "How does compound interest grow money?",
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare per-query encode() with the micro-batching embedding worker under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent requesters')
+        parser.add_argument('--queries', type=int, default=20, help='Queries per requester')
+        parser.add_argument('--max-batch', type=int, default=32)
+        parser.add_argument('--max-wait-ms', type=float, default=5.0)
+        parser.add_argument('--simulate', action='store_true', help='Use the simulated encoder even if the model is installed')
+        parser.add_argument('--call-ms', type=float, default=8.0, help='Simulated fixed cost per encode() call')
+        parser.add_argument('--text-ms', type=float, default=0.6, help='Simulated cost per text in a call')
+
+    def handle(self, *args, **options):
+        encode_batch = self._encoder(options)
+        direct = self._load(lambda text: encode_batch([text])[0], options)
+        batcher = EmbeddingBatcher(encode_batch, options['max_batch'], options['max_wait_ms'])
+        batched = self._load(batcher.encode, options)
+
+        self.stdout.write(f"{len(direct[1])} queries from {options['threads']} threads")
+        for label, (rate, latencies) in (('per-query encode', direct), ('micro-batched', batched)):
+            self.stdout.write(
+                f'  {label:17s} {rate:8.1f} embeddings/s   '
+                f'p50 {self._pct(latencies, 50):6.1f} ms   p95 {self._pct(latencies, 95):6.1f} ms'
+            )
+        self.stdout.write(f"  batches: {batcher.stats()}")
+        self.stdout.write(self.style.SUCCESS(f'  throughput x{batched[0] / direct[0]:.1f}'))
+
+        # Single-request latency: one query at a time
+        solo_direct = self._solo(lambda text: encode_batch([text])[0])
+        solo_batched = self._solo(batcher.encode)
+        self.stdout.write(
+            f'Single query (idle): direct {solo_direct:.2f} ms, batched {solo_batched:.2f} ms '
+            f'(+{solo_batched - solo_direct:.2f} ms)'
+        )
+
+    def _encoder(self, options):
+        if not options['simulate'] and mentor.dependencies_installed():
+            model = mentor.get_embed_model()
+            model.encode("warm up")
+            self.stdout.write(f'Encoder: {mentor.MODEL_NAME}')
+            return lambda texts: model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+
+        call_s, text_s = options['call_ms'] / 1000, options['text_ms'] / 1000
+        self.stdout.write(self.style.WARNING(
+            f"Encoder: simulated ({options['call_ms']} ms per call + {options['text_ms']} ms per text)"
+        ))
+
+        busy = threading.Lock()
+
+        def encode(texts):
+            with busy:
+                time.sleep(call_s + text_s * len(texts))
+            return [[float(len(text)), 1.0] for text in texts]
+        return encode
+
+    def _load(self, encode, options):
+        latencies = []
+        lock = threading.Lock()
+
+        def requester(t):
+            for i in range(options['queries']):
+                text = f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} (user {t}, #{i})"
+                started = time.perf_counter()
+                encode(text)
+                with lock:
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+        threads = [threading.Thread(target=requester, args=(t,)) for t in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(latencies) / (time.perf_counter() - started), latencies
+
+    @staticmethod
+    def _solo(encode, runs=20):
+        latencies = []
+        for i in range(runs):
+            started = time.perf_counter()
+            encode(f"solo question {i}")
+            latencies.append((time.perf_counter() - started) * 1000)
+        return statistics.median(latencies)
+
+    @staticmethod
+    def _pct(values, pct):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * pct / 100))]
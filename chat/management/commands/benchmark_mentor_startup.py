@@ -0,0 +1,82 @@
+"""
+Management command to measure process startup cost of the mentor engines
+Run: python manage.py benchmark_mentor_startup [--runs 3]
+
+Each scenario runs in a fresh Python process so import caches don't leak
+between measurements:
+  lazy   - django.setup() and import chat.views (what migrate/any command pays now)
+  eager  - the same, then load the vector DB and embedding model
+           (what every process paid when mentor.py loaded them at import time)
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCENARIO_SCRIPT = """
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wealthplay.settings')
+import django
+django.setup()
+import chat.views
+result = {'import': time.perf_counter() - started}
+if sys.argv[1] == 'eager':
+    from mentor_engine import mentor
+    if not mentor.dependencies_installed():
+        result['error'] = 'chromadb and sentence-transformers are not installed'
+    else:
+        try:
+            mentor.warm()
+        except Exception as e:
+            result['error'] = str(e)
+result['total'] = time.perf_counter() - started
+print(json.dumps(result))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Compare process startup time with lazy vs eager loading of the RAG mentor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes per scenario (median is reported)')
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+        medians = {}
+        for scenario in ('lazy', 'eager'):
+            totals = []
+            error = None
+            for _ in range(runs):
+                result = self._run(scenario)
+                if 'error' in result:
+                    error = result['error']
+                    break
+                totals.append(result['total'])
+            if error:
+                self.stdout.write(self.style.WARNING(f'{scenario:6s} skipped: {error}'))
+                continue
+            medians[scenario] = statistics.median(totals)
+            self.stdout.write(
+                f'{scenario:6s} median {medians[scenario]:.2f}s  '
+                f'(min {min(totals):.2f}s, max {max(totals):.2f}s, {runs} runs)'
+            )
+
+        if len(medians) == 2:
+            saved = medians['eager'] - medians['lazy']
+            self.stdout.write(self.style.SUCCESS(
+                f'Lazy loading saves {saved:.2f}s per process that never answers a RAG question'
+            ))
+
+    def _run(self, scenario):
+        completed = subprocess.run(
+            [sys.executable, '-c', SCENARIO_SCRIPT, scenario],
+            cwd=settings.BASE_DIR, capture_output=True, text=True
+        )
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            return {'error': (completed.stderr.strip().splitlines() or ['process failed'])[-1]}
+        return json.loads(lines[-1])
@@ -0,0 +1,285 @@
+"""
+Management command to benchmark the mentors offline
+Run: python manage.py benchmark_mentors [--output report.json] [--baseline old_report.json]
+
+Replays the fixed Q&A questions the course mentor serves, i.e. every
+module's Q&A in course_mentor.get_course_index() (verbatim, plus seeded
+variants with typos, truncation and rephrasing, plus off-topic questions)
+through:
+- fixed_qna: course_mentor.fuzzy_match_q against the module's Q&A matcher
+  that mentor_respond uses
+- course_mentor: course_mentor.mentor_respond end to end
+- retrieval: the RAG mentor's retrieve() (BM25 over the same chunks when
+  the embedding model or the index is not installed)
+- rag_mentor: mentor.generate_response, when the RAG mentor can load
+- nex_mentor: cursor's NexMentorEngine "explain" responses
+
+The LLM is a local stub that sleeps --llm-ms and the answer cache is
+bypassed, so numbers are reproducible and only measure our code. Reports
+p50/p95/p99 latency per stage, the fixed Q&A hit rate, the off-topic false
+match rate and retrieval recall@k, and writes them as JSON. With --baseline
+the run is compared with an earlier report and the command fails if any
+stage regressed.
+"""
+import json
+import platform
+import random
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.management.commands.benchmark_question_matcher import OFF_TOPIC_QUESTIONS, make_queries
+from cursor.mentor_engine import NexMentorEngine
+from mentor_engine import course_mentor, mentor, ollama_client
+from mentor_engine.bm25 import BM25Index
+from mentor_engine.mentor_index import build_chunks
+
+STUB_ANSWER = "• This is a stubbed mentor answer used for benchmarking."
+
+# A p95 this much slower than the baseline (and at least LATENCY_MIN_DELTA_MS
+# slower, so sub-millisecond jitter doesn't count), or a rate this much lower,
+# is a regression
+LATENCY_TOLERANCE = 0.20
+LATENCY_MIN_DELTA_MS = 0.5
+RATE_TOLERANCE = 0.01
+
+
+def percentiles(values_ms):
+    values = sorted(values_ms)
+    if not values:
+        return {"count": 0}
+
+    def pct(p):
+        return round(values[min(len(values) - 1, int(len(values) * p / 100))], 3)
+    return {
+        "count": len(values),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "mean": round(sum(values) / len(values), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Offline latency and quality benchmark of the fixed Q&A, RAG and Nex mentors with a stubbed LLM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='mentor_benchmark.json', help='Where to write the JSON report')
+        parser.add_argument('--baseline', help='Earlier report to compare against')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed for question variants')
+        parser.add_argument('--per-module', type=int, default=0, help='Max Q&A per module (0: all)')
+        parser.add_argument('--llm-ms', type=float, default=0.0, help='Simulated LLM latency per call')
+        parser.add_argument('--cutoff', type=float, default=0.7, help='fuzzy_match_q cutoff')
+        parser.add_argument('-k', type=int, default=mentor.TOP_K, help='Retrieval depth for recall@k')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        cases = self._cases(rng, options['per_module'])
+        if not cases:
+            raise CommandError('The course mentor serves no fixed Q&A')
+        self.stdout.write(f"{len(cases)} questions from {len({(c['course_id'], c['module_id']) for c in cases})} modules")
+
+        timings = {}
+        quality = {}
+        with ExitStack() as stack:
+            self._stub_llm(stack, options['llm_ms'])
+            quality.update(self._fixed_qna(cases, options['cutoff'], timings))
+            self._course_mentor(cases, timings, quality)
+            quality.update(self._retrieval(cases, options['k'], timings))
+            self._rag_mentor(cases, timings, quality)
+            self._nex_mentor(cases, timings)
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "options": {name: options[name] for name in ('seed', 'per_module', 'llm_ms', 'cutoff', 'k')},
+            "questions": len(cases),
+            "latency_ms": {stage: percentiles(values) for stage, values in timings.items()},
+            "quality": quality,
+        }
+        self._print(report)
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Report written to {output}'))
+
+        if options['baseline']:
+            self._compare(report, options['baseline'])
+
+    # --- question set ---
+
+    def _cases(self, rng, per_module):
+        index = course_mentor.get_course_index()
+        cases = []
+        for course_id, module_id in index.modules:
+            matcher = index.qna_matcher(course_id, module_id)
+            if matcher is None:
+                continue
+            qna = [qa for qa in matcher.qna if qa.get('q')]
+            for qa in qna[:per_module or None]:
+                for variant, text in zip(('exact', 'lower', 'typos', 'truncated', 'rephrased'), make_queries(qa['q'], rng)):
+                    cases.append({
+                        "course_id": course_id,
+                        "module_id": module_id,
+                        "expected": qa,
+                        "variant": variant,
+                        "question": text,
+                    })
+            for text in OFF_TOPIC_QUESTIONS[:2]:
+                cases.append({
+                    "course_id": course_id,
+                    "module_id": module_id,
+                    "expected": None,
+                    "variant": "off_topic",
+                    "question": text,
+                })
+        return cases
+
+    # --- stages ---
+
+    def _stub_llm(self, stack, llm_ms):
+        """Replace every Ollama call with a local stub and bypass the answer cache"""
+        def stub(*args, **kwargs):
+            if llm_ms:
+                time.sleep(llm_ms / 1000)
+            return {"message": {"content": STUB_ANSWER}}
+
+        stack.enter_context(mock.patch.object(ollama_client, 'chat', side_effect=stub))
+        stack.enter_context(mock.patch.object(ollama_client, 'resolve_model', side_effect=lambda model, host=None: model))
+        stack.enter_context(mock.patch.object(course_mentor, 'get_answer_cache', return_value=None))
+
+    @staticmethod
+    def _timed(timings, stage, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.setdefault(stage, []).append((time.perf_counter() - started) * 1000)
+        return result
+
+    def _fixed_qna(self, cases, cutoff, timings):
+        index = course_mentor.get_course_index()
+        hits = on_topic = false_matches = off_topic = 0
+        by_variant = {}
+        for case in cases:
+            matcher = index.qna_matcher(case['course_id'], case['module_id'])
+            match = self._timed(timings, 'fixed_qna', course_mentor.fuzzy_match_q, matcher, case['question'], cutoff)
+            if case['expected'] is None:
+                off_topic += 1
+                false_matches += match is not None
+                continue
+            hit = match is not None and match.get('q') == case['expected']['q']
+            on_topic += 1
+            hits += hit
+            counts = by_variant.setdefault(case['variant'], [0, 0])
+            counts[0] += hit
+            counts[1] += 1
+        return {
+            "fixed_qna_hit_rate": round(hits / on_topic, 4) if on_topic else 0.0,
+            "fixed_qna_hit_rate_by_variant": {v: round(h / n, 4) for v, (h, n) in by_variant.items()},
+            "off_topic_false_match_rate": round(false_matches / off_topic, 4) if off_topic else 0.0,
+        }
+
+    def _course_mentor(self, cases, timings, quality):
+        answer_types = {}
+        for case in cases:
+            result = self._timed(
+                timings, 'course_mentor', course_mentor.mentor_respond,
+                case['course_id'], case['module_id'], case['question'], 'benchmark'
+            )
+            answer_types[result.get('type')] = answer_types.get(result.get('type'), 0) + 1
+        quality["course_mentor_answer_types"] = answer_types
+
+    def _retrieval(self, cases, k, timings):
+        """recall@k: share of on-topic questions whose own Q&A chunk is retrieved"""
+        chunks = build_chunks(mentor.MODEL_NAME)
+        search, retriever_name = self._retriever(chunks, k)
+        self.retriever_name = retriever_name
+        if search is None:
+            return {"retriever": retriever_name}
+
+        qna_chunks = [chunk for chunk in chunks if chunk.metadata.get('kind') == 'qna']
+        relevant = {}
+
+        hits = total = 0
+        for case in cases:
+            ids = {chunk.id for chunk in self._timed(timings, 'retrieval', search, case['question'])}
+            if case['expected'] is None:
+                continue
+            question = case['expected']['q']
+            if question not in relevant:
+                # The Q&A's own chunk(s), from course_modules and course_content.json
+                relevant[question] = {c.id for c in qna_chunks if c.text.startswith(f"Q: {question} A:")}
+            wanted = relevant[question]
+            if wanted:
+                total += 1
+                hits += bool(ids & wanted)
+        return {"retriever": retriever_name, f"retrieval_recall@{k}": round(hits / total, 4) if total else 0.0}
+
+    def _retriever(self, chunks, k):
+        if mentor.dependencies_installed():
+            try:
+                mentor.get_retriever()
+                return (lambda question: mentor.retrieve(question, k)[0]), mentor.get_retriever().name
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'RAG index unavailable ({e}), using BM25 only'))
+        else:
+            self.stdout.write(self.style.WARNING('Embedding model not installed, retrieval uses BM25 only'))
+        if not chunks:
+            return None, "none"
+        index = BM25Index.build([c.id for c in chunks], [c.text for c in chunks], [c.metadata for c in chunks])
+        return (lambda question: index.search(question, k)), "bm25 (in memory)"
+
+    def _rag_mentor(self, cases, timings, quality):
+        if self.retriever_name.startswith('bm25 (') or self.retriever_name == 'none':
+            quality["rag_mentor"] = "skipped: RAG mentor could not load"
+            return
+        for case in cases:
+            self._timed(timings, 'rag_mentor', mentor.generate_response, case['question'], 'benchmark')
+
+    def _nex_mentor(self, cases, timings):
+        engine = NexMentorEngine()
+        for case in cases:
+            self._timed(timings, 'nex_mentor', engine.generate_response, {
+                "action": "explain",
+                "lesson_id": f"{case['course_id']}_{case['module_id']}",
+                "user_message": case['question'],
+            })
+
+    # --- output ---
+
+    def _print(self, report):
+        for stage, stats in report['latency_ms'].items():
+            if stats['count']:
+                self.stdout.write(
+                    f"  {stage:14s} p50 {stats['p50']:8.3f} ms   p95 {stats['p95']:8.3f} ms   "
+                    f"p99 {stats['p99']:8.3f} ms   (n={stats['count']})"
+                )
+        for name, value in report['quality'].items():
+            self.stdout.write(f'  {name}: {value}')
+
+    def _compare(self, report, baseline_path):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read baseline {baseline_path}: {e}')
+
+        regressions = []
+        for stage, stats in report['latency_ms'].items():
+            old = baseline.get('latency_ms', {}).get(stage, {})
+            new = stats.get('p95', 0)
+            if old.get('p95') and new > old['p95'] * (1 + LATENCY_TOLERANCE) and new - old['p95'] >= LATENCY_MIN_DELTA_MS:
+                regressions.append(f"{stage} p95 {old['p95']} -> {stats['p95']} ms")
+        for name, value in report['quality'].items():
+            old = baseline.get('quality', {}).get(name)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)):
+                worse = value > old + RATE_TOLERANCE if name.startswith('off_topic') else value < old - RATE_TOLERANCE
+                if worse:
+                    regressions.append(f'{name} {old} -> {value}')
+
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n' + '\n'.join(f'  {line}' for line in regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
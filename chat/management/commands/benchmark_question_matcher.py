@@ -0,0 +1,140 @@
+"""
+Management command to benchmark QuestionMatcher against the old difflib scan
+Run: python manage.py benchmark_question_matcher
+"""
+import difflib
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.load_from_folders import load_courses_from_folders
+from mentor_engine.question_matcher import QuestionMatcher
+
+OFF_TOPIC_QUESTIONS = [
+    "How do I reset my password?",
+    "What time does the market open on Saturday?",
+    "Can you recommend a good laptop for work?",
+    "Is it going to rain tomorrow?",
+    "Tell me a joke about accountants",
+]
+
+
+def difflib_match(fixed_qna, user_q, cutoff=0.7):
+    """The original linear scan from course_mentor.fuzzy_match_q"""
+    if not fixed_qna:
+        return None
+
+    best = None
+    best_score = 0
+
+    for qa in fixed_qna:
+        q = qa.get("q", "").lower()
+        score = difflib.SequenceMatcher(None, q, user_q.lower()).ratio()
+        if score > best_score:
+            best_score = score
+            best = qa
+
+    return best if best_score >= cutoff else None
+
+
+def add_typos(text, rng, count=2):
+    chars = list(text)
+    for _ in range(min(count, len(chars))):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice('abcdefghijklmnopqrstuvwxyz ')
+    return ''.join(chars)
+
+
+def make_queries(question, rng):
+    """Variants a learner might type for one fixed question"""
+    words = question.split()
+    return [
+        question,
+        question.lower().rstrip('?'),
+        add_typos(question, rng),
+        ' '.join(words[:max(3, len(words) * 2 // 3)]),
+        'can you explain ' + question.lower(),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the indexed fixed Q&A matcher against a difflib scan over course_modules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cutoff', type=float, default=0.7, help='Match cutoff (default 0.7)')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed for query variants')
+        parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        cutoff = options['cutoff']
+
+        modules = []
+        for course in load_courses_from_folders():
+            for module in course.get('modules', []):
+                qna = [qa for qa in module.get('fixed_qna', []) if isinstance(qa, dict) and qa.get('q')]
+                if qna:
+                    modules.append((f"{course['id']}/{module['id']}", qna))
+        if not modules:
+            raise CommandError('No Q&A found under course_modules')
+
+        corpus = [qa for _, qna in modules for qa in qna]
+        self.stdout.write(f'Corpus: {len(corpus)} questions in {len(modules)} modules')
+
+        # Per-module workload: each module's own questions plus off-topic noise
+        per_module = []
+        for _, qna in modules:
+            queries = [v for qa in qna for v in make_queries(qa['q'], rng)] + OFF_TOPIC_QUESTIONS
+            per_module.append((qna, queries))
+
+        # Whole-corpus workload: one pooled matcher over every question
+        pooled_queries = [v for qa in corpus for v in make_queries(qa['q'], rng)[2:4]] + OFF_TOPIC_QUESTIONS
+
+        started = time.perf_counter()
+        module_matchers = [QuestionMatcher(qna) for qna, _ in per_module]
+        pooled_matcher = QuestionMatcher(corpus)
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(f'Index build: {build_ms:.1f} ms for {len(module_matchers) + 1} matchers')
+
+        self._run(
+            'per-module',
+            lambda: [difflib_match(qna, q, cutoff) for qna, queries in per_module for q in queries],
+            lambda: [m.match(q, cutoff) for m, (_, queries) in zip(module_matchers, per_module) for q in queries],
+            options['repeat'],
+        )
+        self._run(
+            'whole-corpus',
+            lambda: [difflib_match(corpus, q, cutoff) for q in pooled_queries],
+            lambda: [pooled_matcher.match(q, cutoff) for q in pooled_queries],
+            options['repeat'],
+        )
+
+    def _run(self, label, baseline, indexed, repeat):
+        baseline_s, expected = self._time(baseline, repeat)
+        indexed_s, actual = self._time(indexed, repeat)
+
+        mismatches = sum(1 for a, b in zip(expected, actual) if a is not b)
+        hits = sum(1 for r in actual if r is not None)
+        per_query_baseline = baseline_s / len(expected) * 1e6
+        per_query_indexed = indexed_s / len(actual) * 1e6
+
+        self.stdout.write(f'\n[{label}] {len(actual)} queries, {hits} matched at cutoff')
+        self.stdout.write(f'  difflib scan: {baseline_s * 1000:9.1f} ms  ({per_query_baseline:8.1f} us/query)')
+        self.stdout.write(f'  matcher:      {indexed_s * 1000:9.1f} ms  ({per_query_indexed:8.1f} us/query)')
+        self.stdout.write(f'  speedup:      {baseline_s / indexed_s:9.1f}x')
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'  {mismatches} results differ from the difflib scan'))
+        else:
+            self.stdout.write(self.style.SUCCESS('  results identical to the difflib scan'))
+
+    @staticmethod
+    def _time(fn, repeat):
+        best = None
+        result = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
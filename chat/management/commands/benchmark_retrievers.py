@@ -0,0 +1,113 @@
+"""
+Management command to compare the RAG mentor's retrieval backends
+Run: python manage.py benchmark_retrievers [--synthetic 50000 --dim 384] [--queries 200]
+
+Measures search latency (p50/p95), index memory and recall@k against exact
+float32 search for the NumPy index in float32 and int8, and for the Chroma
+collection when it is installed. Without --synthetic it uses the index built
+by build_mentor_index --backend numpy and queries with stored chunk
+embeddings plus noise; with --synthetic N it builds throwaway indexes of N
+random vectors.
+"""
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from mentor_engine import mentor
+from mentor_engine.retrievers import (
+    ChromaRetriever, NumpyIndexWriter, NumpyRetriever, normalize_rows, top_k
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark latency, memory and recall of the mentor retrieval backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=0, help='Benchmark N random vectors instead of the built index')
+        parser.add_argument('--dim', type=int, default=384, help='Vector size for --synthetic (all-MiniLM-L6-v2: 384)')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('-k', type=int, default=mentor.TOP_K)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        k = options['k']
+        workdir = tempfile.mkdtemp(prefix='mentor_retrievers_')
+        try:
+            if options['synthetic']:
+                ids, vectors = self._synthetic(rng, options['synthetic'], options['dim'])
+            else:
+                ids, vectors = self._built_index()
+            # Queries near stored chunks, like real questions near their answers
+            picks = rng.integers(0, len(vectors), options['queries'])
+            queries = normalize_rows(vectors[picks] + rng.normal(scale=0.05, size=(len(picks), vectors.shape[1])))
+            exact = normalize_rows(vectors)
+            truth = [set(ids[i] for i in top_k(exact @ q, k)) for q in queries]
+            self.stdout.write(f'{len(ids)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={k}')
+
+            writer = NumpyIndexWriter(workdir, 'int8', mentor.MODEL_NAME)
+            writer.upsert(ids, [''] * len(ids), [{}] * len(ids), vectors)
+            writer.save()
+            retrievers = [
+                ('numpy float32', NumpyRetriever(workdir, dtype='float32')),
+                ('numpy int8', NumpyRetriever(workdir, dtype='int8')),
+            ]
+            chroma = self._chroma(workdir, ids, vectors)
+            if chroma:
+                retrievers.append(('chroma', chroma))
+            else:
+                self.stdout.write(self.style.WARNING('chromadb not installed, skipping the Chroma backend'))
+
+            for label, retriever in retrievers:
+                self._report(label, retriever, queries, truth, k)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _synthetic(self, rng, count, dim):
+        # Clustered like real course chunks (topics), not uniform noise
+        centers = rng.normal(size=(max(1, count // 50), dim))
+        vectors = centers[rng.integers(0, len(centers), count)] + rng.normal(scale=0.6, size=(count, dim))
+        return [f'synthetic-{i}' for i in range(count)], vectors.astype(np.float32)
+
+    def _built_index(self):
+        try:
+            retriever = NumpyRetriever(mentor.NUMPY_INDEX_DIR, dtype='float32')
+        except FileNotFoundError as e:
+            raise CommandError(f'{e} (or pass --synthetic N)')
+        return list(retriever.ids), np.asarray(retriever.matrix, dtype=np.float32)
+
+    def _chroma(self, workdir, ids, vectors):
+        if not mentor.dependencies_installed('chroma'):
+            return None
+        import chromadb
+        collection = chromadb.PersistentClient(path=f'{workdir}/chroma').create_collection('benchmark')
+        normalized = normalize_rows(vectors)
+        for start in range(0, len(ids), 5000):
+            collection.add(
+                ids=ids[start:start + 5000],
+                documents=[''] * len(ids[start:start + 5000]),
+                embeddings=normalized[start:start + 5000].tolist(),
+            )
+        return ChromaRetriever(collection)
+
+    def _report(self, label, retriever, queries, truth, k):
+        retriever.search(queries[0], k)  # page in the memory map / warm the client
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            results = retriever.search(query, k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected & {chunk.id for chunk in results})
+        latencies.sort()
+        memory = f'{retriever.nbytes / 2 ** 20:7.2f} MiB' if hasattr(retriever, 'nbytes') else '    n/a    '
+        self.stdout.write(
+            f'  {label:14s} p50 {self._pct(latencies, 50):7.3f} ms   p95 {self._pct(latencies, 95):7.3f} ms   '
+            f'memory {memory}   recall@{k} {hits / (len(queries) * k):.3f}'
+        )
+
+    @staticmethod
+    def _pct(values, pct):
+        return values[min(len(values) - 1, int(len(values) * pct / 100))]
@@ -0,0 +1,92 @@
+"""
+Management command to build or update the RAG mentor's vector DB
+Run: python manage.py build_mentor_index [--dry-run] [--rebuild] [--backend numpy --dtype int8]
+
+Chunks course_modules/*/*/*.json, financial_course_full_content.json and
+course_content.json, embeds new or changed chunks in batches and upserts
+them into the wealthplay_mentor Chroma collection (or the NumPy index
+with --backend numpy); chunks whose content is gone are deleted. Unchanged
+chunks are not re-embedded. The BM25 keyword index for hybrid retrieval
+(vector_db/bm25_index.json) is rebuilt from the same chunks. Running
+servers see the bumped manifest version and reopen the collection (and the
+BM25 index) on their next query.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mentor_engine import mentor
+from mentor_engine.bm25 import BM25Index
+from mentor_engine.mentor_index import (
+    DEFAULT_CHUNK_CHARS, DEFAULT_OVERLAP_CHARS, build_chunks, bump_version, sync_collection
+)
+from mentor_engine.retrievers import NumpyIndexWriter
+
+
+class Command(BaseCommand):
+    help = 'Chunk course content, embed new/changed chunks and upsert them into the mentor vector DB'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=64, help='Chunks per embedding batch')
+        parser.add_argument('--chunk-chars', type=int, default=DEFAULT_CHUNK_CHARS, help='Max characters per chunk')
+        parser.add_argument('--overlap', type=int, default=DEFAULT_OVERLAP_CHARS, help='Characters of overlap between chunks')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without embedding')
+        parser.add_argument('--rebuild', action='store_true', help='Drop the collection and embed everything again')
+        parser.add_argument('--backend', choices=['chroma', 'numpy'], default=mentor.RETRIEVER_BACKEND,
+                            help='Index to build (default: MENTOR_RETRIEVER backend)')
+        parser.add_argument('--dtype', choices=['float32', 'int8'],
+                            default=mentor.RETRIEVER_CONFIG.get('DTYPE') or 'float32',
+                            help='NumPy index matrix type (int8 is 4x smaller)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunks = build_chunks(mentor.MODEL_NAME, max_chars=options['chunk_chars'], overlap=options['overlap'])
+        sources = {}
+        for chunk in chunks:
+            sources[chunk.metadata['source']] = sources.get(chunk.metadata['source'], 0) + 1
+        self.stdout.write(f'{len(chunks)} chunks from ' + ', '.join(f'{name} ({count})' for name, count in sources.items()))
+
+        backend = options['backend']
+        if not mentor.dependencies_installed(backend):
+            raise CommandError(f'The {backend} mentor index needs packages that are not installed: pip install -r requirements.txt')
+
+        if backend == 'numpy':
+            collection = NumpyIndexWriter(mentor.NUMPY_INDEX_DIR, options['dtype'], mentor.MODEL_NAME)
+            if options['rebuild'] and not options['dry_run']:
+                collection.delete(list(collection.rows))
+        else:
+            client = mentor.get_client()
+            if options['rebuild'] and not options['dry_run']:
+                try:
+                    client.delete_collection(mentor.COLLECTION_NAME)
+                except Exception:
+                    pass
+            collection = client.get_or_create_collection(mentor.COLLECTION_NAME)
+
+        def embed(texts):
+            return mentor.get_embed_model().encode(texts, batch_size=options['batch_size'], show_progress_bar=False)
+
+        def progress(done, total):
+            self.stdout.write(f'  embedded {done}/{total}')
+
+        stats = sync_collection(
+            collection, chunks, embed, batch_size=options['batch_size'], dry_run=options['dry_run'], progress=progress
+        )
+        summary = ', '.join(f'{name}: {count}' for name, count in stats.items())
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run, nothing written. {summary}'))
+            return
+
+        if backend == 'numpy':
+            manifest = collection.save()
+            location = f'NumPy index ({manifest["dtype"]}) in {mentor.NUMPY_INDEX_DIR}'
+        else:
+            manifest = bump_version(mentor.DB_DIR, mentor.COLLECTION_NAME, mentor.MODEL_NAME, stats)
+            location = 'Collection'
+        started_bm25 = time.perf_counter()
+        bm25 = BM25Index.build([c.id for c in chunks], [c.text for c in chunks], [c.metadata for c in chunks])
+        bm25.save(mentor.BM25_INDEX_PATH)
+        self.stdout.write(f'BM25 index: {len(bm25.postings)} terms ({(time.perf_counter() - started_bm25) * 1000:.0f} ms)')
+        self.stdout.write(self.style.SUCCESS(
+            f'{summary}. {location} version {manifest["version"]} ({time.perf_counter() - started:.1f}s)'
+        ))
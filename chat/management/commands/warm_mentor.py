@@ -0,0 +1,23 @@
+"""
+Management command to preload the mentor engines
+Run: python manage.py warm_mentor [--ollama]
+"""
+from django.core.management.base import BaseCommand
+
+from mentor_engine.warmup import warm_mentors
+
+
+class Command(BaseCommand):
+    help = 'Load the course index, RAG vector DB and embedding model (and optionally the Ollama model list)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-rag', action='store_true', help='Do not load the vector DB and embedding model')
+        parser.add_argument('--ollama', action='store_true', help='Also resolve the Ollama model')
+
+    def handle(self, *args, **options):
+        results = warm_mentors(rag=not options['skip_rag'], ollama=options['ollama'])
+        for step, result in results.items():
+            if isinstance(result, float):
+                self.stdout.write(self.style.SUCCESS(f'{step}: {result:.2f}s'))
+            else:
+                self.stdout.write(self.style.WARNING(f'{step}: {result}'))
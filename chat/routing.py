@@ -3,6 +3,7 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/lessons/(?P<lesson_id>\d+)/$', consumers.LessonChatConsumer.as_asgi()),
+    re_path(r'ws/mentor/$', consumers.MentorChatConsumer.as_asgi()),
 ]
 
 
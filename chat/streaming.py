@@ -0,0 +1,171 @@
+"""
+Token streaming for the mentor endpoints
+
+Each mode is an async generator of event dicts ({"event": "token", "text": ...}
+chunks, then one "done" or "error" event). The SSE views and the WebSocket
+consumer only differ in how they write those events out. Course mentor
+answers are saved to TopicChatMessage once the stream ends.
+"""
+import json
+from functools import wraps
+
+from channels.db import database_sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import CSRFCheck
+
+from mentor_engine import ollama_client
+from mentor_engine.course_mentor import stream_mentor_respond
+from .models import TopicChatMessage
+
+INQUIRY_SYSTEM_PROMPT = """You are a helpful financial advisor assistant for WealthPlay.
+            Provide clear, practical advice about financial topics. Keep answers concise and actionable."""
+
+
+def sse_event(event, data):
+    """One Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """StreamingHttpResponse writing each event dict as an SSE frame"""
+    async def frames():
+        async for event in events:
+            data = dict(event)
+            yield sse_event(data.pop("event"), data)
+
+    response = StreamingHttpResponse(frames(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@database_sync_to_async
+def token_user(auth_header):
+    """User for an 'Authorization: Token <key>' header, or None"""
+    from rest_framework.authtoken.models import Token
+
+    parts = auth_header.split()
+    if len(parts) != 2 or parts[0].lower() != "token":
+        return None
+    token = Token.objects.select_related("user").filter(key=parts[1]).first()
+    return token.user if token and token.user.is_active else None
+
+
+async def get_request_user(request):
+    """Session user, else token user, else None (same auth classes as the DRF views)"""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    return await token_user(request.headers.get("Authorization", ""))
+
+
+def csrf_failure(request):
+    """Reason the request fails Django's CSRF check, or None"""
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def session_csrf_protect(view):
+    """
+    CSRF protection as in DRF's SessionAuthentication: requests from a
+    logged-in session must carry the CSRF token, token-authenticated
+    clients (no session) don't need one.
+    """
+    @csrf_exempt
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        user = await request.auser()
+        if user.is_authenticated:
+            reason = csrf_failure(request)
+            if reason:
+                return JsonResponse({"reply": f"CSRF Failed: {reason}", "type": "error"}, status=403)
+        return await view(request, *args, **kwargs)
+    return wrapped
+
+
+@database_sync_to_async
+def save_topic_message(user, course_id, module_id, sender, text):
+    return TopicChatMessage.objects.create(
+        user=user,
+        course_id=course_id,
+        module_id=module_id or "",
+        sender=sender,
+        text=text,
+        time_display=timezone.now().strftime('%H:%M')
+    )
+
+
+def reply_payload(result):
+    """Same fields as the JSON mentor_respond response"""
+    reply = result.get("answer", "") or result.get("reply", "")
+    payload = {
+        "reply": reply,
+        "answer": reply,
+        "type": result.get("type", "llm"),
+        "source": result.get("source", ""),
+        "confidence": result.get("confidence", 0),
+        "matched_question": result.get("matched_question", None)
+    }
+    if result.get("error"):
+        payload["error"] = result["error"]
+    return payload
+
+
+async def course_mentor_events(user, course_id, module_id, question, user_key=None):
+    """Course mentor stream; the question and full answer go to the topic chat"""
+    if user:
+        await save_topic_message(user, course_id, module_id, 'user', question)
+
+    chunks = []
+    saved = False
+    try:
+        async for event in stream_mentor_respond(course_id, module_id, question, user_key):
+            if event["event"] == "token":
+                chunks.append(event["text"])
+                yield event
+                continue
+            answer = event.get("answer", "")
+            if user and answer:
+                await save_topic_message(user, course_id, module_id, 'nex', answer)
+            saved = True
+            yield {"event": "done", **reply_payload(event)}
+    finally:
+        # Client went away mid-answer: keep what was generated so far
+        if user and chunks and not saved:
+            await save_topic_message(user, course_id, module_id, 'nex', "".join(chunks))
+
+
+async def llm_events(chunks, error_prefix):
+    """Token events for a chunk stream, then done with the full reply"""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield {"event": "token", "text": chunk}
+    except Exception as e:
+        yield {
+            "event": "error",
+            "reply": f"{error_prefix}: {str(e)}",
+            "partial": "".join(parts),
+            "type": "error"
+        }
+        return
+    yield {"event": "done", "reply": "".join(parts), "type": "llm"}
+
+
+def inquiry_events(question, user_key=None):
+    """General inquiry stream (no course context)"""
+    chunks = ollama_client.stream_chat([
+        {"role": "system", "content": INQUIRY_SYSTEM_PROMPT},
+        {"role": "user", "content": question}
+    ], user_key=user_key)
+    return llm_events(chunks, "Sorry, I encountered an error connecting to Ollama")
+
+
+def rag_events(question, stream_response, user_key=None):
+    """RAG mentor stream; stream_response is mentor.stream_response"""
+    return llm_events(stream_response(question, user_key), "Sorry, I encountered an error")
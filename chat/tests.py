@@ -1,3 +1,822 @@
-from django.test import TestCase
+import asyncio
+import dataclasses
+import difflib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, TestCase
+from rest_framework.authtoken.models import Token
+
+from chat.consumers import MentorChatConsumer
+from chat.management.commands import benchmark_mentors
+from chat.models import TopicChatMessage
+from courses.tests import write_course_tree
+from mentor_engine import course_mentor, mentor, ollama_client
+from mentor_engine.answer_cache import AnswerCache, MemoryBackend, SQLiteBackend, normalize_question
+from mentor_engine.bm25 import BM25Index, tokenize
+from mentor_engine.embedding_batcher import EmbeddingBatcher
+from mentor_engine.embedding_cache import EmbeddingCache
+from mentor_engine.llm_metrics import LLMMetrics
+from mentor_engine.llm_queue import LLMBusy, LLMQueue
+from mentor_engine.retrieval_cache import RetrievalCache
+from mentor_engine.mentor_index import build_chunks, bump_version, chunk_text, manifest_path, read_manifest, sync_collection
+from mentor_engine.question_matcher import QuestionMatcher
+from mentor_engine.retrievers import (
+    HybridRetriever, NumpyIndexWriter, NumpyRetriever, RetrievedChunk, normalize_rows, top_k
+)
+from mentor_engine.single_flight import SingleFlight, StreamFlight
+
+
+class AnswerCacheTests(TestCase):
+    """Course mentor LLM answer cache"""
+
+    def test_normalized_questions_share_an_entry(self):
+        self.assertEqual(normalize_question("What is SIP"), normalize_question("what's a SIP?"))
+
+        cache = AnswerCache(MemoryBackend())
+        _, key = cache.lookup('c1', 'm1', "What is SIP")
+        cache.store(key, "A SIP is ...", gen_seconds=4.0)
+
+        hit, _ = cache.lookup('c1', 'm1', "what's a SIP?")
+        self.assertEqual(hit["answer"], "A SIP is ...")
+        self.assertIsNone(cache.lookup('c1', 'm2', "what's a SIP?")[0])
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(cache.stats()["llm_seconds_saved"], 4.0)
+
+    def test_lru_and_ttl_eviction(self):
+        cache = AnswerCache(MemoryBackend(max_entries=2), ttl=60)
+        for question in ("one", "two", "three"):
+            cache.store(cache.lookup('c', 'm', question)[1], f"answer {question}")
+        self.assertIsNone(cache.lookup('c', 'm', "one")[0])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        with mock.patch('mentor_engine.answer_cache.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.lookup('c', 'm', "three")[0])
+        self.assertEqual(cache.stats()["expired"], 1)
+
+    def test_sqlite_backend_and_semantic_tier(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        vectors = {
+            "how do i start sip": np.array([1.0, 0.0], dtype=np.float32),
+            "how can i begin sip": np.array([0.96, 0.28], dtype=np.float32),
+            "what is inflation": np.array([0.0, 1.0], dtype=np.float32),
+        }
+        backend = SQLiteBackend(os.path.join(root, 'cache.sqlite3'))
+        cache = AnswerCache(backend, similarity=0.9, embed=vectors.__getitem__)
+
+        cache.store(cache.lookup('c', 'm', "How do I start a SIP?")[1], "Pick an amount ...")
+        # A second connection to the same file sees the entry
+        other = AnswerCache(SQLiteBackend(backend.path), similarity=0.9, embed=vectors.__getitem__)
+
+        hit, _ = other.lookup('c', 'm', "How can I begin a SIP?")
+        self.assertEqual(hit["match"], "semantic")
+        self.assertEqual(hit["answer"], "Pick an amount ...")
+        self.assertIsNone(other.lookup('c', 'm', "What is inflation?")[0])
+
+    def test_mentor_respond_reuses_llm_answer(self):
+        index = course_mentor.get_course_index()
+        course_id = next(iter(index.courses))
+        question = "zz unrelated question about weather patterns?"
+        cache = AnswerCache(MemoryBackend())
+
+        with mock.patch.object(course_mentor, 'get_answer_cache', return_value=cache), \
+                mock.patch.object(course_mentor, 'generate_ollama_response', return_value="Generated") as generate:
+            first = course_mentor.mentor_respond(course_id, None, question)
+            second = course_mentor.mentor_respond(course_id, None, question.upper())
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(first["answer"], "Generated")
+        self.assertEqual(second["answer"], "Generated")
+        self.assertEqual(second["cached"], "exact")
+
+
+
+def scan_match(fixed_qna, user_q, cutoff):
+    """The linear SequenceMatcher scan QuestionMatcher replaces"""
+    best, best_score = None, 0
+    for qa in fixed_qna:
+        score = difflib.SequenceMatcher(None, qa.get("q", "").lower(), user_q.lower()).ratio()
+        if score > best_score:
+            best, best_score = qa, score
+    return best if best_score >= cutoff else None
+
+
+class QuestionMatcherTests(TestCase):
+    """The pruned matcher returns exactly what a linear scan returns"""
+
+    def test_equals_a_linear_scan(self):
+        rng = random.Random(4)
+        words = ["what", "is", "a", "sip", "how", "do", "i", "save", "tax", "fund", "emi", "loan", "budget", "rule"]
+        questions = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 7))) + "?" for _ in range(40)]
+        questions += questions[:5]   # duplicates: identical scores, the earlier one must win
+        questions += [q.upper() for q in questions[5:10]]
+        qna = [{"q": q, "a": f"answer {i}"} for i, q in enumerate(questions)]
+        matcher = QuestionMatcher(qna)
+
+        queries = [rng.choice(questions) for _ in range(40)]
+        queries += [" ".join(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(100)]
+        queries += ["", "?", "zzz"]
+        for query in queries:
+            for cutoff in (0.0, 0.5, 0.7, 0.9, 1.0):
+                self.assertIs(matcher.match(query, cutoff), scan_match(qna, query, cutoff), (query, cutoff))
+
+    def test_ties_and_the_cutoff_boundary(self):
+        qna = [{"q": "abcd"}, {"q": "abce"}, {"q": "abcd"}]
+        matcher = QuestionMatcher(qna)
+        # "abcx" scores 0.75 against all three: the first one wins
+        self.assertIs(matcher.match("abcx", 0.75), qna[0])
+        self.assertIsNone(matcher.match("abcx", 0.7500001))
+        self.assertIs(matcher.match("ABCE", 1.0), qna[1])
+        self.assertIsNone(QuestionMatcher([]).match("abcd", 0.0))
+
+
+class CourseIndexTTLTests(TestCase):
+    """An expired course index is rebuilt once; callers meanwhile keep the old one"""
+
+    def test_one_rebuild_while_others_read_the_old_index(self):
+        old = course_mentor.CourseIndex.build([{"id": "old", "modules": []}])
+        old = dataclasses.replace(old, built_at=old.built_at - 10_000)   # long past the TTL
+        building = threading.Event()
+        release = threading.Event()
+        builds = []
+
+        def load_courses():
+            builds.append(threading.current_thread().name)
+            building.set()
+            release.wait(5)
+            return [{"id": "new", "modules": []}]
+
+        with mock.patch.object(course_mentor, "COURSE_INDEX", old), \
+                mock.patch.object(course_mentor, "load_courses", side_effect=load_courses), \
+                mock.patch.object(course_mentor, "load_module_contents", return_value=[]):
+            results = {}
+            rebuilder = threading.Thread(target=lambda: results.setdefault("rebuilder", course_mentor.get_course_index()))
+            rebuilder.start()
+            self.assertTrue(building.wait(5))
+
+            readers = [threading.Thread(target=lambda i=i: results.setdefault(i, course_mentor.get_course_index())) for i in range(4)]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join(5)
+            self.assertEqual([results[i] for i in range(4)], [old] * 4)
+
+            release.set()
+            rebuilder.join(5)
+            self.assertIsNotNone(results["rebuilder"].find_course("new"))
+            self.assertIs(course_mentor.get_course_index(), results["rebuilder"])
+        self.assertEqual(len(builds), 1)
+
+class SingleFlightTests(TestCase):
+    """Identical concurrent questions share one generation"""
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def generate():
+            calls.append(1)
+            release.wait(5)
+            return "answer"
+
+        def ask():
+            results.append(flight.do(('c', 'm', 'what is sip'), generate))
+
+        threads = [threading.Thread(target=ask) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while flight.stats()["followers"] < 7:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 7)
+        self.assertTrue(all(answer == "answer" for answer, _ in results))
+
+    def test_late_stream_subscriber_replays_chunks(self):
+        flight = StreamFlight()
+        starts = []
+
+        async def source():
+            starts.append(1)
+            for chunk in ("A ", "SIP ", "is"):
+                yield chunk
+                await asyncio.sleep(0.01)
+
+        async def collect(delay):
+            await asyncio.sleep(delay)
+            return "".join([chunk async for chunk in flight.stream('k', source)])
+
+        async def main():
+            return await asyncio.gather(collect(0), collect(0.015), collect(0.015))
+
+        self.assertEqual(asyncio.run(main()), ["A SIP is"] * 3)
+        self.assertEqual(len(starts), 1)
+
+
+class LLMQueueTests(TestCase):
+    """Admission control in front of Ollama"""
+
+    def wait_for(self, queue, waiting):
+        while queue.stats()["waiting"] < waiting:
+            time.sleep(0.005)
+
+    def test_waiters_are_served_round_robin_per_user(self):
+        queue = LLMQueue(max_concurrent=1, max_waiting=10, max_waiting_per_user=5)
+        order = []
+
+        def ask(name, user_key):
+            with queue.slot(user_key):
+                order.append(name)
+
+        threads = []
+        with queue.slot('holder'):
+            for waiting, (name, user_key) in enumerate([('a1', 'a'), ('a2', 'a'), ('a3', 'a'), ('b1', 'b')], 1):
+                thread = threading.Thread(target=ask, args=(name, user_key))
+                thread.start()
+                threads.append(thread)
+                self.wait_for(queue, waiting)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ['a1', 'b1', 'a2', 'a3'])
+        self.assertEqual(queue.stats()["admitted"], 5)
+
+    def test_full_queue_fails_fast(self):
+        queue = LLMQueue(max_concurrent=1, max_waiting=1, wait_timeout=5)
+
+        def ask():
+            with queue.slot('b'):
+                pass
+
+        waiter = threading.Thread(target=ask)
+        with queue.slot('a'):
+            waiter.start()
+            self.wait_for(queue, 1)
+            started = time.monotonic()
+            with self.assertRaises(LLMBusy):
+                with queue.slot('c'):
+                    pass
+            self.assertLess(time.monotonic() - started, 1)
+        waiter.join()
+        self.assertEqual(queue.stats()["rejected"], 1)
+
+    def test_mentor_falls_back_when_llm_is_busy(self):
+        course_id = next(iter(course_mentor.get_course_index().courses))
+        with mock.patch.object(course_mentor, 'get_answer_cache', return_value=None), \
+                mock.patch.object(course_mentor, 'generate_ollama_response', side_effect=LLMBusy("busy")):
+            result = course_mentor.mentor_respond(course_id, None, "zz unrelated question about weather patterns?")
+        self.assertEqual(result["type"], "fallback")
+        self.assertIn("lot of questions", result["answer"])
+
+
+class MemoryCollection:
+    """The parts of a Chroma collection that sync_collection uses"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, include=(), limit=None, offset=0):
+        ids = sorted(self.rows)[offset:offset + limit]
+        return {"ids": ids, "metadatas": [self.rows[i]["metadata"] for i in ids]}
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for chunk_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            self.rows[chunk_id] = {"document": document, "metadata": metadata, "embedding": embedding}
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.rows.pop(chunk_id, None)
+
+
+class MentorIndexTests(TestCase):
+    """build_mentor_index only re-embeds changed chunks and prunes removed ones"""
+
+    def test_incremental_sync(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        write_course_tree(os.path.join(root, 'course_modules'), course_count=2, modules_per_course=2)
+
+        embedded = []
+
+        def embed(texts):
+            embedded.extend(texts)
+            return [[float(len(text)), 1.0] for text in texts]
+
+        collection = MemoryCollection()
+        chunks = build_chunks('test-model', base_dir=root)
+        stats = sync_collection(collection, chunks, embed, batch_size=3)
+        self.assertEqual(stats["added"], len(chunks))
+        self.assertEqual(len(embedded), len(chunks))
+        self.assertEqual(bump_version(root, 'c', 'test-model', stats)["version"], 1)
+
+        # Unchanged content: nothing embedded, version kept
+        embedded.clear()
+        stats = sync_collection(collection, build_chunks('test-model', base_dir=root), embed)
+        self.assertEqual((stats["unchanged"], len(embedded)), (len(chunks), 0))
+        self.assertEqual(bump_version(root, 'c', 'test-model', stats)["version"], 1)
+
+        # Edit one module and delete another
+        qna_path = os.path.join(root, 'course_modules', 'course-00', 'm1', 'qna.json')
+        with open(qna_path, 'w') as f:
+            f.write('[{"question": "Q changed?", "answer": "New answer."}]')
+        shutil.rmtree(os.path.join(root, 'course_modules', 'course-01', 'm2'))
+        chunks = build_chunks('test-model', base_dir=root)
+        stats = sync_collection(collection, chunks, embed)
+
+        self.assertEqual(embedded, ["Q: Q changed? A: New answer."])
+        self.assertEqual(stats["updated"], 1)
+        self.assertEqual(stats["deleted"], 2)  # flash card + Q&A of the removed module
+        self.assertEqual(sorted(collection.rows), sorted(chunk.id for chunk in chunks))
+        self.assertEqual(bump_version(root, 'c', 'test-model', stats)["version"], 2)
+        self.assertEqual(read_manifest(root)["chunks"], len(chunks))
+
+
+    def test_chunk_text_rejects_an_overlap_that_cannot_advance(self):
+        self.assertTrue(chunk_text("one two three. four five six.", max_chars=8, overlap=0))
+        for max_chars, overlap in ((10, 10), (10, 12), (0, 0), (10, -1)):
+            with self.assertRaises(ValueError):
+                chunk_text("x" * 50, max_chars=max_chars, overlap=overlap)
+
+    def test_server_reopens_the_collection_after_a_rebuild(self):
+        versions = iter([1, 2, 2])
+        with mock.patch.object(mentor, 'RETRIEVER_BACKEND', 'chroma'), \
+                mock.patch.object(mentor, 'HYBRID', False), \
+                mock.patch.object(mentor, 'index_version', lambda: next(versions)), \
+                mock.patch.object(mentor, 'get_collection', side_effect=['old', 'new']):
+            mentor.reset_collection()
+            self.addCleanup(mentor.reset_collection)
+            self.assertEqual(mentor.get_retriever().collection, 'old')
+            self.assertEqual(mentor.get_retriever().collection, 'new')
+
+class EmbeddingCacheTests(TestCase):
+    """Query embedding LRU for the RAG mentor"""
+
+    def test_repeated_queries_skip_the_encoder(self):
+        cache = EmbeddingCache(max_entries=2)
+        encoded = []
+
+        def encode(text):
+            encoded.append(text)
+            return [float(len(text)), 0.5]
+
+        first = cache.get_or_encode("What is a SIP?", encode)
+        again = cache.get_or_encode("  what is a  SIP ", encode)
+        self.assertIs(first, again)
+        self.assertEqual(first.dtype, np.float32)
+        self.assertFalse(first.flags.writeable)
+        self.assertEqual(encoded, ["what is a sip"])
+
+        cache.get_or_encode("hello", encode)
+        cache.get_or_encode("thanks", encode)
+        cache.get_or_encode("What is a SIP", encode)
+        self.assertEqual(len(encoded), 4)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["entries"], 2)
+
+
+class EmbeddingBatcherTests(TestCase):
+    """Concurrent queries are encoded together; each caller gets its own vector"""
+
+    def test_concurrent_texts_share_encode_calls(self):
+        calls = []
+        gate = threading.Event()
+
+        def encode_batch(texts):
+            calls.append(list(texts))
+            gate.wait(5)
+            return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+
+        batcher = EmbeddingBatcher(encode_batch, max_batch=8, max_wait_ms=50)
+        first = batcher.submit("first")
+        while not calls:
+            time.sleep(0.005)
+        # Queued while "first" is being encoded: picked up as one batch
+        futures = [batcher.submit(text) for text in ("a", "bb", "ccc", "bb")]
+        gate.set()
+
+        self.assertEqual(first.result(5)[0], 5.0)
+        self.assertEqual([f.result(5)[0] for f in futures], [1.0, 2.0, 3.0, 2.0])
+        self.assertEqual(calls, [["first"], ["a", "bb", "ccc"]])
+        self.assertEqual(batcher.stats()["max_batch_seen"], 4)
+
+    def test_errors_reach_every_caller(self):
+        def encode_batch(texts):
+            raise RuntimeError("model failed")
+
+        batcher = EmbeddingBatcher(encode_batch)
+        with self.assertRaisesMessage(RuntimeError, "model failed"):
+            batcher.encode("hello", timeout=5)
+
+    def test_worker_survives_a_misbehaving_encoder(self):
+        responses = [
+            lambda texts: [],                           # fewer vectors than texts
+            lambda texts: None,                         # not a sequence at all
+            lambda texts: [[float(len(t))] for t in texts],
+        ]
+
+        def encode_batch(texts):
+            return responses.pop(0)(texts)
+
+        batcher = EmbeddingBatcher(encode_batch)
+        with self.assertRaisesMessage(ValueError, "0 vectors for 1 texts"):
+            batcher.encode("one", timeout=5)
+        with self.assertRaises(TypeError):
+            batcher.encode("two", timeout=5)
+        self.assertEqual(batcher.encode("hello", timeout=5)[0], 5.0)
+
+
+class NumpyRetrieverTests(TestCase):
+    """The NumPy index returns the same top-k as exact search, in float32 and int8"""
+
+    def test_matches_brute_force(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(300, 32)).astype(np.float32)
+        ids = [f"chunk-{i:03d}" for i in range(len(vectors))]
+
+        writer = NumpyIndexWriter(directory, "int8", "test-model")
+        writer.upsert(ids, [f"text {i}" for i in ids], [{"n": i} for i in range(len(ids))], vectors)
+        self.assertEqual(writer.save()["version"], 1)
+        self.assertEqual(writer.save()["version"], 1)  # nothing changed
+
+        exact = normalize_rows(vectors)
+        for dtype in ("float32", "int8"):
+            retriever = NumpyRetriever(directory, dtype=dtype)
+            self.assertEqual(retriever.dtype, dtype)
+            for query in rng.normal(size=(5, 32)):
+                expected = [ids[i] for i in top_k(exact @ normalize_rows(query[None])[0], 4)]
+                self.assertEqual([chunk.id for chunk in retriever.search(query, 4)], expected)
+
+        # A rebuild is picked up by running retrievers
+        retriever = NumpyRetriever(directory, check_interval=0)
+        before = retriever._current()
+        writer = NumpyIndexWriter(directory, "int8", "test-model")
+        writer.delete(ids[:100])
+        self.assertEqual(writer.save()["version"], 2)
+        self.assertEqual((retriever.version, len(retriever)), (2, 200))
+        self.assertEqual((retriever.ids[0], retriever.matrix.shape), (ids[100], (200, 32)))
+
+        # A reload mid-search does not pair the new scores with the old chunks
+        query = rng.normal(size=32)
+        expected = [ids[i] for i in top_k(exact @ normalize_rows(query[None])[0], 4)]
+        with mock.patch.object(retriever, "_current", side_effect=[before, retriever._current()]):
+            self.assertEqual([chunk.id for chunk in retriever.search(query, 4)], expected)
+
+        # int8 search needs an int8 build; a float32 rebuild leaves a stale quantized matrix behind
+        writer = NumpyIndexWriter(directory, "float32", "test-model")
+        writer.save()
+        with self.assertRaisesRegex(ValueError, "Rebuild"):
+            NumpyRetriever(directory, dtype="int8")
+        self.assertEqual(NumpyRetriever(directory).dtype, "float32")
+
+
+class HybridRetrievalTests(TestCase):
+    """BM25 finds exact terms the vector search misses; RRF merges both lists"""
+
+    def test_exact_term_reaches_the_top_k(self):
+        ids = ["budget", "sip", "cibil", "elss"]
+        documents = [
+            "Budgeting means planning how you spend your monthly income.",
+            "A SIP invests a fixed amount in a mutual fund every month.",
+            "Your CIBIL score ranges from 300 to 900 and reflects repayment history.",
+            "ELSS funds qualify for a tax deduction under section 80C.",
+        ]
+        index = BM25Index.build(ids, documents)
+        self.assertEqual(tokenize("What is Section 80C?"), ["section", "80c"])
+        self.assertEqual([chunk.id for chunk in index.search("80C limit", 4)], ["elss"])
+
+        class FixedDense:
+            name = "dense"
+            version = 3
+
+            def search(self, embedding, k=4):
+                return [RetrievedChunk(i, i, 1.0) for i in ["budget", "sip", "cibil"][:k]]
+
+        timings = {}
+        hybrid = HybridRetriever(FixedDense(), index, candidates=3)
+        results = hybrid.retrieve("How do I improve my CIBIL score?", None, k=2, timings=timings)
+        # "cibil" is 3rd for the vector search but 1st for BM25, so it wins the fusion
+        self.assertEqual([chunk.id for chunk in results], ["cibil", "budget"])
+        self.assertEqual(set(timings), {"dense_ms", "bm25_ms", "fuse_ms"})
+        self.assertEqual(hybrid.version, f"3:{index.version}")
+
+
+class RetrievalCacheTests(TestCase):
+    """Near-identical questions reuse retrieval results until the index version changes"""
+
+    def test_hits_and_version_invalidation(self):
+        class CountingRetriever:
+            version = 1
+            searches = 0
+
+            def retrieve(self, query, embedding, k=4, timings=None):
+                self.searches += 1
+                return [RetrievedChunk("c1", "Chunk one.", 0.9), RetrievedChunk("c2", "Chunk two.", 0.8)]
+
+        # 384-dim embeddings like the real encoder's; rephrasings differ by noise
+        rng = np.random.default_rng(0)
+        sip = rng.standard_normal(384).astype(np.float32)
+        embeddings = {
+            "what is a sip": sip,
+            "What's a SIP, please?": sip + rng.normal(0, 0.01, 384).astype(np.float32),
+            "how do taxes work": rng.standard_normal(384).astype(np.float32),
+        }
+        retriever = CountingRetriever()
+        cache = RetrievalCache(max_entries=8)
+        with mock.patch.object(mentor, "get_retriever", return_value=retriever), \
+                mock.patch.object(mentor, "embed_query", side_effect=embeddings.get) as embed, \
+                mock.patch.object(mentor, "retrieval_cache", cache):
+            chunks, text, _ = mentor.retrieve("what is a sip")
+            self.assertEqual(text, "Chunk one.\n\nChunk two.")
+            mentor.retrieve("What's a SIP, please?")
+            self.assertEqual((retriever.searches, embed.call_count), (1, 1))
+            mentor.retrieve("how do taxes work")
+            self.assertEqual(retriever.searches, 2)
+
+            retriever.version = 2   # build_mentor_index re-ran
+            mentor.retrieve("what is a sip")
+            self.assertEqual(retriever.searches, 3)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["invalidations"], stats["entries"]), (1, 1, 1))
+
+    def test_index_version_is_reread_only_when_the_manifest_changes(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with mock.patch.object(mentor, "DB_DIR", root), mock.patch.object(mentor, "_manifest_version", (None, 0)), \
+                mock.patch.object(mentor, "read_manifest", wraps=read_manifest) as reads:
+            self.assertEqual(mentor.index_version(), 0)
+            bump_version(root, 'c', 'test-model', {"added": 1, "updated": 0, "deleted": 0, "total": 1, "unchanged": 0})
+            self.assertEqual([mentor.index_version() for _ in range(3)], [1, 1, 1])
+            self.assertEqual(reads.call_count, 1)
+            bump_version(root, 'c', 'test-model', {"added": 1, "updated": 0, "deleted": 0, "total": 2, "unchanged": 0})
+            os.utime(manifest_path(root), ns=(0, os.stat(manifest_path(root)).st_mtime_ns + 1))
+            self.assertEqual(mentor.index_version(), 2)
+
+class MentorBenchmarkTests(TestCase):
+    """benchmark_mentors writes a JSON report that --baseline can compare against"""
+
+    def test_report(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'report.json')
+        call_command('benchmark_mentors', output=output, per_module=1, stdout=io.StringIO())
+
+        with open(output) as f:
+            report = json.load(f)
+        self.assertGreater(report["latency_ms"]["fixed_qna"]["count"], 0)
+        self.assertTrue({"p50", "p95", "p99"} <= set(report["latency_ms"]["course_mentor"]))
+        self.assertEqual(report["quality"]["fixed_qna_hit_rate_by_variant"]["exact"], 1.0)
+        self.assertEqual(report["quality"]["off_topic_false_match_rate"], 0.0)
+
+        out = io.StringIO()
+        with mock.patch.object(benchmark_mentors, 'LATENCY_TOLERANCE', 100):
+            call_command('benchmark_mentors', output=output, baseline=output, per_module=1, stdout=out)
+        self.assertIn("No regressions", out.getvalue())
+
+        report["quality"]["fixed_qna_hit_rate"] += 0.5
+        baseline = os.path.join(directory, 'baseline.json')
+        with open(baseline, 'w') as f:
+            json.dump(report, f)
+        with self.assertRaisesRegex(CommandError, "fixed_qna_hit_rate"):
+            call_command('benchmark_mentors', output=output, baseline=baseline, per_module=1, stdout=io.StringIO())
+
+
+class AsyncMentorViewTests(TestCase):
+    """The JSON mentor endpoints await Ollama instead of holding a thread per request"""
+
+    async def test_concurrent_inquiries_overlap(self):
+        async def achat(messages, **kwargs):
+            await asyncio.sleep(0.2)
+            return {"message": {"content": f"Answer to {messages[-1]['content']}"}}
+
+        with mock.patch.object(ollama_client, 'achat', side_effect=achat):
+            started = time.monotonic()
+            responses = await asyncio.gather(*[
+                self.async_client.post('/api/chat/mentor/inquiry/', {"question": f"q{i}"}, content_type='application/json')
+                for i in range(30)
+            ])
+            elapsed = time.monotonic() - started
+
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(json.loads(responses[7].content)["reply"], "Answer to q7")
+        self.assertLess(elapsed, 3.0)  # 6s if the requests ran one after another
+
+    async def test_course_mentor_saves_topic_chat(self):
+        user = await User.objects.acreate(username='learner')
+        await self.async_client.aforce_login(user)
+
+        async def achat(messages, **kwargs):
+            return {"message": {"content": "Generated answer"}}
+
+        with mock.patch.object(ollama_client, 'achat', side_effect=achat), \
+                mock.patch.object(course_mentor, 'get_answer_cache', return_value=None):
+            response = await self.async_client.post('/api/chat/mentor/respond/', {
+                "course_id": "budgeting", "module_id": "m1", "question": "Should I budget for a holiday abroad this year?"
+            }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["reply"], "Generated answer")
+        senders = [m.sender async for m in TopicChatMessage.objects.filter(user=user).order_by('id')]
+        self.assertEqual(senders, ['user', 'nex'])
+
+
+    async def test_session_requests_need_the_csrf_token_token_clients_do_not(self):
+        user = await User.objects.acreate(username='csrf')
+        token = await Token.objects.acreate(user=user)
+
+        async def achat(messages, **kwargs):
+            return {"message": {"content": "Answer"}}
+
+        session = AsyncClient(enforce_csrf_checks=True)
+        await session.aforce_login(user)
+        with mock.patch.object(ollama_client, 'achat', side_effect=achat):
+            response = await session.post('/api/chat/mentor/inquiry/', {"question": "q"}, content_type='application/json')
+            self.assertEqual(response.status_code, 403)
+            self.assertIn("CSRF", json.loads(response.content)["reply"])
+
+            response = await AsyncClient(enforce_csrf_checks=True).post(
+                '/api/chat/mentor/inquiry/', {"question": "q"}, content_type='application/json',
+                headers={"Authorization": f"Token {token.key}"},
+            )
+            self.assertEqual(response.status_code, 200)
+
+
+def fake_stream_chat(*chunks, error=None):
+    """Stand-in for ollama_client.stream_chat yielding chunks, then raising error if given"""
+    async def stream_chat(messages, model=None, host=None, user_key=None, **kwargs):
+        for chunk in chunks:
+            await asyncio.sleep(0)
+            yield chunk
+        if error is not None:
+            raise error
+    return stream_chat
+
+
+async def read_sse(response):
+    """[(event, data)] of a streamed SSE response"""
+    body = "".join([chunk.decode() if isinstance(chunk, bytes) else chunk async for chunk in response.streaming_content])
+    events = []
+    for frame in body.strip().split("\n\n"):
+        event, data = frame.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+class MentorStreamingTests(TestCase):
+    """SSE views and the mentor WebSocket frame the same token/done events"""
+
+    course_question = {"course_id": "budgeting", "module_id": "m1", "question": "Should I budget for a holiday abroad this year?"}
+
+    def setUp(self):
+        patcher = mock.patch.object(course_mentor, 'get_answer_cache', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_inquiry_stream_frames_tokens_then_done(self):
+        with mock.patch.object(ollama_client, 'stream_chat', fake_stream_chat("Save ", "early.")):
+            response = await self.async_client.post('/api/chat/mentor/inquiry/stream/', {"question": "Tips?"}, content_type='application/json')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = await read_sse(response)
+        self.assertEqual(events, [
+            ("token", {"text": "Save "}),
+            ("token", {"text": "early."}),
+            ("done", {"reply": "Save early.", "type": "llm"}),
+        ])
+
+    async def test_inquiry_stream_reports_errors_with_the_partial_answer(self):
+        with mock.patch.object(ollama_client, 'stream_chat', fake_stream_chat("Save ", error=ConnectionError("down"))):
+            response = await self.async_client.post('/api/chat/mentor/inquiry/stream/', {"question": "Tips?"}, content_type='application/json')
+            events = await read_sse(response)
+        self.assertEqual(events[0], ("token", {"text": "Save "}))
+        event, data = events[-1]
+        self.assertEqual((event, data["type"], data["partial"]), ("error", "error", "Save "))
+
+    async def test_course_stream_saves_the_topic_chat(self):
+        user = await User.objects.acreate(username='streamer')
+        await self.async_client.aforce_login(user)
+        with mock.patch.object(ollama_client, 'stream_chat', fake_stream_chat("Yes, ", "set aside a sinking fund.")):
+            response = await self.async_client.post('/api/chat/mentor/respond/stream/', self.course_question, content_type='application/json')
+            events = await read_sse(response)
+
+        self.assertEqual([event for event, _ in events], ["token", "token", "done"])
+        self.assertEqual(events[-1][1]["reply"], "Yes, set aside a sinking fund.")
+        self.assertEqual(events[-1][1]["type"], "llm")
+        messages = [(m.sender, m.text) async for m in TopicChatMessage.objects.filter(user=user).order_by('id')]
+        self.assertEqual(messages, [('user', self.course_question["question"]), ('nex', "Yes, set aside a sinking fund.")])
+
+    async def test_course_stream_falls_back_to_module_content_when_the_llm_is_busy(self):
+        with mock.patch.object(ollama_client, 'stream_chat', fake_stream_chat(error=LLMBusy("queue full"))):
+            response = await self.async_client.post('/api/chat/mentor/respond/stream/', self.course_question, content_type='application/json')
+            events = await read_sse(response)
+
+        self.assertEqual([event for event, _ in events], ["token", "done"])
+        done = events[-1][1]
+        self.assertEqual(done["type"], "fallback")
+        self.assertEqual(events[0][1]["text"], done["reply"])
+        self.assertIn("answering a lot of questions", done["reply"])
+
+    async def connect(self, user=None):
+        scope = {"type": "websocket", "path": "/ws/mentor/", "headers": [], "subprotocols": [], "client": ("10.0.0.1", 5000)}
+        if user is not None:
+            scope["user"] = user
+        socket = ApplicationCommunicator(MentorChatConsumer.as_asgi(), scope)
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.accept")
+        return socket
+
+    async def ask(self, socket, message):
+        """Frames sent back until the done or error frame"""
+        await socket.send_input({"type": "websocket.receive", "text": json.dumps(message)})
+        frames = []
+        while not frames or frames[-1]["type"] == "token":
+            frames.append(json.loads((await socket.receive_output(1))["text"]))
+        return frames
+
+    async def test_websocket_streams_tokens_and_saves_course_answers(self):
+        user = await User.objects.acreate(username='socket')
+        socket = await self.connect(user)
+        try:
+            with mock.patch.object(ollama_client, 'stream_chat', fake_stream_chat("Yes, ", "budget for it.")):
+                frames = await self.ask(socket, {"mode": "course", **self.course_question})
+            self.assertEqual(frames[:2], [
+                {"type": "token", "data": {"text": "Yes, "}},
+                {"type": "token", "data": {"text": "budget for it."}},
+            ])
+            self.assertEqual((frames[-1]["type"], frames[-1]["data"]["reply"]), ("done", "Yes, budget for it."))
+
+            with mock.patch.object(ollama_client, 'stream_chat', fake_stream_chat(error=LLMBusy("queue full"))):
+                frames = await self.ask(socket, {"mode": "course", **self.course_question})
+            self.assertEqual(frames[-1]["data"]["type"], "fallback")
+
+            frames = await self.ask(socket, {"mode": "inquiry"})
+            self.assertEqual(frames, [{"type": "error", "data": {"reply": "Please provide a question.", "type": "error"}}])
+        finally:
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait(1)
+
+        senders = [m.sender async for m in TopicChatMessage.objects.filter(user=user).order_by('id')]
+        self.assertEqual(senders, ['user', 'nex', 'user', 'nex'])
+
+class PromptPrefixTests(TestCase):
+    """Questions on one module share a byte-identical prompt prefix; timings are recorded"""
+
+    def test_prefix_is_stable(self):
+        index = course_mentor.get_course_index()
+        course = index.find_course("budgeting")
+        module = index.find_module("budgeting", "m1")
+        first = course_mentor.build_ollama_messages(course, module, "How do I start a budget?")
+        second = course_mentor.build_ollama_messages(course, module, "What is the 50/30/20 rule?")
+
+        self.assertEqual(first[:-1], second[:-1])
+        self.assertIs(first[0], second[0])  # cached, not rebuilt
+        self.assertEqual([m["role"] for m in first[:2]], ["system", "user"])
+        self.assertTrue(first[0]["content"].startswith(course_mentor.SYSTEM_PROMPT))
+        self.assertEqual(second[-1], {"role": "user", "content": "What is the 50/30/20 rule?"})
+
+        self.assertGreater(course_mentor.prompt_prefix_count(), 0)
+        course_mentor.reset_course_index()
+        self.assertEqual(course_mentor.prompt_prefix_count(), 0)
+
+    def test_keep_alive_and_metrics(self):
+        metrics = LLMMetrics()
+        seen = []
+        metrics.add_hook(lambda model, sample: seen.append((model, sample["prompt_eval_count"])))
+        client = mock.Mock()
+        client.chat.return_value = {
+            "message": {"content": "Hi"}, "done": True,
+            "prompt_eval_count": 12, "prompt_eval_duration": 30_000_000,
+            "eval_count": 40, "eval_duration": 270_000_000, "load_duration": 2_000_000,
+        }
+        with mock.patch.object(ollama_client, "resolve_model", return_value="phi3"), \
+                mock.patch.object(ollama_client, "get_client", return_value=client), \
+                mock.patch.object(ollama_client, "llm_metrics", metrics), \
+                self.settings(OLLAMA_KEEP_ALIVE="45m"):
+            ollama_client.chat([{"role": "user", "content": "hello"}])
+
+        self.assertEqual(client.chat.call_args.kwargs["keep_alive"], "45m")
+        with self.settings(OLLAMA_KEEP_ALIVE="-1"):
+            self.assertEqual(ollama_client._chat_kwargs({})["keep_alive"], -1)
+            self.assertEqual(ollama_client._chat_kwargs({"keep_alive": "5m"})["keep_alive"], "5m")
+        self.assertEqual(seen, [("phi3", 12)])
+        stats = metrics.stats()
+        self.assertEqual(stats["prompt_eval_share"], 0.1)
+        self.assertEqual(stats["p50"]["eval_ms"], 270.0)
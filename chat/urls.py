@@ -3,6 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     ChatMessageViewSet, AttachmentViewSet, 
     mentor_respond, mentor_respond_rag, general_inquiry,
+    mentor_respond_stream, mentor_respond_rag_stream, general_inquiry_stream,
+    mentor_cache_stats, mentor_queue_stats, mentor_llm_stats, mentor_rag_stats,
     get_topic_chat, save_topic_message
 )
 
@@ -14,6 +16,13 @@ urlpatterns = [
     path('mentor/respond/', mentor_respond, name='mentor_respond'),  # Course mentor (two-layer)
     path('mentor/rag/', mentor_respond_rag, name='mentor_respond_rag'),  # RAG mentor (vector DB)
     path('mentor/inquiry/', general_inquiry, name='general_inquiry'),  # General inquiry (New Inquiry button)
+    path('mentor/respond/stream/', mentor_respond_stream, name='mentor_respond_stream'),  # Course mentor, SSE tokens
+    path('mentor/rag/stream/', mentor_respond_rag_stream, name='mentor_respond_rag_stream'),  # RAG mentor, SSE tokens
+    path('mentor/inquiry/stream/', general_inquiry_stream, name='general_inquiry_stream'),  # General inquiry, SSE tokens
+    path('mentor/cache/stats/', mentor_cache_stats, name='mentor_cache_stats'),  # Answer cache hit/miss stats
+    path('mentor/queue/stats/', mentor_queue_stats, name='mentor_queue_stats'),  # LLM admission queue stats
+    path('mentor/llm/stats/', mentor_llm_stats, name='mentor_llm_stats'),  # Ollama prompt eval vs generation timings
+    path('mentor/rag/stats/', mentor_rag_stats, name='mentor_rag_stats'),  # RAG embedding cache stats
     path('topic/<str:course_id>/', get_topic_chat, name='get_topic_chat'),
     path('topic/<str:course_id>/<str:module_id>/', get_topic_chat, name='get_topic_chat_with_module'),
     path('topic/save/', save_topic_message, name='save_topic_message'),
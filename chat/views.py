@@ -5,10 +5,18 @@ from rest_framework.response import Response
 from django.utils import timezone
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 import json
 from .models import ChatMessage, Attachment, TopicChatMessage
 from .serializers import ChatMessageSerializer, ChatMessageCreateSerializer, AttachmentSerializer
 from courses.models import Lesson
+from mentor_engine.llm_queue import LLMBusy, get_llm_queue, user_key_for
+# save_topic_message here is the async TopicChatMessage write; this module's
+# save_topic_message is the REST endpoint
+from .streaming import (
+    INQUIRY_SYSTEM_PROMPT, course_mentor_events, get_request_user,
+    inquiry_events, rag_events, save_topic_message as asave_topic_message, session_csrf_protect, sse_response
+)
 
 # Import mentor engines
 import sys
@@ -16,8 +24,12 @@ import os
 from django.conf import settings
 sys.path.insert(0, os.path.join(settings.BASE_DIR, 'mentor_engine'))
 try:
-    from mentor import generate_response as generate_rag_response
-    RAG_MENTOR_AVAILABLE = True
+    # Cheap to import: the vector DB and embedding model load on first use (or warm_mentor)
+    from mentor_engine import mentor as rag_mentor
+    from mentor_engine.mentor import agenerate_response as agenerate_rag_response, stream_response as stream_rag_response
+    RAG_MENTOR_AVAILABLE = rag_mentor.dependencies_installed()
+    if not RAG_MENTOR_AVAILABLE:
+        RAG_MENTOR_ERROR = "chromadb and sentence-transformers are required for the RAG mentor"
 except Exception as e:
     RAG_MENTOR_AVAILABLE = False
     RAG_MENTOR_ERROR = str(e)
@@ -25,10 +37,10 @@ except Exception as e:
 try:
     # Try importing from mentor_engine first
     try:
-        from mentor_engine.course_mentor import mentor_respond as course_mentor_respond_func, load_courses
+        from mentor_engine.course_mentor import amentor_respond as course_mentor_respond_func, load_courses
     except ImportError:
         # Fallback to direct import (if sys.path was modified)
-        from course_mentor import mentor_respond as course_mentor_respond_func, load_courses
+        from course_mentor import amentor_respond as course_mentor_respond_func, load_courses
     COURSE_MENTOR_AVAILABLE = True
 except Exception as e:
     COURSE_MENTOR_AVAILABLE = False
@@ -86,11 +98,16 @@ class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = AttachmentSerializer
 
 
+# The mentor endpoints below are async views: under ASGI a request waiting
+# on Ollama holds no thread, so one process can keep many conversations open.
+# (DRF's @api_view can't wrap coroutines; authentication is the same session
+# or token lookup the DRF views used, see streaming.get_request_user, and
+# session requests need the CSRF token, see streaming.session_csrf_protect.)
+
 # Mentor Chatbot Endpoint (RAG-based - original)
-@api_view(['POST'])
-@permission_classes([AllowAny])
-@csrf_exempt
-def mentor_respond_rag(request):
+@session_csrf_protect
+@require_POST
+async def mentor_respond_rag(request):
     """Mentor chatbot endpoint using Ollama + RAG (vector DB)"""
     if not RAG_MENTOR_AVAILABLE:
         return JsonResponse({
@@ -98,16 +115,23 @@ def mentor_respond_rag(request):
         }, status=503)
     
     try:
-        data = request.data if hasattr(request, 'data') else json.loads(request.body)
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"reply": "Invalid JSON body."}, status=400)
+    
+    try:
         user_message = data.get("message", "")
         
         if not user_message:
             return JsonResponse({"reply": "Please provide a message."}, status=400)
         
         # Generate response using RAG mentor engine
-        reply = generate_rag_response(user_message)
+        user = await get_request_user(request)
+        reply = await agenerate_rag_response(user_message, user_key_for(user, request))
         
         return JsonResponse({"reply": reply})
+    except LLMBusy as e:
+        return JsonResponse({"reply": str(e)}, status=503)
     except Exception as e:
         return JsonResponse({
             "reply": f"Sorry, I encountered an error: {str(e)}"
@@ -115,10 +139,9 @@ def mentor_respond_rag(request):
 
 
 # Course Mentor Endpoint (Two-layer: Fixed Q&A + Ollama)
-@api_view(['POST'])
-@permission_classes([AllowAny])
-@csrf_exempt
-def mentor_respond(request):
+@session_csrf_protect
+@require_POST
+async def mentor_respond(request):
     """
     Course mentor endpoint with two-layer response:
     1. Fixed Q&A (immediate authoritative answers)
@@ -128,7 +151,11 @@ def mentor_respond(request):
     # The mentor_respond function handles fallbacks internally
     
     try:
-        data = request.data if hasattr(request, 'data') else json.loads(request.body)
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"reply": "Invalid JSON body.", "type": "error"}, status=400)
+    
+    try:
         course_id = data.get("course_id", "")
         module_id = data.get("module_id", None)
         question = data.get("question", "")
@@ -146,19 +173,12 @@ def mentor_respond(request):
             }, status=400)
         
         # Save user message to topic chat if user is authenticated
-        user = request.user if request.user.is_authenticated else None
+        user = await get_request_user(request)
         if user:
-            TopicChatMessage.objects.create(
-                user=user,
-                course_id=course_id,
-                module_id=module_id or "",
-                sender='user',
-                text=question,
-                time_display=timezone.now().strftime('%H:%M')
-            )
+            await asave_topic_message(user, course_id, module_id, 'user', question)
         
         # Get response from course mentor - use the imported function with different name
-        result = course_mentor_respond_func(course_id, module_id, question)
+        result = await course_mentor_respond_func(course_id, module_id, question, user_key_for(user, request))
         
         # Handle case where result might be a string (error case)
         if isinstance(result, str):
@@ -178,14 +198,7 @@ def mentor_respond(request):
         
         # Save mentor response to topic chat if user is authenticated
         if user and answer:
-            TopicChatMessage.objects.create(
-                user=user,
-                course_id=course_id,
-                module_id=module_id or "",
-                sender='nex',
-                text=answer,
-                time_display=timezone.now().strftime('%H:%M')
-            )
+            await asave_topic_message(user, course_id, module_id, 'nex', answer)
         
         # Map "answer" to "reply" for frontend compatibility
         reply = result.get("answer", "") or result.get("reply", "")
@@ -208,16 +221,19 @@ def mentor_respond(request):
 
 
 # General Inquiry Endpoint (Ollama without course context)
-@api_view(['POST'])
-@permission_classes([AllowAny])
-@csrf_exempt
-def general_inquiry(request):
+@session_csrf_protect
+@require_POST
+async def general_inquiry(request):
     """
     General inquiry endpoint for New Inquiry button
     Uses Ollama LLM directly without course context
     """
     try:
-        data = request.data if hasattr(request, 'data') else json.loads(request.body)
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"reply": "Invalid JSON body.", "type": "error"}, status=400)
+    
+    try:
         question = data.get("question", "")
         
         if not question:
@@ -226,20 +242,17 @@ def general_inquiry(request):
                 "type": "error"
             }, status=400)
         
-        # Use Ollama directly for general inquiries
+        # Use Ollama directly for general inquiries (shared async client and cached model)
         try:
-            from ollama import Client
-            ollama = Client()
-            
-            system_prompt = """You are a helpful financial advisor assistant for WealthPlay. 
-            Provide clear, practical advice about financial topics. Keep answers concise and actionable."""
+            from mentor_engine import ollama_client
             
-            response = ollama.chat(
-                model=os.environ.get("OLLAMA_MODEL", "phi3"),
+            user = await get_request_user(request)
+            response = await ollama_client.achat(
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": INQUIRY_SYSTEM_PROMPT},
                     {"role": "user", "content": question}
-                ]
+                ],
+                user_key=user_key_for(user, request)
             )
             
             answer = response.get("message", {}).get("content", "")
@@ -248,6 +261,11 @@ def general_inquiry(request):
                 "reply": answer,
                 "type": "llm"
             })
+        except LLMBusy as e:
+            return JsonResponse({
+                "reply": str(e),
+                "type": "error"
+            }, status=503)
         except Exception as e:
             return JsonResponse({
                 "reply": f"Sorry, I encountered an error connecting to Ollama: {str(e)}. Please ensure Ollama is running.",
@@ -261,6 +279,132 @@ def general_inquiry(request):
         }, status=500)
 
 
+# Streaming variants (Server-Sent Events: "token" events, then "done" or "error")
+@session_csrf_protect
+@require_POST
+async def mentor_respond_stream(request):
+    """Course mentor endpoint streaming the answer as it is generated"""
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"reply": "Invalid JSON body.", "type": "error"}, status=400)
+    course_id = data.get("course_id", "")
+    module_id = data.get("module_id", None)
+    question = data.get("question", "")
+    
+    if not question:
+        return JsonResponse({
+            "reply": "Please provide a question.",
+            "type": "error"
+        }, status=400)
+    
+    if not course_id:
+        return JsonResponse({
+            "reply": "Please provide a course_id.",
+            "type": "error"
+        }, status=400)
+    
+    user = await get_request_user(request)
+    return sse_response(course_mentor_events(user, course_id, module_id, question, user_key_for(user, request)))
+
+
+@session_csrf_protect
+@require_POST
+async def mentor_respond_rag_stream(request):
+    """RAG mentor endpoint streaming the answer as it is generated"""
+    if not RAG_MENTOR_AVAILABLE:
+        return JsonResponse({
+            "reply": "Sorry, the mentor is currently unavailable. Please check if Ollama is running and the model is installed."
+        }, status=503)
+    
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"reply": "Invalid JSON body."}, status=400)
+    user_message = data.get("message", "")
+    
+    if not user_message:
+        return JsonResponse({"reply": "Please provide a message."}, status=400)
+    
+    user = await get_request_user(request)
+    return sse_response(rag_events(user_message, stream_rag_response, user_key_for(user, request)))
+
+
+@session_csrf_protect
+@require_POST
+async def general_inquiry_stream(request):
+    """General inquiry endpoint streaming the answer as it is generated"""
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"reply": "Invalid JSON body.", "type": "error"}, status=400)
+    question = data.get("question", "")
+    
+    if not question:
+        return JsonResponse({
+            "reply": "Please provide a question.",
+            "type": "error"
+        }, status=400)
+    
+    user = await get_request_user(request)
+    return sse_response(inquiry_events(question, user_key_for(user, request)))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def mentor_cache_stats(request):
+    """Hit/miss counts and LLM seconds saved by the course mentor answer cache"""
+    from mentor_engine.answer_cache import get_answer_cache
+    from mentor_engine.course_mentor import ASYNC_GENERATIONS, GENERATIONS, STREAMS
+    
+    coalesced = {
+        "requests": GENERATIONS.stats(),
+        "async_requests": ASYNC_GENERATIONS.stats(),
+        "streams": STREAMS.stats()
+    }
+    cache = get_answer_cache()
+    if cache is None:
+        return JsonResponse({"enabled": False, "coalesced": coalesced})
+    return JsonResponse({"enabled": True, **cache.stats(), "coalesced": coalesced})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def mentor_queue_stats(request):
+    """Active/waiting LLM jobs, rejections and queue wait times"""
+    return JsonResponse(get_llm_queue().stats())
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def mentor_llm_stats(request):
+    """Ollama prompt-eval vs generation timings (is the prompt prefix being reused?)"""
+    from mentor_engine.course_mentor import prompt_prefix_count
+    from mentor_engine.llm_metrics import llm_metrics
+    
+    return JsonResponse({
+        **llm_metrics.stats(),
+        "keep_alive": getattr(settings, 'OLLAMA_KEEP_ALIVE', None),
+        "cached_prompt_prefixes": prompt_prefix_count()
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def mentor_rag_stats(request):
+    """Query embedding cache, batching, retrieval cache and stage timings of the RAG mentor"""
+    if not RAG_MENTOR_AVAILABLE:
+        return JsonResponse({"available": False})
+    return JsonResponse({
+        "available": True,
+        "loaded": rag_mentor.is_loaded(),
+        "query_embeddings": rag_mentor.query_embeddings.stats(),
+        "embedding_batches": rag_mentor.embedding_batcher.stats(),
+        "retrieval_cache": rag_mentor.retrieval_cache.stats(),
+        "retrieval_ms": rag_mentor.retrieval_timings.stats(),
+    })
+
+
 # Topic-specific chat history endpoints
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -7,12 +7,13 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 # Import the new folder-based loader
-from .load_from_folders import load_courses_from_folders, get_module_from_folder
+from .load_from_folders import load_courses_from_folders, get_module_from_folder, course_catalog
 
 
 def transform_topic_to_course(topic):
@@ -80,7 +81,7 @@ def load_courses_data():
 @permission_classes([AllowAny])
 def get_courses(request):
     """Get all courses from JSON, filtered by user level"""
-    from users.models import UserProfile, UserProgress
+    from users.models import UserProfile, UserCourseSummary
     
     # Use folder-based loading first
     courses = load_courses_from_folders()
@@ -98,6 +99,12 @@ def get_courses(request):
             user_level = profile.level
             user_xp = profile.xp
             
+            # One summary row per course, joined with the catalog in memory
+            module_progress_by_course = {
+                summary.course_id: summary.modules
+                for summary in UserCourseSummary.objects.filter(user=request.user)
+            }
+            
             # Filter courses based on level and XP
             filtered_courses = []
             for course in courses:
@@ -123,35 +130,13 @@ def get_courses(request):
                     # Default: no access
                     can_access = False
                 
-                # Calculate course progress
-                # Get modules from course - they should already be loaded from load_courses_from_folders
+                # Calculate course progress against the summaries fetched above
                 modules = course.get('modules', [])
-                # If no modules in course dict, try to load from folder structure
-                if not modules:
-                    course_id = course.get('id')
-                    if course_id:
-                        # Count modules by checking folder structure
-                        from pathlib import Path
-                        from django.conf import settings
-                        course_modules_dir = Path(settings.BASE_DIR) / 'course_modules' / course_id
-                        if course_modules_dir.exists():
-                            module_folders = [d for d in course_modules_dir.iterdir() if d.is_dir() and d.name.startswith('m')]
-                            modules = [{'id': mf.name} for mf in sorted(module_folders)]
-                
-                completed_count = 0
-                total_modules_count = len(modules) if modules else 0
-                
-                # Count completed modules
-                for mod in modules:
-                    module_id = mod.get('id') if isinstance(mod, dict) else str(mod)
-                    progress = UserProgress.objects.filter(
-                        user=request.user,
-                        course_id=course.get('id'),
-                        module_id=module_id,
-                        status='completed'
-                    ).first()
-                    if progress:
-                        completed_count += 1
+                module_progress = module_progress_by_course.get(course.get('id'), {})
+                completed_count = sum(
+                    1 for mod in modules
+                    if module_progress.get(mod.get('id'), {}).get('status') == 'completed'
+                )
                 
                 # Mark course as locked/unlocked
                 course['locked'] = not can_access
@@ -159,7 +144,7 @@ def get_courses(request):
                 course['user_level'] = user_level
                 course['user_xp'] = user_xp
                 course['completed_modules'] = completed_count
-                total_modules_count = len(modules) if modules else 0
+                total_modules_count = len(modules)
                 course['total_modules'] = total_modules_count
                 course['progress_percent'] = (completed_count / total_modules_count * 100) if total_modules_count > 0 else 0
                 
@@ -184,38 +169,17 @@ def get_courses(request):
 @permission_classes([AllowAny])
 def get_course_detail(request, course_id):
     """Get a specific course by ID from course_modules folders"""
-    # Use folder-based loading first
     courses = load_courses_from_folders()
-    if not courses:
-        courses = load_courses_data()
-    
-    # Ensure courses is a list
-    if not isinstance(courses, list):
-        return Response({"error": "Courses data is not in the expected format"}, status=500)
-    
     if not courses:
         return Response({"error": "No courses available"}, status=404)
     
-    # Find course by ID (case-insensitive match)
-    course = None
-    for c in courses:
-        if isinstance(c, dict):
-            course_id_val = c.get("id", "")
-            # Try exact match first
-            if course_id_val == course_id:
-                course = c
-                break
-            # Try case-insensitive match
-            if course_id_val.lower() == course_id.lower():
-                course = c
-                break
+    # Find course by ID (exact match first, then case-insensitive)
+    course = course_catalog.get_course(course_id, case_insensitive=True)
     
     if not course:
         # Return first course as fallback
         print(f"Course '{course_id}' not found, returning first course")
-        course = courses[0] if isinstance(courses[0], dict) else None
-        if not course:
-            return Response({"error": f"Course '{course_id}' not found"}, status=404)
+        course = courses[0]
     
     return Response(course)
 
@@ -244,9 +208,11 @@ def get_module_detail(request, course_id, module_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def submit_mcq_answer(request, module_id, mcq_id):
     """Submit MCQ answer and award XP"""
     from users.models import UserProfile
+    from users.progress_summary import refresh_course_summary
     import json
     
     # Parse module_id (format: course_id_module_id)
@@ -254,16 +220,8 @@ def submit_mcq_answer(request, module_id, mcq_id):
         course_id, module_id_only = module_id.rsplit('_', 1)
     else:
         # Try to find course by searching modules
-        courses = load_courses_data()
-        course_id = None
+        course_id = course_catalog.find_course_id(module_id)
         module_id_only = module_id
-        for course in courses:
-            for mod in course.get('modules', []):
-                if mod.get('id') == module_id:
-                    course_id = course.get('id')
-                    break
-            if course_id:
-                break
         
         if not course_id:
             return Response({"error": "Module not found"}, status=404)
@@ -333,6 +291,7 @@ def submit_mcq_answer(request, module_id, mcq_id):
     }
     progress.mcqs_progress = mcqs_progress
     progress.save()
+    refresh_course_summary(request.user, course_id)
     
     # Get AI feedback
     ai_feedback = mcq.get('ai_feedback', {})
@@ -359,16 +318,8 @@ def get_all_flash_cards(request, module_id):
         course_id, module_id_only = module_id.rsplit('_', 1)
     else:
         # Try to find course by searching modules
-        courses = load_courses_data()
-        course_id = None
+        course_id = course_catalog.find_course_id(module_id)
         module_id_only = module_id
-        for course in courses:
-            for mod in course.get('modules', []):
-                if mod.get('id') == module_id:
-                    course_id = course.get('id')
-                    break
-            if course_id:
-                break
         
         if not course_id:
             return Response({"error": "Module not found"}, status=404)
@@ -488,17 +439,8 @@ def get_plaque_card_content(request, module_id):
     except ModuleContent.DoesNotExist:
         # Try to get module from JSON as fallback
         try:
-            courses = load_courses_data()
             course_id, module_id_only = module_id.rsplit('_', 1) if '_' in module_id else (None, module_id)
-            
-            module = None
-            for course in courses:
-                if course.get('id') == course_id:
-                    for mod in course.get('modules', []):
-                        if mod.get('id') == module_id_only:
-                            module = mod
-                            break
-                    break
+            module = course_catalog.get_module(course_id, module_id_only)
             
             if module:
                 # Create basic flash card from module data
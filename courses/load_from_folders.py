@@ -1,8 +1,13 @@
 """
 Load course content from course_modules folder structure
+
+The folder tree is parsed once per process into a CourseCatalog. Later calls
+only re-stat the JSON files (at most every COURSE_CATALOG_CHECK_INTERVAL
+seconds) and re-read the ones whose mtime or size changed.
 """
 import json
-import os
+import threading
+import time
 from pathlib import Path
 from django.conf import settings
 
@@ -33,177 +38,262 @@ COURSE_FOLDER_MAP = {
 BASE_DIR = Path(settings.BASE_DIR)
 COURSE_MODULES_DIR = BASE_DIR / 'course_modules'
 
+MODULE_FILES = ('flash_cards.json', 'mcqs.json', 'qna.json')
 
-def load_courses_from_folders():
-    """Load all courses from course_modules folder structure"""
-    courses = []
-    
-    if not COURSE_MODULES_DIR.exists():
-        print(f"Course modules directory not found: {COURSE_MODULES_DIR}")
-        return courses
-    
-    for course_folder in sorted(COURSE_MODULES_DIR.iterdir()):
-        if not course_folder.is_dir():
-            continue
-        
-        course_id = course_folder.name
-        course_info = COURSE_FOLDER_MAP.get(course_id, {
-            "title": course_id.replace('-', ' ').title(),
-            "level": "Beginner"
-        })
-        
-        modules = []
-        module_order = 1
-        
-        # Load all modules in this course
-        for module_folder in sorted(course_folder.iterdir()):
-            if not module_folder.is_dir():
+
+def get_course_info(course_id):
+    """Title and level for a course folder, falling back to the folder name"""
+    return COURSE_FOLDER_MAP.get(course_id, {
+        "title": course_id.replace('-', ' ').title(),
+        "level": "Beginner"
+    })
+
+
+def normalize_qna(qna):
+    """Transform qna.json items to the {"q", "a", "explanation"} format"""
+    if qna and isinstance(qna[0], dict):
+        if 'question' in qna[0] and 'answer' in qna[0]:
+            return [{"q": item.get('question'), "a": item.get('answer'), "explanation": item.get('explanation', '')} for item in qna]
+    return qna
+
+
+def get_module_title(module_id, flash_cards):
+    """Extract title from first flash card or use module_id"""
+    module_title = module_id.upper().replace('-', ' ').replace('_', ' ')
+    if flash_cards and len(flash_cards) > 0:
+        first_card = flash_cards[0]
+        module_title = first_card.get('theory_title') or first_card.get('topic') or module_title
+    return module_title
+
+
+def copy_json(value):
+    """Deep copy of parsed JSON (dicts, lists and scalars); much faster than copy.deepcopy"""
+    if isinstance(value, dict):
+        return {key: copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_json(item) for item in value]
+    return value
+
+
+class CourseCatalog:
+    """
+    Process-wide in-memory index of the course_modules tree.
+
+    Parsed JSON is kept per file together with its (mtime, size) signature,
+    so a refresh only re-reads files that actually changed on disk. Courses
+    and modules are indexed by id; readers get deep copies (plain JSON, so
+    copying costs well under a millisecond for the whole tree) and views can
+    annotate or edit them (locked, status, ...) without touching the shared
+    copy.
+    """
+
+    def __init__(self, root, check_interval=None):
+        self.root = Path(root)
+        if check_interval is None:
+            check_interval = getattr(settings, 'COURSE_CATALOG_CHECK_INTERVAL', 2.0)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._files = {}  # path -> (mtime_ns, size, parsed data)
+        self._layout = None  # ((course_id, (module_id, ...)), ...)
+        self._courses = []
+        self._courses_by_id = {}
+        self._courses_by_lower_id = {}
+        self._modules_by_id = {}  # (course_id, module_id) -> module
+        self._course_id_by_module_id = {}
+        self._checked_at = None
+        self.file_reads = 0
+
+    # ---- refresh ----
+
+    def refresh(self, force=False):
+        """Re-stat the tree if the check interval elapsed; re-read changed files only"""
+        if not force and self._is_fresh():
+            return
+        with self._lock:
+            if not force and self._is_fresh():
+                return
+            self._scan()
+            self._checked_at = time.monotonic()
+
+    def _is_fresh(self):
+        return (
+            self._checked_at is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    def _scan(self):
+        if not self.root.exists():
+            print(f"Course modules directory not found: {self.root}")
+            self._files = {}
+            self._build(())
+            self._layout = ()
+            return
+
+        layout = []
+        seen = set()
+        changed = False
+        for course_folder in sorted(self.root.iterdir()):
+            if not course_folder.is_dir():
                 continue
-            
-            module_id = module_folder.name
-            
-            # Load module content files
-            flash_cards_file = module_folder / 'flash_cards.json'
-            mcqs_file = module_folder / 'mcqs.json'
-            qna_file = module_folder / 'qna.json'
-            
-            # Read flash cards
-            flash_cards = []
-            if flash_cards_file.exists():
-                try:
-                    with open(flash_cards_file, 'r', encoding='utf-8') as f:
-                        flash_cards = json.load(f)
-                except Exception as e:
-                    print(f"Error reading flash_cards.json for {course_id}/{module_id}: {e}")
-            
-            # Read MCQs
-            mcqs = []
-            if mcqs_file.exists():
-                try:
-                    with open(mcqs_file, 'r', encoding='utf-8') as f:
-                        mcqs = json.load(f)
-                except Exception as e:
-                    print(f"Error reading mcqs.json for {course_id}/{module_id}: {e}")
-            
-            # Read Q&A
-            qna = []
-            if qna_file.exists():
-                try:
-                    with open(qna_file, 'r', encoding='utf-8') as f:
-                        qna = json.load(f)
-                        # Transform to expected format
-                        if qna and isinstance(qna[0], dict):
-                            if 'question' in qna[0] and 'answer' in qna[0]:
-                                qna = [{"q": item.get('question'), "a": item.get('answer'), "explanation": item.get('explanation', '')} for item in qna]
-                except Exception as e:
-                    print(f"Error reading qna.json for {course_id}/{module_id}: {e}")
-            
-            # Extract title from first flash card or use module_id
-            # Also check if there's a metadata file or use folder name
-            module_title = module_id.upper().replace('-', ' ').replace('_', ' ')
-            if flash_cards and len(flash_cards) > 0:
-                first_card = flash_cards[0]
-                module_title = first_card.get('theory_title') or first_card.get('topic') or module_title
-            
-            # Build module object
-            module = {
-                'id': module_id,
-                'title': module_title,
-                'summary': qna[0].get('a', '')[:200] if qna else '',
-                'order': module_order,
-                'flash_cards': flash_cards,
-                'mcqs': mcqs,
-                'fixed_qna': qna,
-                'xp_reward': 50 + (module_order * 25),  # Default XP reward
+            module_ids = []
+            for module_folder in sorted(course_folder.iterdir()):
+                if not module_folder.is_dir():
+                    continue
+                module_ids.append(module_folder.name)
+                for filename in MODULE_FILES:
+                    path = module_folder / filename
+                    seen.add(path)
+                    if self._stat_and_load(path):
+                        changed = True
+            layout.append((course_folder.name, tuple(module_ids)))
+
+        for path in list(self._files):
+            if path not in seen:
+                del self._files[path]
+                changed = True
+
+        layout = tuple(layout)
+        if changed or layout != self._layout:
+            self._build(layout)
+            self._layout = layout
+
+    def _stat_and_load(self, path):
+        """Reload path if its signature changed. Returns True if cached data changed."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return self._files.pop(path, None) is not None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(path)
+        if cached is not None and cached[:2] == signature:
+            return False
+
+        data = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.file_reads += 1
+        except Exception as e:
+            print(f"Error reading {path.name} for {path.parent.parent.name}/{path.parent.name}: {e}")
+        if path.name == 'qna.json':
+            data = normalize_qna(data)
+        self._files[path] = (signature[0], signature[1], data)
+        return True
+
+    def _file_data(self, course_id, module_id, filename):
+        cached = self._files.get(self.root / course_id / module_id / filename)
+        return cached[2] if cached is not None else []
+
+    def _build(self, layout):
+        courses = []
+        courses_by_id = {}
+        modules_by_id = {}
+        course_id_by_module_id = {}
+
+        for course_id, module_ids in layout:
+            course_info = get_course_info(course_id)
+            modules = []
+            for module_order, module_id in enumerate(module_ids, start=1):
+                flash_cards = self._file_data(course_id, module_id, 'flash_cards.json')
+                mcqs = self._file_data(course_id, module_id, 'mcqs.json')
+                qna = self._file_data(course_id, module_id, 'qna.json')
+                module = {
+                    'id': module_id,
+                    'title': get_module_title(module_id, flash_cards),
+                    'summary': qna[0].get('a', '')[:200] if qna else '',
+                    'order': module_order,
+                    'flash_cards': flash_cards,
+                    'mcqs': mcqs,
+                    'fixed_qna': qna,
+                    'xp_reward': 50 + (module_order * 25),  # Default XP reward
+                }
+                modules.append(module)
+                modules_by_id[(course_id, module_id)] = module
+                course_id_by_module_id.setdefault(module_id, course_id)
+
+            # Normalize level to lowercase for consistency
+            course_level = course_info['level'].lower() if course_info.get('level') else 'beginner'
+            course = {
+                'id': course_id,
+                'title': course_info['title'],
+                'level': course_level,
+                'xp_to_unlock': 0 if course_level == 'beginner' else (750 if course_level == 'intermediate' else 1200),
+                'modules': modules,
+                'source': 'course_modules'
             }
-            
-            modules.append(module)
-            module_order += 1
-        
-        # Build course object
-        # Normalize level to lowercase for consistency
-        course_level = course_info['level'].lower() if course_info.get('level') else 'beginner'
-        course = {
-            'id': course_id,
-            'title': course_info['title'],
-            'level': course_level,
-            'xp_to_unlock': 0 if course_level == 'beginner' else (750 if course_level == 'intermediate' else 1200),
-            'modules': modules,
-            'source': 'course_modules'
-        }
-        
-        courses.append(course)
-    
-    return courses
+            courses.append(course)
+            courses_by_id[course_id] = course
+
+        self._courses = courses
+        self._courses_by_id = courses_by_id
+        self._courses_by_lower_id = {}
+        for course in courses:
+            self._courses_by_lower_id.setdefault(course['id'].lower(), course)
+        self._modules_by_id = modules_by_id
+        self._course_id_by_module_id = course_id_by_module_id
+
+    # ---- lookups ----
+
+    def courses(self):
+        """All courses, in folder order"""
+        self.refresh()
+        return [copy_json(c) for c in self._courses]
+
+    def get_course(self, course_id, case_insensitive=False):
+        """A course by id, or None"""
+        self.refresh()
+        course = self._courses_by_id.get(course_id)
+        if course is None and case_insensitive and course_id:
+            course = self._courses_by_lower_id.get(course_id.lower())
+        return copy_json(course) if course is not None else None
+
+    def get_module(self, course_id, module_id):
+        """A module as listed in its course, or None"""
+        self.refresh()
+        module = self._modules_by_id.get((course_id, module_id))
+        return copy_json(module) if module is not None else None
+
+    def find_course_id(self, module_id):
+        """Id of the first course (in folder order) that has a module with this id"""
+        self.refresh()
+        return self._course_id_by_module_id.get(module_id)
+
+
+course_catalog = CourseCatalog(COURSE_MODULES_DIR)
+
+
+def load_courses_from_folders():
+    """Load all courses from course_modules folder structure"""
+    return course_catalog.courses()
 
 
 def get_module_from_folder(course_id, module_id):
     """Get a specific module from course_modules folder"""
-    module_path = COURSE_MODULES_DIR / course_id / module_id
-    
-    if not module_path.exists():
+    module = course_catalog.get_module(course_id, module_id)
+    if module is None:
         return None
-    
-    # Load all module files
-    flash_cards = []
-    mcqs = []
-    qna = []
-    
-    flash_cards_file = module_path / 'flash_cards.json'
-    if flash_cards_file.exists():
-        try:
-            with open(flash_cards_file, 'r', encoding='utf-8') as f:
-                flash_cards = json.load(f)
-        except Exception as e:
-            print(f"Error reading flash_cards.json: {e}")
-    
-    mcqs_file = module_path / 'mcqs.json'
-    if mcqs_file.exists():
-        try:
-            with open(mcqs_file, 'r', encoding='utf-8') as f:
-                mcqs = json.load(f)
-        except Exception as e:
-            print(f"Error reading mcqs.json: {e}")
-    
-    qna_file = module_path / 'qna.json'
-    if qna_file.exists():
-        try:
-            with open(qna_file, 'r', encoding='utf-8') as f:
-                qna_data = json.load(f)
-                # Transform to expected format
-                if qna_data and isinstance(qna_data[0], dict):
-                    if 'question' in qna_data[0] and 'answer' in qna_data[0]:
-                        qna = [{"q": item.get('question'), "a": item.get('answer'), "explanation": item.get('explanation', '')} for item in qna_data]
-                    else:
-                        qna = qna_data
-        except Exception as e:
-            print(f"Error reading qna.json: {e}")
-    
-    # Extract module title
-    module_title = module_id.upper().replace('-', ' ').replace('_', ' ')
-    if flash_cards and len(flash_cards) > 0:
-        first_card = flash_cards[0]
-        module_title = first_card.get('theory_title') or first_card.get('topic') or module_title
-    
+
+    flash_cards = module['flash_cards']
+
     # Get theory text from first flash card
     theory_text = ''
     if flash_cards and len(flash_cards) > 0:
         theory_text = flash_cards[0].get('theory_content', '')
-    
-    course_info = COURSE_FOLDER_MAP.get(course_id, {"title": course_id.replace('-', ' ').title(), "level": "Beginner"})
-    
+
+    course_info = get_course_info(course_id)
+
     return {
         'id': module_id,
-        'title': module_title,
-        'summary': qna[0].get('a', '')[:200] if qna else '',
+        'title': module['title'],
+        'summary': module['summary'],
         'theory_text': theory_text,
         'flash_cards': flash_cards,
-        'mcqs': mcqs,
-        'fixed_qna': qna,
+        'mcqs': module['mcqs'],
+        'fixed_qna': module['fixed_qna'],
         'xp_reward': 50,
     }, {
         'id': course_id,
         'title': course_info['title'],
         'level': course_info['level'],
     }
-
@@ -1,3 +1,161 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from courses.load_from_folders import CourseCatalog
+from users.models import UserCourseSummary, UserProfile, UserProgress
+from users.progress_summary import rebuild_course_summaries
+
+
+def write_course_tree(root, course_count, modules_per_course=3):
+    """Create course_modules/<course>/<module>/*.json under root"""
+    for c in range(course_count):
+        for m in range(1, modules_per_course + 1):
+            module_dir = Path(root) / f'course-{c:02d}' / f'm{m}'
+            module_dir.mkdir(parents=True)
+            (module_dir / 'flash_cards.json').write_text(json.dumps([{'id': 1, 'topic': f'Topic {m}'}]))
+            (module_dir / 'mcqs.json').write_text(json.dumps([]))
+            (module_dir / 'qna.json').write_text(json.dumps([{'question': 'Q?', 'answer': 'A.'}]))
+
+
+
+class CourseCatalogTests(TestCase):
+    """The catalog re-reads changed files after the check interval and hands out private copies"""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        write_course_tree(self.root, course_count=1, modules_per_course=2)
+        self.now = 1000.0
+        patcher = mock.patch('courses.load_from_folders.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.catalog = CourseCatalog(self.root, check_interval=5)
+
+    def questions(self, module_id):
+        return [qa['q'] for qa in self.catalog.get_module('course-00', module_id)['fixed_qna']]
+
+    def test_copies_do_not_share_state_with_the_cache(self):
+        course = self.catalog.get_course('course-00')
+        course['modules'][0]['fixed_qna'].append({'q': 'Injected?', 'a': 'No.'})
+        course['modules'][0]['flash_cards'][0]['topic'] = 'Changed'
+        course['modules'].pop()
+        self.catalog.courses()[0]['modules'][0]['mcqs'].append({})
+
+        fresh = self.catalog.get_course('course-00')
+        self.assertEqual(len(fresh['modules']), 2)
+        self.assertEqual(self.questions('m1'), ['Q?'])
+        self.assertEqual(fresh['modules'][0]['flash_cards'][0]['topic'], 'Topic 1')
+        self.assertEqual(fresh['modules'][0]['mcqs'], [])
+
+    def test_qna_changes_are_picked_up_after_the_check_interval(self):
+        self.assertEqual(self.questions('m1'), ['Q?'])
+        (self.root / 'course-00' / 'm1' / 'qna.json').write_text(json.dumps([
+            {'question': 'Edited?', 'answer': 'Yes.'}, {'question': 'Added?', 'answer': 'Yes.'},
+        ]))
+        (self.root / 'course-00' / 'm2' / 'qna.json').unlink()
+
+        self.now += 1
+        self.assertEqual(self.questions('m1'), ['Q?'])  # still within the interval
+        self.now += 5
+        self.assertEqual(self.questions('m1'), ['Edited?', 'Added?'])
+        self.assertEqual(self.questions('m2'), [])
+
+class CourseSummaryTests(TestCase):
+    """Progress views keep UserCourseSummary current; a rebuild reproduces it"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        write_course_tree(root, course_count=2)
+        catalog = CourseCatalog(root)
+        catalog.refresh()
+        patcher = mock.patch('users.progress_summary.course_catalog', catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def summary_rows(self):
+        return list(
+            UserCourseSummary.objects.order_by('user_id', 'course_id')
+            .values('user_id', 'course_id', 'completed_modules', 'total_modules', 'xp_earned', 'last_activity', 'modules')
+        )
+
+    def test_views_update_the_summary_and_rebuild_matches(self):
+        for name in ('first', 'second'):
+            user = User.objects.create_user(username=name, password='secret123')
+            client = APIClient()
+            client.force_authenticate(user)
+            for course_id, module_id in [('course-00', 'm1'), ('course-00', 'm2'), ('course-01', 'm3')]:
+                response = client.post('/api/users/progress/flashcards/flip/', {
+                    'course_id': course_id, 'module_id': module_id, 'flashcard_id': 1,
+                }, format='json')
+                self.assertEqual(response.status_code, 200)
+            response = client.post('/api/users/progress/module/complete/', {'course_id': 'course-00', 'module_id': 'm2'}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        summary = UserCourseSummary.objects.get(user__username='first', course_id='course-00')
+        self.assertEqual((summary.completed_modules, summary.total_modules, summary.xp_earned), (1, 3, 25 + 25 + 50))
+        self.assertEqual(summary.modules['m2']['status'], 'completed')
+        self.assertEqual(summary.modules['m1']['status'], 'in_progress')
+
+        incremental = self.summary_rows()
+        self.assertEqual(len(incremental), 4)
+        self.assertEqual(rebuild_course_summaries(batch_size=3), 4)
+        self.assertEqual(self.summary_rows(), incremental)
+
+class GetCoursesQueryCountTests(TestCase):
+    """get_courses must not issue per-course or per-module progress queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='learner', password='secret123')
+        UserProfile.objects.create(user=self.user, xp=2000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fetch_courses(self, course_count):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        write_course_tree(root, course_count)
+        catalog = CourseCatalog(root)
+        catalog.refresh()
+
+        with mock.patch('courses.load_from_folders.course_catalog', catalog):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/courses/json/')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_query_count_is_independent_of_course_count(self):
+        UserProgress.objects.create(user=self.user, course_id='course-00', module_id='m1', status='completed')
+        UserProgress.objects.create(user=self.user, course_id='course-00', module_id='m2', status='in_progress')
+        rebuild_course_summaries()
+
+        small, small_queries = self.fetch_courses(1)
+        large, large_queries = self.fetch_courses(25)
+
+        self.assertEqual(len(small), 1)
+        self.assertEqual(len(large), 25)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_completed_modules_are_counted_per_course(self):
+        UserProgress.objects.create(user=self.user, course_id='course-00', module_id='m1', status='completed')
+        UserProgress.objects.create(user=self.user, course_id='course-00', module_id='m3', status='completed')
+        UserProgress.objects.create(user=self.user, course_id='course-01', module_id='m2', status='in_progress')
+        # Progress for a module that is no longer in the catalog is ignored
+        UserProgress.objects.create(user=self.user, course_id='course-01', module_id='m9', status='completed')
+        rebuild_course_summaries()
+
+        courses, _ = self.fetch_courses(2)
+        by_id = {c['id']: c for c in courses}
 
-# Create your tests here.
+        self.assertEqual(by_id['course-00']['completed_modules'], 2)
+        self.assertEqual(by_id['course-00']['total_modules'], 3)
+        self.assertEqual(by_id['course-01']['completed_modules'], 0)
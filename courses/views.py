@@ -6,12 +6,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.http import JsonResponse
+from django.db import transaction
 from django.utils import timezone
 from .models import Course, Topic, Lesson, MentorPersona
 from .serializers import CourseSerializer, TopicSerializer, LessonSerializer, MentorPersonaSerializer
 from .course_views import load_courses_data, get_course_detail, get_module_detail
-from .load_from_folders import load_courses_from_folders
-from users.models import UserProgress, UserProfile
+from .load_from_folders import course_catalog
+from users.models import UserProgress, UserProfile, UserCourseSummary
+from users.progress_summary import refresh_course_summary
 import json
 
 
@@ -62,17 +64,11 @@ def get_courses_with_progress(request):
         user_level = 'beginner'
         user_xp = 0
     
-    # Get all user progress
+    # Get all user progress from the per-course summaries (one row per course)
     user_progress = {}
-    progress_records = UserProgress.objects.filter(user=request.user)
-    for p in progress_records:
-        if p.course_id and p.module_id:
-            key = f"{p.course_id}_{p.module_id}"
-            user_progress[key] = {
-                'status': p.status,
-                'xp_awarded': p.xp_awarded,
-                'completed_at': p.completed_at.isoformat() if p.completed_at else None
-            }
+    for summary in UserCourseSummary.objects.filter(user=request.user):
+        for module_id, module_progress in summary.modules.items():
+            user_progress[f"{summary.course_id}_{module_id}"] = module_progress
     
     # Add progress and unlock status to courses
     for course in courses:
@@ -104,15 +100,15 @@ def get_courses_with_progress(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def start_lesson(request, course_id, module_id):
     """Mark lesson as started and return lesson content"""
-    courses = load_courses_data()
-    course = next((c for c in courses if c.get('id') == course_id), None)
+    course = course_catalog.get_course(course_id)
     
     if not course:
         return Response({'error': 'Course not found'}, status=404)
     
-    module = next((m for m in course.get('modules', []) if m.get('id') == module_id), None)
+    module = course_catalog.get_module(course_id, module_id)
     if not module:
         return Response({'error': 'Module not found'}, status=404)
     
@@ -126,6 +122,7 @@ def start_lesson(request, course_id, module_id):
             'started_at': timezone.now() if created else None
         }
     )
+    refresh_course_summary(request.user, course_id)
     
     # Return lesson content
     return Response({
@@ -144,18 +141,15 @@ def start_lesson(request, course_id, module_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def complete_lesson(request, course_id, module_id):
     """Mark lesson as completed, award XP, and unlock next lessons"""
-    # Use folder-based loading first
-    courses = load_courses_from_folders()
-    if not courses:
-        courses = load_courses_data()
-    course = next((c for c in courses if c.get('id') == course_id), None)
+    course = course_catalog.get_course(course_id)
     
     if not course:
         return Response({'error': 'Course not found'}, status=404)
     
-    module = next((m for m in course.get('modules', []) if m.get('id') == module_id), None)
+    module = course_catalog.get_module(course_id, module_id)
     if not module:
         return Response({'error': 'Module not found'}, status=404)
     
@@ -195,6 +189,7 @@ def complete_lesson(request, course_id, module_id):
                 module_id=next_module['id'],
                 defaults={'status': 'unlocked'}
             )
+    refresh_course_summary(request.user, course_id)
     
     return Response({
         'status': 'completed',
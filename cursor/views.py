@@ -3,7 +3,7 @@ Cursor API endpoints for Nex mentor interactions
 """
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_POST, require_http_methods
 from django.utils.decorators import method_decorator
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -14,9 +14,11 @@ import json
 from .mentor_engine import NexMentorEngine, add_disclaimer
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])  # Adjust based on your auth requirements
-def explain(request):
+# Async so that under ASGI it runs on the event loop instead of queueing for
+# Django's single sync thread behind slower views; the engine does no I/O.
+@csrf_exempt
+@require_POST
+async def explain(request):
     """
     POST /api/cursor/explain
     
@@ -60,13 +62,13 @@ def explain(request):
     }
     """
     try:
-        data = request.data if hasattr(request, 'data') else json.loads(request.body)
+        data = json.loads(request.body or b"{}")
         
         # Validate required fields
         required_fields = ['action', 'lesson_id']
         for field in required_fields:
             if field not in data:
-                return Response(
+                return JsonResponse(
                     {'error': f'Missing required field: {field}'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
@@ -80,15 +82,15 @@ def explain(request):
         # Add disclaimer
         response = add_disclaimer(response)
         
-        return Response(response, status=status.HTTP_200_OK)
+        return JsonResponse(response, status=status.HTTP_200_OK)
         
     except json.JSONDecodeError:
-        return Response(
+        return JsonResponse(
             {'error': 'Invalid JSON in request body'},
             status=status.HTTP_400_BAD_REQUEST
         )
     except Exception as e:
-        return Response(
+        return JsonResponse(
             {'error': f'Internal server error: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
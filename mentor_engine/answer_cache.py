@@ -0,0 +1,349 @@
+"""
+Answer cache for LLM mentor responses
+
+Answers are keyed by (course_id, module_id, normalized question), so
+"What is SIP" and "what's a SIP?" share one Ollama generation. With
+SIMILARITY set, a miss on the exact key also checks embeddings of the
+questions already cached for the same module and reuses the closest answer
+above that cosine similarity.
+
+Entries expire after TTL seconds and the least recently used are evicted
+past MAX_ENTRIES. The backend is 'memory' (per process) or 'sqlite' (a
+separate SQLite file shared by every worker). Configured by the
+MENTOR_ANSWER_CACHE setting.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from django.conf import settings
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Contractions and filler words that don't change what is being asked
+CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "how's": "how is", "who's": "who is",
+    "where's": "where is", "it's": "it is", "that's": "that is", "there's": "there is",
+    "isn't": "is not", "aren't": "are not", "don't": "do not", "doesn't": "does not",
+    "can't": "cannot", "i'm": "i am", "should've": "should have",
+}
+FILLER_WORDS = {"a", "an", "the", "please", "pls", "um", "uh"}
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def normalize_question(question):
+    """Lowercase words without punctuation, contractions or filler words"""
+    words = []
+    for word in _WORD_RE.findall((question or "").lower().replace("’", "'")):
+        word = CONTRACTIONS.get(word, word)
+        for part in word.split():
+            part = part.strip("'")
+            if part and part not in FILLER_WORDS:
+                words.append(part)
+    return " ".join(words)
+
+
+@dataclass
+class CacheKey:
+    course_id: str
+    module_id: str
+    question: str                            # normalized
+    embedding: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def scope(self):
+        return (self.course_id, self.module_id)
+
+    @property
+    def id(self):
+        return (self.course_id, self.module_id, self.question)
+
+
+class MemoryBackend:
+    """In-process LRU dict"""
+    name = "memory"
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (course_id, module_id, question) -> entry
+        self._lock = threading.Lock()
+
+    def get(self, key_id):
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is not None:
+                self._entries.move_to_end(key_id)
+            return entry
+
+    def set(self, key_id, entry):
+        """Store entry; returns how many entries were evicted"""
+        with self._lock:
+            self._entries[key_id] = entry
+            self._entries.move_to_end(key_id)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key_id):
+        with self._lock:
+            self._entries.pop(key_id, None)
+
+    def scope_embeddings(self, scope):
+        """[(key_id, embedding)] for cached questions in one (course_id, module_id)"""
+        with self._lock:
+            return [
+                (key_id, entry["embedding"]) for key_id, entry in self._entries.items()
+                if key_id[:2] == scope and entry.get("embedding") is not None
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """LRU table in its own SQLite file, shared by every worker process"""
+    name = "sqlite"
+
+    def __init__(self, path, max_entries=2000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mentor_answer_cache (
+                    course_id TEXT NOT NULL,
+                    module_id TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    source TEXT NOT NULL DEFAULT '',
+                    gen_seconds REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    embedding BLOB,
+                    PRIMARY KEY (course_id, module_id, question)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS mentor_answer_cache_lru ON mentor_answer_cache (last_used)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_entry(row):
+        answer, source, gen_seconds, created_at, embedding = row
+        return {
+            "answer": answer,
+            "source": source,
+            "gen_seconds": gen_seconds,
+            "created_at": created_at,
+            "embedding": np.frombuffer(embedding, dtype=np.float32) if embedding else None,
+        }
+
+    def get(self, key_id):
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT answer, source, gen_seconds, created_at, embedding FROM mentor_answer_cache "
+                "WHERE course_id = ? AND module_id = ? AND question = ?", key_id
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE mentor_answer_cache SET last_used = ? "
+                "WHERE course_id = ? AND module_id = ? AND question = ?", (time.time(),) + key_id
+            )
+        return self._row_entry(row)
+
+    def set(self, key_id, entry):
+        embedding = entry.get("embedding")
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO mentor_answer_cache "
+                "(course_id, module_id, question, answer, source, gen_seconds, created_at, last_used, embedding) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key_id + (
+                    entry["answer"], entry.get("source", ""), entry.get("gen_seconds", 0),
+                    entry["created_at"], time.time(),
+                    np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None,
+                )
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM mentor_answer_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM mentor_answer_cache WHERE rowid IN "
+                    "(SELECT rowid FROM mentor_answer_cache ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                return excess
+        return 0
+
+    def delete(self, key_id):
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM mentor_answer_cache WHERE course_id = ? AND module_id = ? AND question = ?", key_id
+            )
+
+    def scope_embeddings(self, scope):
+        rows = self._connection().execute(
+            "SELECT question, embedding FROM mentor_answer_cache "
+            "WHERE course_id = ? AND module_id = ? AND embedding IS NOT NULL", scope
+        ).fetchall()
+        return [(scope + (question,), np.frombuffer(blob, dtype=np.float32)) for question, blob in rows]
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM mentor_answer_cache")
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM mentor_answer_cache").fetchone()[0]
+
+
+def load_embedder(model_name=EMBEDDING_MODEL_NAME):
+    """encode(text) -> unit float32 vector, or None if sentence-transformers is unavailable"""
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+    except Exception as e:
+        print(f"Answer cache: semantic tier disabled ({e})")
+        return None
+
+    def encode(text):
+        return np.asarray(model.encode(text, normalize_embeddings=True), dtype=np.float32)
+    return encode
+
+
+class AnswerCache:
+    """Exact (normalized) and optional semantic lookup over a backend, with hit/miss stats"""
+
+    def __init__(self, backend, ttl=7 * 24 * 3600, similarity=None, embed=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embed = embed if similarity else None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0,
+                       "llm_seconds_saved": 0.0}
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self._stats[name] += amount
+
+    def _fresh(self, key_id, entry):
+        if entry is None:
+            return None
+        if self.ttl and time.time() - entry["created_at"] > self.ttl:
+            self.backend.delete(key_id)
+            self._count(expired=1)
+            return None
+        return entry
+
+    def lookup(self, course_id, module_id, question):
+        """
+        (entry, key). entry is the cached answer dict (with "match": "exact"
+        or "semantic") or None; pass key to store() after generating.
+        """
+        key = CacheKey(course_id or "", module_id or "", normalize_question(question))
+        entry = self._fresh(key.id, self.backend.get(key.id))
+        if entry is not None:
+            self._count(hits=1, llm_seconds_saved=entry.get("gen_seconds", 0))
+            return dict(entry, match="exact"), key
+
+        if self.embed is not None and key.question:
+            key.embedding = self.embed(key.question)
+            best_id, best_score = None, self.similarity
+            for key_id, embedding in self.backend.scope_embeddings(key.scope):
+                if embedding.shape != key.embedding.shape:
+                    continue
+                score = float(np.dot(embedding, key.embedding))
+                if score >= best_score:
+                    best_id, best_score = key_id, score
+            if best_id is not None:
+                entry = self._fresh(best_id, self.backend.get(best_id))
+                if entry is not None:
+                    self._count(hits=1, semantic_hits=1, llm_seconds_saved=entry.get("gen_seconds", 0))
+                    return dict(entry, match="semantic", similarity=best_score), key
+
+        self._count(misses=1)
+        return None, key
+
+    def store(self, key, answer, source="", gen_seconds=0.0):
+        if key is None or not key.question or not answer:
+            return
+        if self.embed is not None and key.embedding is None:
+            key.embedding = self.embed(key.question)
+        evicted = self.backend.set(key.id, {
+            "answer": answer,
+            "source": source,
+            "gen_seconds": gen_seconds,
+            "created_at": time.time(),
+            "embedding": key.embedding,
+        })
+        self._count(stores=1, evictions=evicted)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["llm_seconds_saved"] = round(stats["llm_seconds_saved"], 3)
+        stats["entries"] = len(self.backend)
+        stats["backend"] = self.backend.name
+        stats["semantic"] = self.embed is not None
+        return stats
+
+    def clear(self):
+        self.backend.clear()
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def build_answer_cache(config):
+    max_entries = config.get("MAX_ENTRIES", 2000)
+    if config.get("BACKEND", "memory") == "sqlite":
+        path = config.get("PATH") or os.path.join(settings.BASE_DIR, "mentor_answer_cache.sqlite3")
+        backend = SQLiteBackend(path, max_entries)
+    else:
+        backend = MemoryBackend(max_entries)
+
+    similarity = config.get("SIMILARITY")
+    embed = load_embedder() if similarity else None
+    return AnswerCache(backend, ttl=config.get("TTL", 7 * 24 * 3600), similarity=similarity if embed else None, embed=embed)
+
+
+def get_answer_cache():
+    """The process-wide AnswerCache from settings.MENTOR_ANSWER_CACHE, or None if disabled"""
+    global _answer_cache
+    config = getattr(settings, "MENTOR_ANSWER_CACHE", {})
+    if not config.get("ENABLED", True):
+        return None
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = build_answer_cache(config)
+    return _answer_cache
+
+
+def reset_answer_cache():
+    """Forget the process-wide cache (settings changed, tests)"""
+    global _answer_cache
+    with _answer_cache_lock:
+        _answer_cache = None
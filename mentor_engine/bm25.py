@@ -0,0 +1,168 @@
+"""
+BM25 keyword index for the RAG mentor
+
+Dense embeddings blur exact terms such as "80C", "ELSS" or "CIBIL", which
+appear verbatim in the course content. This index scores chunks by Okapi
+BM25 over their words so those queries still find the right chunk; the
+HybridRetriever in retrievers.py fuses it with the vector search.
+
+The index is built by build_mentor_index from the same chunks as the
+vector index and saved as JSON (vector_db/bm25_index.json). Each term keeps
+an inverted list of (chunk row, precomputed BM25 weight), so a query costs
+one NumPy scatter-add per query term.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from mentor_engine.retrievers import RetrievedChunk, top_k
+
+K1 = 1.5
+B = 0.75
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it its me my of on or so
+that the their them this to was we what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercased words and numbers minus stopwords ("Section 80C?" -> ["section", "80c"])"""
+    return [token for token in _TOKEN_RE.findall((text or "").casefold()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    name = "bm25"
+
+    def __init__(self, ids, documents, metadatas, postings, version=""):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.postings = postings    # term -> (int32 rows, float32 weights)
+        self.version = version
+
+    @classmethod
+    def build(cls, ids, documents, metadatas=None, k1=K1, b=B):
+        metadatas = metadatas or [{} for _ in ids]
+        term_counts = [Counter(tokenize(document)) for document in documents]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        rows_by_term = {}
+        for row, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                rows_by_term.setdefault(term, []).append((row, tf))
+
+        postings = {}
+        for term, entries in rows_by_term.items():
+            rows = np.array([row for row, _ in entries], dtype=np.int32)
+            tf = np.array([count for _, count in entries], dtype=np.float32)
+            idf = math.log(1 + (len(ids) - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = k1 * (1 - b + b * lengths[rows] / avg_length)
+            postings[term] = (rows, (idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+
+        digest = hashlib.sha1()
+        for chunk_id, document in zip(ids, documents):
+            digest.update(f"{chunk_id}\0{document}\0".encode('utf-8'))
+        return cls(list(ids), list(documents), list(metadatas), postings, digest.hexdigest()[:16])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, query):
+        """BM25 score of every chunk for query (zeros if no term matches)"""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+    def search(self, query, k=4):
+        if not self.ids:
+            return []
+        scores = self.scores(query)
+        return [
+            RetrievedChunk(
+                id=self.ids[i],
+                text=self.documents[i],
+                score=float(scores[i]),
+                metadata=self.metadatas[i] or {},
+            )
+            for i in top_k(scores, k) if scores[i] > 0
+        ]
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.version,
+            "ids": self.ids,
+            "documents": self.documents,
+            "metadatas": self.metadatas,
+            "postings": {
+                term: [rows.tolist(), [round(float(w), 5) for w in weights]]
+                for term, (rows, weights) in self.postings.items()
+            },
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        postings = {
+            term: (np.array(rows, dtype=np.int32), np.array(weights, dtype=np.float32))
+            for term, (rows, weights) in data["postings"].items()
+        }
+        return cls(data["ids"], data["documents"], data["metadatas"], postings, data.get("version", ""))
+
+
+class BM25Retriever:
+    """BM25Index loaded from disk, reloaded when build_mentor_index rewrites the file"""
+    name = "bm25"
+
+    def __init__(self, path, check_interval=10.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = self.path.stat().st_mtime
+        self._index = BM25Index.load(self.path)
+        self._checked_at = time.monotonic()
+
+    def _current(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    try:
+                        mtime = self.path.stat().st_mtime
+                        if mtime != self._mtime:
+                            self._index = BM25Index.load(self.path)
+                            self._mtime = mtime
+                    except (OSError, ValueError):
+                        pass    # keep serving the loaded index
+                    self._checked_at = time.monotonic()
+        return self._index
+
+    @property
+    def version(self):
+        return self._current().version
+
+    def __len__(self):
+        return len(self._current())
+
+    def search(self, query, k=4):
+        return self._current().search(query, k)
@@ -0,0 +1,105 @@
+"""
+Immutable lookup index for the course mentor
+
+Built from load_courses() plus every ModuleContent row (with its Q&A pairs)
+in one pass, so answering a question needs no linear scans and no database
+queries. Rebuilt after MENTOR_COURSE_INDEX_TTL seconds to pick up content
+imported by other processes.
+"""
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional
+
+from mentor_engine.question_matcher import QuestionMatcher
+
+
+@dataclass(frozen=True)
+class ModuleDbContent:
+    """Enriched module content from courses.ModuleContent"""
+    fixed_qna: tuple
+    matcher: QuestionMatcher
+    theory_text: str
+    summary: str
+
+
+@dataclass(frozen=True)
+class CourseIndex:
+    """Read-only maps from ids to course/module dicts and pre-resolved Q&A"""
+    courses: MappingProxyType        # course_id -> course
+    modules: MappingProxyType        # (course_id, module_id) -> module
+    first_modules: MappingProxyType  # course_id -> first module
+    matchers: MappingProxyType       # (course_id, module_id) -> QuestionMatcher over JSON fixed_qna
+    db_content: MappingProxyType     # "course_id_module_id" -> ModuleDbContent
+    built_at: float
+
+    @classmethod
+    def build(cls, courses, module_contents=()):
+        course_map = {}
+        module_map = {}
+        first_modules = {}
+        matchers = {}
+
+        for course in courses:
+            if not isinstance(course, dict) or not course.get("id"):
+                continue
+            course_id = course["id"]
+            if course_id in course_map:
+                continue
+            course_map[course_id] = course
+
+            modules = course.get("modules", [])
+            if not isinstance(modules, list):
+                continue
+            for module in modules:
+                if not isinstance(module, dict):
+                    continue
+                first_modules.setdefault(course_id, module)
+                key = (course_id, module.get("id"))
+                if key in module_map:
+                    continue
+                module_map[key] = module
+                if module.get("fixed_qna"):
+                    matchers[key] = QuestionMatcher(module["fixed_qna"])
+
+        db_content = {}
+        for content in module_contents:
+            fixed_qna = tuple({"q": qa.question, "a": qa.answer} for qa in content.qna_pairs.all())
+            db_content[content.module_id] = ModuleDbContent(
+                fixed_qna=fixed_qna,
+                matcher=QuestionMatcher(fixed_qna),
+                theory_text=content.theory_text or "",
+                summary=content.summary or "",
+            )
+
+        return cls(
+            courses=MappingProxyType(course_map),
+            modules=MappingProxyType(module_map),
+            first_modules=MappingProxyType(first_modules),
+            matchers=MappingProxyType(matchers),
+            db_content=MappingProxyType(db_content),
+            built_at=time.monotonic(),
+        )
+
+    def find_course(self, course_id) -> Optional[dict]:
+        return self.courses.get(course_id) if course_id else None
+
+    def find_module(self, course_id, module_id=None) -> Optional[dict]:
+        """Module by id, falling back to the course's first module"""
+        if module_id:
+            module = self.modules.get((course_id, module_id))
+            if module is not None:
+                return module
+        return self.first_modules.get(course_id)
+
+    def db_module(self, course_id, module_id) -> Optional[ModuleDbContent]:
+        return self.db_content.get(f"{course_id}_{module_id or ''}")
+
+    def qna_matcher(self, course_id, module_id=None) -> Optional[QuestionMatcher]:
+        """The fixed Q&A the mentor answers from: the module's JSON Q&A, else its database Q&A"""
+        module = self.find_module(course_id, module_id)
+        matcher = self.matchers.get((course_id, module.get("id"))) if module is not None else None
+        if matcher is None:
+            db_content = self.db_module(course_id, module_id)
+            matcher = db_content.matcher if db_content is not None else None
+        return matcher
@@ -5,9 +5,18 @@ Course Mentor with Two-Layer Response System
 """
 import json
 import os
-import difflib
+import threading
+import time
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from django.conf import settings
-from ollama import Client
+
+from mentor_engine import ollama_client
+from mentor_engine.answer_cache import get_answer_cache, normalize_question
+from mentor_engine.course_index import CourseIndex
+from mentor_engine.llm_queue import LLMBusy
+from mentor_engine.question_matcher import QuestionMatcher
+from mentor_engine.single_flight import AsyncSingleFlight, SingleFlight, StreamFlight
 
 # Load courses JSON
 COURSES_JSON_PATH = os.path.join(settings.BASE_DIR, 'financial_course.json')
@@ -15,6 +24,18 @@ COURSES_JSON_PATH = os.path.join(settings.BASE_DIR, 'financial_course.json')
 # Load courses at module level
 COURSES_DATA = None
 
+# Immutable lookup index over COURSES_DATA and ModuleContent, see get_course_index()
+COURSE_INDEX = None
+_course_index_lock = threading.Lock()
+
+# In-flight LLM generations keyed by flight_key(), shared by identical concurrent questions
+GENERATIONS = SingleFlight()
+ASYNC_GENERATIONS = AsyncSingleFlight()
+
+# (course id, module id) -> (course index it was built from, prompt prefix messages)
+_prompt_prefixes = {}
+STREAMS = StreamFlight()
+
 def transform_topic_to_course(topic):
     """Transform a topic (from topics structure) to course format"""
     lessons = topic.get('lessons', [])
@@ -106,140 +127,112 @@ def load_courses():
     return COURSES_DATA
 
 
+def load_module_contents():
+    """All ModuleContent rows with their Q&A pairs, in two queries"""
+    try:
+        from courses.models import ModuleContent
+        return list(ModuleContent.objects.prefetch_related('qna_pairs'))
+    except Exception as e:
+        print(f"Could not load module content from database: {e}")
+        return []
+
+
+def get_course_index():
+    """
+    Return the CourseIndex, building it on first use.
+    Once older than MENTOR_COURSE_INDEX_TTL seconds, one caller rebuilds it
+    while concurrent callers keep using the previous index.
+    """
+    global COURSE_INDEX
+    index = COURSE_INDEX
+    ttl = getattr(settings, 'MENTOR_COURSE_INDEX_TTL', 300)
+    if index is not None and time.monotonic() - index.built_at < ttl:
+        return index
+
+    if not _course_index_lock.acquire(blocking=index is None):
+        return index
+    try:
+        if COURSE_INDEX is index:
+            COURSE_INDEX = CourseIndex.build(load_courses(), load_module_contents())
+            # Prefixes built from the old index would never be used again
+            _prompt_prefixes.clear()
+        return COURSE_INDEX
+    finally:
+        _course_index_lock.release()
+
+
+def reset_course_index():
+    """Drop the index so the next lookup rebuilds it"""
+    global COURSE_INDEX
+    COURSE_INDEX = None
+    _prompt_prefixes.clear()
+
+
 def find_course(course_id):
     """Find a course by ID"""
-    courses = load_courses()
-    
-    # Ensure courses is a list
-    if not isinstance(courses, list):
-        print(f"ERROR: Courses is not a list, type: {type(courses)}")
-        return None
-    
-    if not course_id:
-        print(f"ERROR: course_id is empty")
-        return None
-    
-    print(f"Looking for course_id: '{course_id}' in {len(courses)} courses")
-    
-    for course in courses:
-        if isinstance(course, dict):
-            course_id_val = course.get("id")
-            print(f"  Checking course: '{course_id_val}' == '{course_id}'? {course_id_val == course_id}")
-            if course_id_val == course_id:
-                print(f"  FOUND course: {course.get('title')}")
-                return course
-    
-    print(f"  Course '{course_id}' NOT FOUND")
-    return None
+    return get_course_index().find_course(course_id)
 
 
 def find_module(course, module_id=None):
-    """Find a module within a course"""
+    """Find a module within a course, falling back to its first module"""
     if not course or not isinstance(course, dict):
         return None
-    
-    modules = course.get("modules", [])
-    if not isinstance(modules, list) or not modules:
-        return None
-    
-    if module_id:
-        for module in modules:
-            if isinstance(module, dict) and module.get("id") == module_id:
-                return module
-    
-    # Return first module if no ID specified
-    return modules[0] if modules else None
+    return get_course_index().find_module(course.get("id"), module_id)
 
 
 def fuzzy_match_q(fixed_qna, user_q, cutoff=0.7):
     """
     Find best question match using fuzzy matching
+    fixed_qna is a list of Q&A dicts or a prebuilt QuestionMatcher
     Returns the matching Q&A if found, None otherwise
     """
     if not fixed_qna:
         return None
     
-    best = None
-    best_score = 0
-    
-    for qa in fixed_qna:
-        q = qa.get("q", "").lower()
-        score = difflib.SequenceMatcher(None, q, user_q.lower()).ratio()
-        if score > best_score:
-            best_score = score
-            best = qa
-    
-    return best if best_score >= cutoff else None
+    matcher = fixed_qna if isinstance(fixed_qna, QuestionMatcher) else QuestionMatcher(fixed_qna)
+    return matcher.match(user_q, cutoff)
+
 
+SYSTEM_PROMPT = """You are an empathetic, practical financial mentor speaking to first-time earners. Keep answers short (2-4 short paragraphs), avoid jargon unless user asks for definitions, include one simple actionable next-step and note sources. When unsure, say you are unsure and suggest where to learn (cite module source)."""
 
-def generate_ollama_response(course, module, user_question, ollama_model="phi3"):
+CHAT_OPTIONS = {
+    'temperature': 0.7,
+    'top_p': 0.9
+}
+
+
+def prompt_prefix(course, module):
     """
-    Generate response using Ollama with course context and few-shot examples
+    Messages before the user's question: one system message (mentor prompt,
+    course context, theory) and up to 3 fixed Q&A as few-shot examples.
+    Built once per (course, module) and course index, so every question on a
+    module sends a byte-identical prefix the LLM server can serve from its
+    KV cache instead of re-evaluating it.
     """
-    try:
-        ollama_host = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
-        ollama = Client(host=ollama_host)
-        
-        # Handle empty or None model string
-        if not ollama_model or ollama_model.strip() == '':
-            ollama_model = "phi3"
-        
-        # Test connection by listing models
-        try:
-            models = ollama.list()
-            model_names = [m.get('name', '') for m in models.get('models', [])]
-            # Try common model names if phi3 is not available
-            if ollama_model not in model_names:
-                if 'llama3' in model_names:
-                    ollama_model = 'llama3'
-                elif 'llama2' in model_names:
-                    ollama_model = 'llama2'
-                elif 'mistral' in model_names:
-                    ollama_model = 'mistral'
-                elif len(model_names) > 0:
-                    ollama_model = model_names[0]
-                else:
-                    raise Exception("No Ollama models found. Please install a model: ollama pull llama3")
-        except Exception as e:
-            raise Exception(f"Could not connect to Ollama at {ollama_host}: {str(e)}. Please ensure Ollama is running.")
-    except Exception as e:
-        raise Exception(f"Could not connect to Ollama: {str(e)}. Please ensure Ollama is running.")
-    
-    # Build system prompt
-    system_prompt = """You are an empathetic, practical financial mentor speaking to first-time earners. Keep answers short (2-4 short paragraphs), avoid jargon unless user asks for definitions, include one simple actionable next-step and note sources. When unsure, say you are unsure and suggest where to learn (cite module source)."""
+    index = get_course_index()
+    key = (course.get('id', ''), module.get('id') or '')
+    cached = _prompt_prefixes.get(key)
+    if cached is not None and cached[0] is index:
+        return cached[1]
     
-    # Build context message
+    # Build context
     context_msg = f"""Course: {course.get('title', '')}
 Module: {module.get('title', '')}
 Module Summary: {module.get('summary', '')}
 Source: {course.get('source', '')}"""
     
-    # Build few-shot examples from fixed Q&A or database
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "system", "content": context_msg}
-    ]
-    
-    # Try to get enriched content from database first
+    # Fall back to enriched content from the database (pre-resolved in the course index)
     fixed_qna = module.get("fixed_qna", [])
     if not fixed_qna:
-        # Try loading from database
-        try:
-            from courses.models import ModuleContent
-            full_module_id = f"{course.get('id', '')}_{module.get('id', '')}"
-            try:
-                module_content = ModuleContent.objects.get(module_id=full_module_id)
-                # Get Q&A from database
-                qna_pairs = module_content.qna_pairs.all()[:3]
-                fixed_qna = [{"q": qa.question, "a": qa.answer} for qa in qna_pairs]
-                # Also add theory text to context
-                if module_content.theory_text:
-                    theory_context = f"Theory: {module_content.theory_text[:300]}"
-                    messages.append({"role": "system", "content": theory_context})
-            except ModuleContent.DoesNotExist:
-                pass
-        except Exception as e:
-            print(f"Could not load from database: {e}")
+        db_content = index.db_module(course.get('id', ''), module.get('id', ''))
+        if db_content is not None:
+            fixed_qna = db_content.fixed_qna[:3]
+            # Also add theory text to context
+            if db_content.theory_text:
+                context_msg += f"\nTheory: {db_content.theory_text[:300]}"
+    
+    # The shared mentor prompt comes first so different modules still share a prefix
+    messages = [{"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{context_msg}"}]
     
     # Add up to 3 fixed Q&A as few-shot examples
     for qa in fixed_qna[:3]:
@@ -247,82 +240,138 @@ Source: {course.get('source', '')}"""
             messages.append({"role": "user", "content": qa.get("q", "")})
             messages.append({"role": "assistant", "content": qa.get("a", "")})
     
-    # Add user's question
-    messages.append({"role": "user", "content": user_question})
+    prefix = tuple(messages)
+    _prompt_prefixes[key] = (index, prefix)
+    return prefix
+
+
+def prompt_prefix_count():
+    """Number of cached prompt prefixes (modules asked about since the index was built)"""
+    return len(_prompt_prefixes)
+
+
+def build_ollama_messages(course, module, user_question):
+    """The cached prompt_prefix for the module, then the user's question"""
+    return [*prompt_prefix(course, module), {"role": "user", "content": user_question}]
+
+
+def ollama_error(error, ollama_model, ollama_host):
+    """Exception with a user-facing message for a failed Ollama call"""
+    if isinstance(error, LLMBusy):
+        return error
+    if isinstance(error, ConnectionError):
+        return Exception(f"Could not connect to Ollama server. Please ensure Ollama is running on {ollama_host}")
+    if ollama_client.is_model_not_found(error):
+        return Exception(f"Model '{ollama_model}' not found. Please install it: ollama pull {ollama_model}")
+    return Exception(f"Ollama error: {str(error)}")
+
+
+def generate_ollama_response(course, module, user_question, ollama_model="phi3", user_key=None):
+    """
+    Generate response using Ollama with course context and few-shot examples
+    """
+    ollama_host = ollama_client.get_ollama_host()
+    
+    # Resolve the installed model once per OLLAMA_MODEL_CACHE_TTL instead of listing models per question
+    try:
+        ollama_model = ollama_client.resolve_model(ollama_model, ollama_host)
+    except Exception as e:
+        raise Exception(f"Could not connect to Ollama at {ollama_host}: {str(e)}. Please ensure Ollama is running.")
+    
+    messages = build_ollama_messages(course, module, user_question)
     
     try:
-        # Call Ollama chat API with timeout
-        import requests
-        response = ollama.chat(
+        response = ollama_client.chat(
+            messages,
             model=ollama_model,
-            messages=messages,
-            options={
-                'temperature': 0.7,
-                'top_p': 0.9
-            }
+            host=ollama_host,
+            user_key=user_key,
+            options=CHAT_OPTIONS
         )
-        
-        answer = response.get("message", {}).get("content", "")
-        if not answer:
-            raise Exception("Empty response from Ollama")
-        return answer
-    except requests.exceptions.ConnectionError as e:
-        raise Exception(f"Could not connect to Ollama server. Please ensure Ollama is running on {ollama_host}")
     except Exception as e:
-        error_msg = str(e)
-        if "model" in error_msg.lower() or "not found" in error_msg.lower():
-            raise Exception(f"Model '{ollama_model}' not found. Please install it: ollama pull {ollama_model}")
-        raise Exception(f"Ollama error: {error_msg}")
+        raise ollama_error(e, ollama_model, ollama_host)
+    
+    answer = response.get("message", {}).get("content", "")
+    if not answer:
+        raise Exception("Ollama error: Empty response from Ollama")
+    return answer
+
+
+async def stream_ollama_response(course, module, user_question, ollama_model="phi3", user_key=None):
+    """Async generator of answer chunks; same prompt and errors as generate_ollama_response"""
+    ollama_host = ollama_client.get_ollama_host()
+    messages = await sync_to_async(build_ollama_messages, thread_sensitive=False)(course, module, user_question)
+    try:
+        async for chunk in ollama_client.stream_chat(
+            messages,
+            model=ollama_model,
+            host=ollama_host,
+            user_key=user_key,
+            options=CHAT_OPTIONS
+        ):
+            yield chunk
+    except Exception as e:
+        raise ollama_error(e, ollama_model, ollama_host)
 
 
-def mentor_respond(course_id, module_id=None, question=""):
+async def agenerate_ollama_response(course, module, user_question, ollama_model="phi3", user_key=None):
+    """Async generate_ollama_response: awaits Ollama instead of holding a thread"""
+    ollama_host = ollama_client.get_ollama_host()
+    messages = await sync_to_async(build_ollama_messages, thread_sensitive=False)(course, module, user_question)
+    try:
+        response = await ollama_client.achat(
+            messages,
+            model=ollama_model,
+            host=ollama_host,
+            user_key=user_key,
+            options=CHAT_OPTIONS
+        )
+    except Exception as e:
+        raise ollama_error(e, ollama_model, ollama_host)
+    
+    answer = response.get("message", {}).get("content", "")
+    if not answer:
+        raise Exception("Ollama error: Empty response from Ollama")
+    return answer
+
+
+def resolve_mentor_question(course_id, module_id, question):
     """
-    Main mentor response function with two-layer system:
-    1. Check fixed Q&A (fuzzy match)
-    2. If no match, use Ollama with context
+    Run every layer that needs no LLM.
+    Returns (result, None) when the answer is final (error, fixed Q&A or a
+    cached LLM answer), or (None, (course, module, db_content, cache_key))
+    when the LLM layer should answer.
     """
     if not question:
         return {
             "type": "error",
             "answer": "Please provide a question.",
             "confidence": 0
-        }
+        }, None
     
     # Find course and module
-    course = find_course(course_id)
+    index = get_course_index()
+    course = index.find_course(course_id)
     if not course:
         return {
             "type": "error",
             "answer": f"Course '{course_id}' not found.",
             "confidence": 0
-        }
+        }, None
     
-    module = find_module(course, module_id)
+    module = index.find_module(course_id, module_id)
     if not module:
         return {
             "type": "error",
             "answer": f"Module not found in course '{course_id}'.",
             "confidence": 0
-        }
+        }, None
     
-    # Layer 1: Check fixed Q&A (from JSON or database)
-    fixed_qna = module.get("fixed_qna", [])
+    # Enriched content from the database, keyed by the requested module id
+    db_content = index.db_module(course_id, module_id)
     
-    # Try to get enriched Q&A from database if not in module
-    if not fixed_qna:
-        try:
-            from courses.models import ModuleContent
-            full_module_id = f"{course_id}_{module_id or ''}"
-            try:
-                module_content = ModuleContent.objects.get(module_id=full_module_id)
-                qna_pairs = module_content.qna_pairs.all()
-                fixed_qna = [{"q": qa.question, "a": qa.answer} for qa in qna_pairs]
-            except ModuleContent.DoesNotExist:
-                pass
-        except Exception as e:
-            print(f"Could not load Q&A from database: {e}")
-    
-    match = fuzzy_match_q(fixed_qna, question, cutoff=0.7)
+    # Layer 1: Check fixed Q&A (from JSON or database)
+    match = fuzzy_match_q(index.qna_matcher(course_id, module_id), question, cutoff=0.7)
     
     if match:
         return {
@@ -331,54 +380,166 @@ def mentor_respond(course_id, module_id=None, question=""):
             "source": course.get("source", ""),
             "confidence": 0.99,
             "matched_question": match.get("q", "")
-        }
+        }, None
+    
+    # Layer 2a: Reuse an earlier LLM answer to the same (or a similar) question
+    cache_key = None
+    cache = get_answer_cache()
+    if cache is not None:
+        cached, cache_key = cache.lookup(course_id, module.get("id"), question)
+        if cached:
+            return {**llm_result(course, cached["answer"]), "cached": cached["match"]}, None
+    
+    return None, (course, module, db_content, cache_key)
+
+
+def llm_result(course, answer):
+    return {
+        "type": "llm",
+        "answer": answer,
+        "source": course.get("source", ""),
+        "confidence": 0.85
+    }
+
+
+def flight_key(course, module, question):
+    return (course.get("id", ""), module.get("id") or "", normalize_question(question))
+
+
+def store_answer(cache_key, course, answer, gen_seconds):
+    cache = get_answer_cache()
+    if cache is not None and cache_key is not None:
+        cache.store(cache_key, answer, course.get("source", ""), gen_seconds)
+
+
+def fallback_result(course, module, db_content, error):
+    """Helpful answer built from module content when Ollama can't answer"""
+    module_summary = module.get("summary", "")
+    theory_text = module.get("theory_text", "")
+    
+    # Prefer enriched content from the database
+    if db_content is not None:
+        theory_text = db_content.theory_text or theory_text
+        module_summary = db_content.summary or module_summary
     
-    # Layer 2: Use Ollama with course context
+    # Create a fallback answer from module content
+    if theory_text:
+        fallback_answer = f"Based on {module.get('title', 'this module')}: {theory_text[:200]}..."
+    elif module_summary:
+        fallback_answer = f"{module_summary} This is educational content about {module.get('title', 'this topic')}."
+    else:
+        fallback_answer = f"I can help explain {module.get('title', 'this topic')}. Please check if Ollama is running for detailed AI responses, or refer to the module content above."
+    
+    if isinstance(error, LLMBusy):
+        note = "Note: The mentor is answering a lot of questions right now, so this answer comes from the module content."
+    else:
+        note = f"Note: Full AI responses require Ollama to be running. Error: {str(error)[:100]}"
+    
+    return {
+        "type": "fallback",
+        "answer": fallback_answer + "\n\n" + note,
+        "source": course.get("source", ""),
+        "confidence": 0.6
+    }
+
+
+def mentor_respond(course_id, module_id=None, question="", user_key=None):
+    """
+    Main mentor response function with two-layer system:
+    1. Check fixed Q&A (fuzzy match)
+    2. If no match, use Ollama with context
+    user_key identifies the asker for fair LLM queueing; when the queue is
+    full the module-content fallback answers instead.
+    """
+    result, context = resolve_mentor_question(course_id, module_id, question)
+    if result is not None:
+        return result
+    course, module, db_content, cache_key = context
+    
+    # Layer 2b: Use Ollama with course context
     try:
         # Get Ollama model from environment or use default
-        ollama_model = os.environ.get("OLLAMA_MODEL", "phi3")
-        # Handle empty string
-        if not ollama_model or ollama_model.strip() == '':
-            ollama_model = "phi3"
+        ollama_model = ollama_client.get_default_model()
         
-        answer = generate_ollama_response(course, module, question, ollama_model)
+        def generate():
+            started = time.perf_counter()
+            answer = generate_ollama_response(course, module, question, ollama_model, user_key)
+            store_answer(cache_key, course, answer, time.perf_counter() - started)
+            return answer
         
-        return {
-            "type": "llm",
-            "answer": answer,
-            "source": course.get("source", ""),
-            "confidence": 0.85
-        }
+        # Concurrent identical questions share one generation
+        answer, _ = GENERATIONS.do(flight_key(course, module, question), generate)
+        return llm_result(course, answer)
     except Exception as e:
         # If Ollama fails, provide a helpful fallback response using module content
-        module_summary = module.get("summary", "")
-        theory_text = module.get("theory_text", "")
-        
-        # Try to get enriched content from database
-        try:
-            from courses.models import ModuleContent
-            full_module_id = f"{course_id}_{module_id or ''}"
-            try:
-                module_content = ModuleContent.objects.get(module_id=full_module_id)
-                theory_text = module_content.theory_text or theory_text
-                module_summary = module_content.summary or module_summary
-            except ModuleContent.DoesNotExist:
-                pass
-        except:
-            pass
+        return fallback_result(course, module, db_content, e)
+
+
+async def amentor_respond(course_id, module_id=None, question="", user_key=None):
+    """Async mentor_respond for the ASGI views; same layers and fallbacks"""
+    # The course index rebuild queries ModuleContent: let channels close the worker thread's connection
+    result, context = await database_sync_to_async(resolve_mentor_question, thread_sensitive=False)(course_id, module_id, question)
+    if result is not None:
+        return result
+    course, module, db_content, cache_key = context
+    
+    try:
+        ollama_model = ollama_client.get_default_model()
         
-        # Create a fallback answer from module content
-        if theory_text:
-            fallback_answer = f"Based on {module.get('title', 'this module')}: {theory_text[:200]}..."
-        elif module_summary:
-            fallback_answer = f"{module_summary} This is educational content about {module.get('title', 'this topic')}."
-        else:
-            fallback_answer = f"I can help explain {module.get('title', 'this topic')}. Please check if Ollama is running for detailed AI responses, or refer to the module content above."
+        async def generate():
+            started = time.perf_counter()
+            answer = await agenerate_ollama_response(course, module, question, ollama_model, user_key)
+            await sync_to_async(store_answer, thread_sensitive=False)(
+                cache_key, course, answer, time.perf_counter() - started
+            )
+            return answer
         
-        return {
-            "type": "fallback",
-            "answer": fallback_answer + f"\n\nNote: Full AI responses require Ollama to be running. Error: {str(e)[:100]}",
-            "source": course.get("source", ""),
-            "confidence": 0.6
-        }
+        # Concurrent identical questions share one generation
+        answer, _ = await ASYNC_GENERATIONS.do(flight_key(course, module, question), generate)
+        return llm_result(course, answer)
+    except Exception as e:
+        return fallback_result(course, module, db_content, e)
+
 
+async def stream_mentor_respond(course_id, module_id=None, question="", user_key=None):
+    """
+    Streaming variant of mentor_respond.
+    Yields {"event": "token", "text": ...} chunks, then one
+    {"event": "done", **result} with the complete answer. Fixed Q&A and
+    fallback answers arrive as a single token.
+    """
+    result, context = await database_sync_to_async(resolve_mentor_question, thread_sensitive=False)(course_id, module_id, question)
+    if result is None:
+        course, module, db_content, cache_key = context
+        
+        async def generate():
+            started = time.perf_counter()
+            parts = []
+            async for chunk in stream_ollama_response(course, module, question, ollama_client.get_default_model(), user_key):
+                parts.append(chunk)
+                yield chunk
+            if parts:
+                await sync_to_async(store_answer, thread_sensitive=False)(
+                    cache_key, course, "".join(parts), time.perf_counter() - started
+                )
+        
+        chunks = []
+        try:
+            # Concurrent identical questions subscribe to one generation
+            async for chunk in STREAMS.stream(flight_key(course, module, question), generate):
+                chunks.append(chunk)
+                yield {"event": "token", "text": chunk}
+            if not chunks:
+                raise Exception("Ollama error: Empty response from Ollama")
+            result = llm_result(course, "".join(chunks))
+        except Exception as e:
+            if chunks:
+                # Part of the answer is already on screen; finish with what we have
+                result = {**llm_result(course, "".join(chunks)), "error": str(e)[:100]}
+            else:
+                result = fallback_result(course, module, db_content, e)
+                yield {"event": "token", "text": result["answer"]}
+    elif result["type"] != "error":
+        yield {"event": "token", "text": result["answer"]}
+    
+    yield {"event": "done", **result}
@@ -0,0 +1,110 @@
+"""
+Micro-batching embedding worker
+
+Concurrent callers submit single texts; a worker thread collects them for
+up to MAX_WAIT_MS (or until MAX_BATCH texts are waiting) and encodes the
+whole batch in one encode() call, which is far cheaper per text than
+encoding one string at a time. Each caller gets its own vector back
+through a concurrent.futures.Future.
+
+A lone request only waits if another one arrived while it was queued, so
+single-request latency stays close to a direct encode() call.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+
+    def __init__(self, encode_batch, max_batch=32, max_wait_ms=5.0):
+        """encode_batch(list of texts) -> sequence of vectors, one per text"""
+        self.encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "texts": 0, "max_batch_seen": 0, "encode_seconds": 0.0}
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def submit(self, text):
+        """Future resolving to the float32 embedding of text"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text, timeout=None):
+        """Blocking: the embedding of text, encoded together with concurrent callers"""
+        return self.submit(text).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            # Only hold the batch open while more requests are arriving
+            if len(batch) == 1:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            # Every future gets a result or an exception; the worker itself never dies
+            try:
+                self._encode(batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _encode(self, batch):
+        # Identical texts in one batch are encoded once
+        unique = list(dict.fromkeys(text for text, _ in batch))
+        started = time.perf_counter()
+        vectors = list(self.encode_batch(unique))
+        if len(vectors) != len(unique):
+            raise ValueError(f"encode_batch returned {len(vectors)} vectors for {len(unique)} texts")
+        by_text = {text: np.asarray(vector, dtype=np.float32) for text, vector in zip(unique, vectors)}
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(batch)
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+            self._stats["encode_seconds"] += elapsed
+        for text, future in batch:
+            future.set_result(by_text[text])
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["mean_batch"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["encode_seconds"] = round(stats["encode_seconds"], 4)
+        stats["queued"] = self._queue.qsize()
+        return stats
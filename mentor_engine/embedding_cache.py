@@ -0,0 +1,73 @@
+"""
+LRU cache of query embeddings for the RAG mentor
+
+Repeated messages ("hi", "what is a SIP?") skip the SentenceTransformer
+encode. Keys are lightly normalized: case and whitespace are folded, which
+doesn't change the embedding since all-MiniLM-L6-v2 lowercases its input,
+and trailing punctuation is dropped. Values are read-only float32 arrays.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_TRAILING_PUNCTUATION_RE = re.compile(r'[\s?!.]+$')
+
+
+def normalize_query(text):
+    return _TRAILING_PUNCTUATION_RE.sub('', " ".join((text or "").split()).casefold())
+
+
+class EmbeddingCache:
+    """Bounded LRU of normalized query -> float32 embedding, with hit-rate stats"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def put(self, key, vector):
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def get_or_encode(self, text, encode):
+        """Cached embedding for text, else encode(normalized text) and remember it"""
+        key = normalize_query(text)
+        vector = self.get(key)
+        if vector is None:
+            vector = self.put(key, encode(key))
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,93 @@
+"""
+Per-call Ollama timing metrics
+
+Every chat response (and the final chunk of a stream) carries
+prompt_eval_count/duration (tokens of the prompt Ollama had to process)
+and eval_count/duration (tokens generated). When the model server reuses
+the KV cache for a prompt prefix it already processed, the cached tokens
+are not evaluated again, so prompt eval time and token count drop while
+generation time stays the same. Comparing the two shows whether the stable
+prompt prefixes (course_mentor.prompt_prefix) are being reused.
+
+ollama_client records every response here; add_hook() registers extra
+callbacks, e.g. to forward the numbers to a metrics system.
+"""
+import threading
+from collections import deque
+
+NS_PER_MS = 1_000_000
+
+
+def response_metrics(response):
+    """{field: value} of the timing fields of an Ollama response, durations in ms (None if absent)"""
+    get = response.get if hasattr(response, 'get') else lambda name, default=None: getattr(response, name, default)
+    if get("eval_count") is None and get("prompt_eval_count") is None:
+        return None
+    return {
+        "prompt_eval_count": get("prompt_eval_count") or 0,
+        "prompt_eval_ms": (get("prompt_eval_duration") or 0) / NS_PER_MS,
+        "eval_count": get("eval_count") or 0,
+        "eval_ms": (get("eval_duration") or 0) / NS_PER_MS,
+        "load_ms": (get("load_duration") or 0) / NS_PER_MS,
+        "total_ms": (get("total_duration") or 0) / NS_PER_MS,
+    }
+
+
+class LLMMetrics:
+
+    def __init__(self, max_samples=1000):
+        self._samples = deque(maxlen=max_samples)
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """hook(model, metrics) is called for every recorded response"""
+        with self._lock:
+            self._hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    def record(self, model, response):
+        metrics = response_metrics(response)
+        if metrics is None:
+            return None
+        with self._lock:
+            self._samples.append(metrics)
+            hooks = list(self._hooks)
+        for hook in hooks:
+            try:
+                hook(model, metrics)
+            except Exception as e:
+                print(f"LLM metrics hook failed: {e}")
+        return metrics
+
+    def stats(self):
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {"calls": 0}
+
+        def p50(name):
+            values = sorted(sample[name] for sample in samples)
+            return round(values[len(values) // 2], 2)
+
+        prompt_ms = sum(sample["prompt_eval_ms"] for sample in samples)
+        eval_ms = sum(sample["eval_ms"] for sample in samples)
+        prompt_tokens = sum(sample["prompt_eval_count"] for sample in samples)
+        eval_tokens = sum(sample["eval_count"] for sample in samples)
+        return {
+            "calls": len(samples),
+            "p50": {name: p50(name) for name in ("prompt_eval_count", "prompt_eval_ms", "eval_count", "eval_ms", "load_ms")},
+            # Falls as prefixes are served from the KV cache
+            "prompt_eval_share": round(prompt_ms / (prompt_ms + eval_ms), 4) if prompt_ms + eval_ms else 0.0,
+            "prompt_tokens_per_call": round(prompt_tokens / len(samples), 1),
+            "eval_tokens_per_s": round(eval_tokens / (eval_ms / 1000), 1) if eval_ms else 0.0,
+            "cold_loads": sum(1 for sample in samples if sample["load_ms"] > 1000),
+        }
+
+
+llm_metrics = LLMMetrics()
@@ -0,0 +1,217 @@
+"""
+Admission control in front of Ollama
+
+At most MAX_CONCURRENT generations run at once. Further requests wait in a
+bounded queue served round-robin per user, so one user firing many
+questions can't starve everyone else. When the queue (or the user's share
+of it) is full, or a request waits longer than WAIT_TIMEOUT seconds,
+LLMBusy is raised right away and callers answer from their non-LLM
+fallback instead of tying up a worker.
+
+Both blocking callers (threads) and async callers share the same slots.
+Configured by the MENTOR_LLM_QUEUE setting.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+ANONYMOUS = "anonymous"
+
+
+class LLMBusy(Exception):
+    """The LLM queue is full or the wait timed out"""
+
+
+class _Waiter:
+    def __init__(self, user_key):
+        self.user_key = user_key
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self._event = None
+        self._future = None
+        self._loop = None
+
+    def grant(self):
+        self.granted = True
+        if self._event is not None:
+            self._event.set()
+        elif self._future is not None:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+
+class LLMQueue:
+    """Concurrency cap with a bounded, per-user round-robin wait queue"""
+
+    def __init__(self, max_concurrent=2, max_waiting=20, max_waiting_per_user=3, wait_timeout=30.0):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_waiting_per_user = max_waiting_per_user
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = OrderedDict()   # user_key -> deque of _Waiter, in round-robin order
+        self._waiting_count = 0
+        self._waits = deque(maxlen=1000)  # recent queue wait times (seconds) of admitted requests
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+
+    # --- queue bookkeeping (call with self._lock held) ---
+
+    def _try_admit(self, user_key):
+        """Waiter to wait on, or None if admitted straight away. Raises LLMBusy when full."""
+        if self._active < self.max_concurrent and self._waiting_count == 0:
+            self._active += 1
+            self._stats["admitted"] += 1
+            self._waits.append(0.0)
+            return None
+
+        user_queue = self._waiting.get(user_key)
+        if self._waiting_count >= self.max_waiting:
+            self._stats["rejected"] += 1
+            raise LLMBusy(f"The mentor is busy ({self._waiting_count} questions waiting). Please try again shortly.")
+        if user_queue is not None and len(user_queue) >= self.max_waiting_per_user:
+            self._stats["rejected"] += 1
+            raise LLMBusy("You already have several questions waiting. Please wait for those answers first.")
+
+        waiter = _Waiter(user_key)
+        if user_queue is None:
+            user_queue = self._waiting[user_key] = deque()
+        user_queue.append(waiter)
+        self._waiting_count += 1
+        self._stats["queued"] += 1
+        return waiter
+
+    def _dispatch(self):
+        """Hand free slots to waiters, taking one per user in turn"""
+        while self._active < self.max_concurrent and self._waiting:
+            user_key, user_queue = next(iter(self._waiting.items()))
+            waiter = user_queue.popleft()
+            del self._waiting[user_key]
+            if user_queue:
+                self._waiting[user_key] = user_queue   # back of the rotation
+            self._waiting_count -= 1
+            self._active += 1
+            self._stats["admitted"] += 1
+            self._waits.append(time.monotonic() - waiter.enqueued_at)
+            waiter.grant()
+
+    def _abandon(self, waiter):
+        """Remove a waiter that gave up; returns False if it was granted meanwhile"""
+        if waiter.granted:
+            return False
+        user_queue = self._waiting.get(waiter.user_key)
+        if user_queue is not None and waiter in user_queue:
+            user_queue.remove(waiter)
+            self._waiting_count -= 1
+            if not user_queue:
+                del self._waiting[waiter.user_key]
+        return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    # --- public API ---
+
+    @contextmanager
+    def slot(self, user_key=None):
+        """Blocking: hold one LLM slot for the duration of the block"""
+        with self._lock:
+            waiter = self._try_admit(user_key or ANONYMOUS)
+            if waiter is not None:
+                waiter._event = threading.Event()
+        if waiter is not None and not waiter._event.wait(self.wait_timeout):
+            with self._lock:
+                timed_out = self._abandon(waiter)
+                if timed_out:
+                    self._stats["timeouts"] += 1
+            if timed_out:
+                raise LLMBusy("The mentor is busy right now. Please try again shortly.")
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def async_slot(self, user_key=None):
+        """Async: hold one LLM slot for the duration of the block"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = self._try_admit(user_key or ANONYMOUS)
+            if waiter is not None:
+                waiter._loop = loop
+                waiter._future = loop.create_future()
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter._future), self.wait_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                with self._lock:
+                    abandoned = self._abandon(waiter)
+                    if abandoned and isinstance(e, asyncio.TimeoutError):
+                        self._stats["timeouts"] += 1
+                if not abandoned:
+                    # Granted just as we gave up: hand the slot back
+                    self.release()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise LLMBusy("The mentor is busy right now. Please try again shortly.")
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+            stats["waiting"] = self._waiting_count
+            stats["waiting_users"] = len(self._waiting)
+            waits = sorted(self._waits)
+        stats["max_concurrent"] = self.max_concurrent
+        stats["max_waiting"] = self.max_waiting
+        if waits:
+            stats["wait_seconds"] = {
+                "p50": round(waits[len(waits) // 2], 4),
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4),
+                "max": round(waits[-1], 4),
+                "mean": round(sum(waits) / len(waits), 4),
+                "samples": len(waits),
+            }
+        return stats
+
+
+_llm_queue = None
+_llm_queue_lock = threading.Lock()
+
+
+def get_llm_queue():
+    """The process-wide LLMQueue from settings.MENTOR_LLM_QUEUE"""
+    global _llm_queue
+    if _llm_queue is None:
+        with _llm_queue_lock:
+            if _llm_queue is None:
+                config = getattr(settings, 'MENTOR_LLM_QUEUE', {})
+                _llm_queue = LLMQueue(
+                    max_concurrent=config.get('MAX_CONCURRENT', 2),
+                    max_waiting=config.get('MAX_WAITING', 20),
+                    max_waiting_per_user=config.get('MAX_WAITING_PER_USER', 3),
+                    wait_timeout=config.get('WAIT_TIMEOUT', 30.0),
+                )
+    return _llm_queue
+
+
+def user_key_for(user, request):
+    """Fairness key for a request: the user id, else the client address"""
+    if user is not None and getattr(user, 'is_authenticated', False):
+        return f"user:{user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
@@ -1,9 +1,18 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
-from ollama import Client
+import importlib.util
 import os
+import threading
+import time
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from mentor_engine import ollama_client
+from mentor_engine.bm25 import BM25Retriever
+from mentor_engine.embedding_batcher import EmbeddingBatcher
+from mentor_engine.embedding_cache import EmbeddingCache
+from mentor_engine.mentor_index import manifest_path, read_manifest
+from mentor_engine.retrieval_cache import RetrievalCache
+from mentor_engine.retrievers import ChromaRetriever, HybridRetriever, NumpyRetriever, StageTimings
+
 # --------- CONFIG ---------
 # Use absolute paths based on Django BASE_DIR
 BASE_DIR = settings.BASE_DIR
@@ -11,12 +20,153 @@ DB_DIR = os.path.join(BASE_DIR, "vector_db")
 TOP_K = 4
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 OLLAMA_MODEL = "phi3"   # or "mistral", "llama2", "llama3", etc.
+COLLECTION_NAME = "wealthplay_mentor"
+
+# Retrieval backend: 'chroma' (the collection above) or 'numpy' (memory-mapped matrix in NUMPY_DIR)
+RETRIEVER_CONFIG = getattr(settings, 'MENTOR_RETRIEVER', {})
+RETRIEVER_BACKEND = RETRIEVER_CONFIG.get('BACKEND', 'chroma')
+NUMPY_INDEX_DIR = str(RETRIEVER_CONFIG.get('NUMPY_DIR') or os.path.join(DB_DIR, "numpy_index"))
+# BM25 keyword index fused with the vector results (built by build_mentor_index)
+HYBRID = RETRIEVER_CONFIG.get('HYBRID', True)
+BM25_INDEX_PATH = str(RETRIEVER_CONFIG.get('BM25_PATH') or os.path.join(DB_DIR, "bm25_index.json"))
+HYBRID_CANDIDATES = RETRIEVER_CONFIG.get('CANDIDATES', 20)
+RRF_K = RETRIEVER_CONFIG.get('RRF_K', 60)
+
+# --------- LOAD COMPONENTS (lazily) ---------
+# chromadb and sentence-transformers (torch) take seconds to import and load,
+# so they are only loaded on the first RAG question or by warm() (see the
+# warm_mentor command and MENTOR_WARM_ON_STARTUP), not when Django imports views.
+_client = None
+_collection = None
+_embed_model = None
+_retriever = None
+_retriever_version = None   # index version the Chroma collection was opened at
+_manifest_version = (None, 0)   # (manifest mtime, version), see index_version
+_load_lock = threading.Lock()
+
+# Normalized query -> embedding, so repeated questions skip the encoder
+query_embeddings = EmbeddingCache(getattr(settings, 'MENTOR_QUERY_EMBEDDING_CACHE_SIZE', 1024))
+
+# (index version, embedding bucket) -> retrieved chunks and knowledge text
+_retrieval_cache_config = getattr(settings, 'MENTOR_RETRIEVAL_CACHE', {})
+retrieval_cache = RetrievalCache(
+    max_entries=_retrieval_cache_config.get('MAX_ENTRIES', 2048),
+)
+
+# Recent embed / dense / bm25 / fuse times, for /api/chat/mentor/rag/stats/
+retrieval_timings = StageTimings()
+
+# Cache misses from concurrent requests are encoded together in one batch
+_batch_config = getattr(settings, 'MENTOR_EMBEDDING_BATCH', {})
+embedding_batcher = EmbeddingBatcher(
+    lambda texts: get_embed_model().encode(texts, batch_size=len(texts), show_progress_bar=False),
+    max_batch=_batch_config.get('MAX_BATCH', 32),
+    max_wait_ms=_batch_config.get('MAX_WAIT_MS', 5),
+)
+# Seconds a question waits for its embedding (the first one also loads the model)
+EMBED_TIMEOUT = _batch_config.get('TIMEOUT', 60)
+
+
+def dependencies_installed(backend=None):
+    """True if the packages for backend can be imported (without importing them)"""
+    needed = ["sentence_transformers"]
+    if (backend or RETRIEVER_BACKEND) == "chroma":
+        needed.append("chromadb")
+    return all(importlib.util.find_spec(name) is not None for name in needed)
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _load_lock:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=DB_DIR)
+    return _client
+
+
+def get_collection():
+    global _collection
+    if _collection is None:
+        client = get_client()
+        with _load_lock:
+            if _collection is None:
+                _collection = client.get_collection(COLLECTION_NAME)
+    return _collection
+
+
+def index_version():
+    """Version in the Chroma collection's manifest, bumped by build_mentor_index (re-read when the file changes)"""
+    global _manifest_version
+    try:
+        mtime = os.stat(manifest_path(DB_DIR)).st_mtime_ns
+    except OSError:
+        return 0
+    cached_mtime, version = _manifest_version
+    if mtime != cached_mtime:
+        version = read_manifest(DB_DIR).get("version", 0)
+        _manifest_version = (mtime, version)
+    return version
+
+
+def reset_collection():
+    """Re-fetch the collection and retriever on next use (after build_mentor_index recreated it)"""
+    global _collection, _retriever
+    with _load_lock:
+        _collection = None
+        _retriever = None
+
+
+def get_retriever():
+    """The configured Retriever (see retrievers.py)"""
+    global _retriever, _retriever_version
+    if _retriever is not None and RETRIEVER_BACKEND == "chroma" and index_version() != _retriever_version:
+        # build_mentor_index ran in another process (--rebuild recreates the collection): reopen it
+        reset_collection()
+    if _retriever is None:
+        version = index_version()
+        if RETRIEVER_BACKEND == "numpy":
+            retriever = NumpyRetriever(NUMPY_INDEX_DIR, dtype=RETRIEVER_CONFIG.get('DTYPE'))
+        else:
+            retriever = ChromaRetriever(get_collection(), index_version)
+        if HYBRID:
+            if os.path.exists(BM25_INDEX_PATH):
+                retriever = HybridRetriever(retriever, BM25Retriever(BM25_INDEX_PATH), HYBRID_CANDIDATES, RRF_K)
+            else:
+                print(f"BM25 index not found at {BM25_INDEX_PATH}, using vector search only. Run: python manage.py build_mentor_index")
+        with _load_lock:
+            if _retriever is None:
+                _retriever = retriever
+                _retriever_version = version
+    return _retriever
+
 
-# --------- LOAD COMPONENTS ---------
-client = chromadb.PersistentClient(path=DB_DIR)
-collection = client.get_collection("wealthplay_mentor")
-embed_model = SentenceTransformer(MODEL_NAME)
-ollama = Client()
+def get_embed_model():
+    global _embed_model
+    if _embed_model is None:
+        with _load_lock:
+            if _embed_model is None:
+                from sentence_transformers import SentenceTransformer
+                _embed_model = SentenceTransformer(MODEL_NAME)
+    return _embed_model
+
+
+def is_loaded():
+    return _retriever is not None and _embed_model is not None
+
+
+def warm():
+    """Load the retrieval index and the embedding model now; returns seconds per step"""
+    timings = {}
+    started = time.perf_counter()
+    get_retriever()
+    timings[f"{RETRIEVER_BACKEND}_index"] = time.perf_counter() - started
+    started = time.perf_counter()
+    get_embed_model()
+    # The first encode() initialises torch kernels; pay for it here too
+    get_embed_model().encode("warm up")
+    timings["embed_model"] = time.perf_counter() - started
+    return timings
 
 
 SYSTEM_PROMPT = """
@@ -48,31 +198,74 @@ Make finance feel simple, safe, and doable — never overwhelming.
 
 
 
-def generate_response(user_input):
-    # ---- Retrieve relevant chunks ----
-    embedding = embed_model.encode(user_input).tolist()
+def embed_query(text):
+    """float32 embedding of a user question (cached)"""
+    return query_embeddings.get_or_encode(text, lambda query: embedding_batcher.encode(query, timeout=EMBED_TIMEOUT))
 
-    results = collection.query(
-        query_embeddings=[embedding],
-        n_results=TOP_K
-    )
 
-    retrieved_text = "\n\n".join(results["documents"][0])
+def retrieve(user_input, k=TOP_K):
+    """
+    (chunks, knowledge text, {stage: ms}) for a user question. Results are
+    cached per index version and normalized question (a hit skips the
+    embedding too); timings are also recorded in retrieval_timings.
+    """
+    timings = {}
+    started = time.perf_counter()
+    retriever = get_retriever()
+    key = retrieval_cache.key((retriever.version, k), user_input)
+    cached = retrieval_cache.get(key)
+    if cached is None:
+        embed_started = time.perf_counter()
+        embedding = embed_query(user_input)
+        timings["embed_ms"] = (time.perf_counter() - embed_started) * 1000
+        results = tuple(retriever.retrieve(user_input, embedding, k, timings))
+        cached = (results, "\n\n".join(chunk.text for chunk in results))
+        retrieval_cache.put(key, cached)
+    timings["total_ms"] = (time.perf_counter() - started) * 1000
+    retrieval_timings.record(timings)
+    return cached[0], cached[1], timings
 
-    full_prompt = f"""
-{SYSTEM_PROMPT}
 
-User question: {user_input}
+def build_messages(user_input):
+    # ---- Retrieve relevant chunks ----
+    _, retrieved_text, _ = retrieve(user_input)
 
+    full_prompt = f"""
 Relevant knowledge:
 {retrieved_text}
 
+User question: {user_input}
+
 Now answer as the mentor:
 """
 
-    res = ollama.chat(
+    # The fixed system prompt goes first, as its own message, so the LLM server
+    # can reuse its KV cache across questions; only the user turn varies.
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": full_prompt}
+    ]
+
+
+def generate_response(user_input, user_key=None):
+    res = ollama_client.chat(
+        build_messages(user_input),
         model=OLLAMA_MODEL,
-        messages=[{"role": "user", "content": full_prompt}]
+        user_key=user_key
     )
 
     return res["message"]["content"]
+
+
+async def agenerate_response(user_input, user_key=None):
+    """generate_response without holding a thread while Ollama generates"""
+    messages = await sync_to_async(build_messages, thread_sensitive=False)(user_input)
+    res = await ollama_client.achat(messages, model=OLLAMA_MODEL, user_key=user_key)
+    return res["message"]["content"]
+
+
+async def stream_response(user_input, user_key=None):
+    """Async generator of answer chunks; retrieval runs in a worker thread"""
+    messages = await sync_to_async(build_messages, thread_sensitive=False)(user_input)
+    async for chunk in ollama_client.stream_chat(messages, model=OLLAMA_MODEL, user_key=user_key):
+        yield chunk
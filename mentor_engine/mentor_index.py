@@ -0,0 +1,301 @@
+"""
+Ingestion pipeline for the RAG mentor's vector DB
+
+Course content is turned into small text chunks, each with a stable id and
+a content hash (of the text and the embedding model name). Syncing a
+collection embeds only chunks that are new or whose hash changed, and
+deletes chunks whose content disappeared, so a re-run after editing one
+module only re-embeds that module.
+
+Sources:
+- course_modules/<course>/<module>/{flash_cards,mcqs,qna}.json
+- financial_course_full_content.json (theory text, fixed Q&A, mentor prompts)
+- course_content.json (flash cards, MCQs and Q&A per course module)
+
+A manifest next to the collection (vector_db/mentor_index.json) records
+the collection version, bumped whenever a sync changes anything.
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_CHUNK_CHARS = 800
+DEFAULT_OVERLAP_CHARS = 120
+
+MANIFEST_NAME = "mentor_index.json"
+
+# Backslashes not starting a valid JSON escape (course_content.json has a few, e.g. "\$")
+_INVALID_ESCAPE_RE = re.compile(r'\\(?!["\\/bfnrtu])')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    metadata: dict = field(default_factory=dict)
+    content_hash: str = ""
+
+
+def load_json_lenient(path):
+    """json.load that tolerates stray backslashes"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_INVALID_ESCAPE_RE.sub(r'\\\\', text))
+
+
+def as_list(value):
+    """Lists stored as Python-literal strings (financial_course_full_content.json) to lists"""
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return []
+    return value if isinstance(value, list) else []
+
+
+def chunk_text(text, max_chars=DEFAULT_CHUNK_CHARS, overlap=DEFAULT_OVERLAP_CHARS):
+    """Split text on sentence boundaries into chunks of at most ~max_chars, overlapping by ~overlap"""
+    if not 0 <= overlap < max_chars:
+        raise ValueError(f"chunk_text needs max_chars > overlap >= 0 (got max_chars={max_chars}, overlap={overlap})")
+    text = " ".join((text or "").split())
+    overlap = min(overlap, max_chars // 2)
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        while len(sentence) > max_chars:
+            # A single very long sentence: hard split
+            head, sentence = sentence[:max_chars], sentence[max_chars - overlap:]
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(head)
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            # Start the overlap at a word boundary
+            current = tail[tail.find(" ") + 1:] if " " in tail else tail
+            current = f"{current} {sentence}".strip()
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def flash_card_text(card):
+    parts = [card.get('topic', ''), card.get('theory_title', '')]
+    heading = " - ".join(p for p in parts if p)
+    return f"{heading}: {card.get('theory_content', '')}" if heading else card.get('theory_content', '')
+
+
+def mcq_text(mcq):
+    feedback = mcq.get('ai_feedback') or {}
+    explanation = feedback.get('correct', '') if isinstance(feedback, dict) else ''
+    answer = mcq.get('correct_answer') or mcq.get('correct_choice', '')
+    return f"Q: {mcq.get('question', '')}\nA: {answer}\n{explanation or mcq.get('explanation', '')}".strip()
+
+
+def qna_text(question, answer, explanation=""):
+    return f"Q: {question}\nA: {answer}\n{explanation or ''}".strip()
+
+
+def module_item_documents(prefix, course_id, module_id, title, flash_cards, mcqs, qna, source):
+    """(key, text, metadata) for the flash cards, MCQs and Q&A of one module"""
+    base = {"source": source, "course_id": str(course_id), "module_id": str(module_id), "title": title or ""}
+    for i, card in enumerate(flash_cards):
+        if isinstance(card, dict):
+            yield f"{prefix}/flash_cards/{card.get('id', i)}", flash_card_text(card), dict(base, kind="flash_card")
+    for i, mcq in enumerate(mcqs):
+        if isinstance(mcq, dict):
+            yield f"{prefix}/mcqs/{mcq.get('id', i)}", mcq_text(mcq), dict(base, kind="mcq")
+    for i, qa in enumerate(qna):
+        if isinstance(qa, dict):
+            text = qna_text(qa.get('question', qa.get('q', '')), qa.get('answer', qa.get('a', '')), qa.get('explanation', ''))
+            yield f"{prefix}/qna/{qa.get('id', i)}", text, dict(base, kind="qna")
+
+
+def course_modules_documents(root):
+    root = Path(root)
+    if not root.is_dir():
+        return
+    for module_dir in sorted(p for p in root.glob('*/*') if p.is_dir()):
+        course_id, module_id = module_dir.parent.name, module_dir.name
+        files = {}
+        for name in ('flash_cards', 'mcqs', 'qna'):
+            path = module_dir / f'{name}.json'
+            try:
+                files[name] = load_json_lenient(path) if path.exists() else []
+            except Exception as e:
+                print(f"Mentor index: skipping {path}: {e}")
+                files[name] = []
+        cards = files['flash_cards'] if isinstance(files['flash_cards'], list) else []
+        title = (cards[0].get('theory_title') or cards[0].get('topic', '')) if cards and isinstance(cards[0], dict) else ''
+        yield from module_item_documents(
+            f"course_modules/{course_id}/{module_id}", course_id, module_id, title,
+            cards, as_list(files['mcqs']), as_list(files['qna']), "course_modules"
+        )
+
+
+def full_content_documents(path):
+    if not os.path.exists(path):
+        return
+    data = load_json_lenient(path)
+    modules = data.get('modules', []) if isinstance(data, dict) else data
+    for module in modules if isinstance(modules, list) else []:
+        module_id = module.get('module_id', '')
+        if not module_id:
+            continue
+        prefix = f"full_content/{module_id}"
+        base = {"source": "financial_course_full_content", "course_id": module.get('topic_id', ''),
+                "module_id": module_id, "title": module.get('title', '')}
+        theory = " ".join(p for p in (module.get('summary', ''), module.get('theory_text', '')) if p)
+        if theory:
+            yield f"{prefix}/theory", f"{module.get('title', '')}: {theory}", dict(base, kind="theory")
+        for i, qa in enumerate(as_list(module.get('fixed_qna'))):
+            if isinstance(qa, dict):
+                yield f"{prefix}/qna/{i}", qna_text(qa.get('q', ''), qa.get('a', '')), dict(base, kind="qna")
+        for i, prompt in enumerate(as_list(module.get('mentor_prompts'))):
+            if isinstance(prompt, dict):
+                yield f"{prefix}/prompts/{i}", qna_text(prompt.get('user_q', ''), prompt.get('mentor_a', '')), dict(base, kind="mentor_prompt")
+
+
+def course_content_documents(path):
+    if not os.path.exists(path):
+        return
+    data = load_json_lenient(path)
+    courses = data.get('courses', []) if isinstance(data, dict) else data
+    for course in courses if isinstance(courses, list) else []:
+        course_id = course.get('course_id', course.get('id', ''))
+        for module in course.get('modules', []):
+            module_id = module.get('module_id', module.get('id', ''))
+            yield from module_item_documents(
+                f"course_content/{course_id}/{module_id}", course_id, module_id, module.get('title', ''),
+                as_list(module.get('flash_cards')), as_list(module.get('mcqs')), as_list(module.get('qna')),
+                "course_content"
+            )
+
+
+def source_documents(base_dir=None):
+    """(key, text, metadata) for every document in the three content sources"""
+    base_dir = Path(base_dir or settings.BASE_DIR)
+    yield from course_modules_documents(base_dir / 'course_modules')
+    yield from full_content_documents(base_dir / 'financial_course_full_content.json')
+    yield from course_content_documents(base_dir / 'course_content.json')
+
+
+def content_hash(text, model_name):
+    return hashlib.sha1(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+
+def build_chunks(model_name, base_dir=None, max_chars=DEFAULT_CHUNK_CHARS, overlap=DEFAULT_OVERLAP_CHARS):
+    """All chunks, keyed by stable ids '<document key>#<n>'"""
+    chunks = {}
+    for key, text, metadata in source_documents(base_dir):
+        for n, piece in enumerate(chunk_text(text, max_chars, overlap)):
+            chunk_id = f"{key}#{n}"
+            if chunk_id in chunks:
+                continue
+            digest = content_hash(piece, model_name)
+            chunks[chunk_id] = Chunk(chunk_id, piece, dict(metadata, content_hash=digest), digest)
+    return list(chunks.values())
+
+
+def existing_hashes(collection, page_size=5000):
+    """{chunk id: content hash} already in the collection"""
+    hashes = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids", [])
+        for chunk_id, metadata in zip(ids, page.get("metadatas") or []):
+            hashes[chunk_id] = (metadata or {}).get("content_hash", "")
+        if len(ids) < page_size:
+            return hashes
+        offset += page_size
+
+
+def sync_collection(collection, chunks, embed, batch_size=64, dry_run=False, progress=None):
+    """
+    Upsert new/changed chunks (embedding them batch by batch) and delete
+    chunks that are gone. embed(list of texts) -> list of vectors.
+    Returns {"total", "unchanged", "added", "updated", "deleted"}.
+    """
+    current = existing_hashes(collection)
+    wanted = {chunk.id for chunk in chunks}
+    changed = [chunk for chunk in chunks if current.get(chunk.id) != chunk.content_hash]
+    stale = [chunk_id for chunk_id in current if chunk_id not in wanted]
+    stats = {
+        "total": len(chunks),
+        "unchanged": len(chunks) - len(changed),
+        "added": sum(1 for chunk in changed if chunk.id not in current),
+        "updated": sum(1 for chunk in changed if chunk.id in current),
+        "deleted": len(stale),
+    }
+    if dry_run:
+        return stats
+
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        vectors = embed([chunk.text for chunk in batch])
+        collection.upsert(
+            ids=[chunk.id for chunk in batch],
+            documents=[chunk.text for chunk in batch],
+            metadatas=[chunk.metadata for chunk in batch],
+            embeddings=[list(map(float, vector)) for vector in vectors],
+        )
+        if progress:
+            progress(min(start + batch_size, len(changed)), len(changed))
+
+    for start in range(0, len(stale), 5000):
+        collection.delete(ids=stale[start:start + 5000])
+    return stats
+
+
+def manifest_path(db_dir):
+    return Path(db_dir) / MANIFEST_NAME
+
+
+def read_manifest(db_dir):
+    try:
+        with open(manifest_path(db_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": 0}
+
+
+def write_manifest(db_dir, manifest):
+    path = manifest_path(db_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def bump_version(db_dir, collection_name, model_name, stats):
+    """Increment the collection version if the sync changed anything; returns the manifest"""
+    manifest = read_manifest(db_dir)
+    if stats["added"] or stats["updated"] or stats["deleted"] or not manifest.get("version"):
+        manifest = {
+            "collection": collection_name,
+            "model": model_name,
+            "version": manifest.get("version", 0) + 1,
+            "chunks": stats["total"],
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        write_manifest(db_dir, manifest)
+    return manifest
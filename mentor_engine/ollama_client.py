@@ -0,0 +1,233 @@
+"""
+Shared Ollama client for the mentor engines
+
+One ollama.Client (and its pooled httpx connections) is kept per host and
+reused by every request; async callers get one AsyncClient per host and
+event loop. The model to run is resolved with ollama.list() once and cached
+for OLLAMA_MODEL_CACHE_TTL seconds; discovery only runs again early when a
+chat call fails because the model is missing. Every generation holds a
+slot of the shared LLMQueue (see llm_queue.py) while it runs.
+
+Calls pass settings.OLLAMA_KEEP_ALIVE so the model stays loaded between
+sparse requests, and each response's prompt-eval / eval timings are
+recorded in llm_metrics.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from ollama import AsyncClient, Client, ResponseError
+
+from mentor_engine.llm_metrics import llm_metrics
+from mentor_engine.llm_queue import get_llm_queue
+
+DEFAULT_MODEL = "phi3"
+FALLBACK_MODELS = ("llama3", "llama2", "mistral")
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# httpx async clients are bound to the loop they were created on: loop -> {host: AsyncClient}
+_async_clients = weakref.WeakKeyDictionary()
+
+# (host, preferred model) -> (resolved model, monotonic time resolved)
+_resolved_models = {}
+_resolved_models_lock = threading.Lock()
+
+
+def get_ollama_host():
+    return os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
+
+
+def get_default_model():
+    """Model from OLLAMA_MODEL, or phi3 if unset or empty"""
+    model = os.environ.get("OLLAMA_MODEL", DEFAULT_MODEL)
+    return model.strip() if model and model.strip() else DEFAULT_MODEL
+
+
+def _client_options():
+    max_connections = getattr(settings, 'OLLAMA_MAX_CONNECTIONS', 10)
+    return {
+        'timeout': getattr(settings, 'OLLAMA_TIMEOUT', None),
+        'limits': httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    }
+
+
+def _chat_kwargs(kwargs):
+    """kwargs with the configured keep_alive unless the caller set one"""
+    keep_alive = getattr(settings, 'OLLAMA_KEEP_ALIVE', None)
+    if keep_alive is not None and 'keep_alive' not in kwargs:
+        # Ollama reads a bare number as seconds ("-1" from the environment is not a valid duration)
+        if isinstance(keep_alive, str) and keep_alive.strip().lstrip('-').isdigit():
+            keep_alive = int(keep_alive)
+        kwargs = dict(kwargs, keep_alive=keep_alive)
+    return kwargs
+
+
+def get_client(host=None):
+    """The shared Client for host, created on first use"""
+    host = host or get_ollama_host()
+    client = _clients.get(host)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(host)
+            if client is None:
+                client = Client(host=host, **_client_options())
+                _clients[host] = client
+    return client
+
+
+def get_async_client(host=None):
+    """The shared AsyncClient for host on the running event loop"""
+    host = host or get_ollama_host()
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(host)
+    if client is None:
+        client = AsyncClient(host=host, **_client_options())
+        clients[host] = client
+    return client
+
+
+def _installed_model_names(client):
+    names = []
+    for m in client.list().get('models', []):
+        name = m.get('model') or m.get('name')
+        if name:
+            names.append(name)
+    return names
+
+
+def _pick_model(preferred, installed):
+    """preferred if installed (tag optional), else a known fallback, else the first installed model"""
+    for candidate in (preferred,) + FALLBACK_MODELS:
+        for name in installed:
+            if name == candidate or name.split(':', 1)[0] == candidate:
+                return name
+    if installed:
+        return installed[0]
+    raise Exception("No Ollama models found. Please install a model: ollama pull llama3")
+
+
+def resolve_model(preferred=None, host=None, refresh=False):
+    """Installed model to use for preferred, cached for OLLAMA_MODEL_CACHE_TTL seconds"""
+    preferred = (preferred or '').strip() or get_default_model()
+    host = host or get_ollama_host()
+    key = (host, preferred)
+    ttl = getattr(settings, 'OLLAMA_MODEL_CACHE_TTL', 300)
+
+    cached = _resolved_models.get(key)
+    if not refresh and cached and time.monotonic() - cached[1] < ttl:
+        return cached[0]
+
+    with _resolved_models_lock:
+        cached = _resolved_models.get(key)
+        if not refresh and cached and time.monotonic() - cached[1] < ttl:
+            return cached[0]
+        model = _pick_model(preferred, _installed_model_names(get_client(host)))
+        _resolved_models[key] = (model, time.monotonic())
+        return model
+
+
+def forget_models(host=None):
+    """Drop cached model resolutions for host (all hosts if None)"""
+    with _resolved_models_lock:
+        for key in list(_resolved_models):
+            if host is None or key[0] == host:
+                del _resolved_models[key]
+
+
+def is_model_not_found(error):
+    if isinstance(error, ResponseError) and error.status_code == 404:
+        return True
+    message = str(error).lower()
+    return "model" in message and "not found" in message
+
+
+def chat(messages, model=None, host=None, user_key=None, **kwargs):
+    """
+    ollama.chat on the shared client with the resolved model, once user_key
+    is admitted by the LLM queue (raises LLMBusy when it is full).
+    If the model disappeared from the server, rediscover once and retry.
+    """
+    host = host or get_ollama_host()
+    resolved = resolve_model(model, host)
+    kwargs = _chat_kwargs(kwargs)
+    with get_llm_queue().slot(user_key):
+        try:
+            response = get_client(host).chat(model=resolved, messages=messages, **kwargs)
+        except Exception as e:
+            if not is_model_not_found(e):
+                raise
+            retry_model = resolve_model(model, host, refresh=True)
+            if retry_model == resolved:
+                raise
+            resolved = retry_model
+            response = get_client(host).chat(model=resolved, messages=messages, **kwargs)
+    llm_metrics.record(resolved, response)
+    return response
+
+
+async def achat(messages, model=None, host=None, user_key=None, **kwargs):
+    """
+    Async chat(): same model resolution, queueing and retry, but awaits the
+    shared AsyncClient instead of holding a thread while Ollama generates.
+    """
+    host = host or get_ollama_host()
+    resolved = await sync_to_async(resolve_model, thread_sensitive=False)(model, host)
+    kwargs = _chat_kwargs(kwargs)
+    async with get_llm_queue().async_slot(user_key):
+        try:
+            response = await get_async_client(host).chat(model=resolved, messages=messages, **kwargs)
+        except Exception as e:
+            if not is_model_not_found(e):
+                raise
+            retry_model = await sync_to_async(resolve_model, thread_sensitive=False)(model, host, refresh=True)
+            if retry_model == resolved:
+                raise
+            resolved = retry_model
+            response = await get_async_client(host).chat(model=resolved, messages=messages, **kwargs)
+    llm_metrics.record(resolved, response)
+    return response
+
+
+async def stream_chat(messages, model=None, host=None, user_key=None, **kwargs):
+    """
+    Async generator of answer text chunks from ollama chat(stream=True),
+    holding an LLM queue slot for user_key until the stream ends.
+    A missing model is rediscovered and retried once, as long as nothing was
+    streamed yet.
+    """
+    host = host or get_ollama_host()
+    resolved = await sync_to_async(resolve_model, thread_sensitive=False)(model, host)
+    kwargs = _chat_kwargs(kwargs)
+    retried = False
+    async with get_llm_queue().async_slot(user_key):
+        while True:
+            started = False
+            try:
+                stream = await get_async_client(host).chat(model=resolved, messages=messages, stream=True, **kwargs)
+                async for part in stream:
+                    content = part.get('message', {}).get('content', '')
+                    if content:
+                        started = True
+                        yield content
+                    if part.get('done'):
+                        # The final chunk carries the timings of the whole generation
+                        llm_metrics.record(resolved, part)
+                return
+            except Exception as e:
+                if started or retried or not is_model_not_found(e):
+                    raise
+                retried = True
+                retry_model = await sync_to_async(resolve_model, thread_sensitive=False)(model, host, refresh=True)
+                if retry_model == resolved:
+                    raise
+                resolved = retry_model
@@ -0,0 +1,104 @@
+"""
+Precomputed fuzzy matcher for fixed Q&A questions
+
+Returns exactly what scanning every question with
+difflib.SequenceMatcher(None, q.lower(), user_q.lower()).ratio() returns,
+but is built once per module:
+1. A character-trigram inverted index orders candidates so the likely best
+   questions are scored first.
+2. Cheap upper bounds on ratio() (length and character-count overlap) prune
+   the remaining candidates without running SequenceMatcher on them.
+"""
+import difflib
+from collections import Counter
+
+
+def question_trigrams(text):
+    """Character trigrams of text, padded so short words still produce some"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def ratio_bound(matches, len_a, len_b):
+    """Upper bound of SequenceMatcher.ratio() given at most `matches` matching chars"""
+    total = len_a + len_b
+    return 2.0 * matches / total if total else 1.0
+
+
+class QuestionMatcher:
+    """Fuzzy matcher over one module's fixed Q&A, built once when content loads"""
+
+    def __init__(self, fixed_qna):
+        self.qna = []
+        self._questions = []
+        self._lengths = []
+        self._char_counts = []
+        self._trigram_index = {}
+
+        for qa in fixed_qna or []:
+            if not isinstance(qa, dict):
+                continue
+            question = (qa.get("q") or "").lower()
+            idx = len(self.qna)
+            self.qna.append(qa)
+            self._questions.append(question)
+            self._lengths.append(len(question))
+            self._char_counts.append(Counter(question))
+            for trigram in question_trigrams(question):
+                self._trigram_index.setdefault(trigram, []).append(idx)
+
+    def __len__(self):
+        return len(self.qna)
+
+    def _candidates(self, user_q):
+        """All question indexes, most shared trigrams first, ties in original order"""
+        shared = Counter()
+        for trigram in question_trigrams(user_q):
+            for idx in self._trigram_index.get(trigram, ()):
+                shared[idx] += 1
+        ranked = sorted(shared, key=lambda idx: (-shared[idx], idx))
+        unseen = [idx for idx in range(len(self.qna)) if idx not in shared]
+        return ranked + unseen
+
+    def match(self, user_q, cutoff=0.7):
+        """
+        Best matching Q&A for user_q, or None if its ratio is below cutoff.
+        Ties go to the earliest question, as in a linear scan.
+        """
+        if not self.qna:
+            return None
+
+        user_q = user_q.lower()
+        user_len = len(user_q)
+        user_counts = Counter(user_q)
+
+        # SequenceMatcher caches its analysis of seq2, so the user question is
+        # set once and each candidate question is swapped in as seq1.
+        matcher = difflib.SequenceMatcher(None)
+        matcher.set_seq2(user_q)
+
+        best_idx = None
+        best_score = 0
+
+        def cannot_win(bound, idx):
+            if bound < cutoff or bound < best_score:
+                return True
+            return bound == best_score and best_idx is not None and idx > best_idx
+
+        for idx in self._candidates(user_q):
+            q_len = self._lengths[idx]
+            if cannot_win(ratio_bound(min(q_len, user_len), q_len, user_len), idx):
+                continue
+            overlap = sum((self._char_counts[idx] & user_counts).values())
+            if cannot_win(ratio_bound(overlap, q_len, user_len), idx):
+                continue
+
+            matcher.set_seq1(self._questions[idx])
+            score = matcher.ratio()
+            if score > best_score or (score == best_score and best_idx is not None and idx < best_idx):
+                best_score = score
+                best_idx = idx
+
+        if best_idx is None or best_score < cutoff:
+            return None
+        return self.qna[best_idx]
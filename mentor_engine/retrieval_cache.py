@@ -0,0 +1,74 @@
+"""
+Retrieval result cache for the RAG mentor
+
+Maps (index version, normalized question) to the retrieved chunks and the
+assembled "Relevant knowledge" text, so repeated questions skip the query
+embedding, the search and prompt assembly. Questions are normalized like
+answer cache keys (answer_cache.normalize_question): case, punctuation,
+contractions and filler words such as "please" don't make a new entry.
+
+(Rounding the embedding itself is no use as a key: with 384 dimensions,
+two near-identical questions almost always differ in some coordinate's
+rounding, so they would never share a bucket.)
+
+Entries are tagged with the index version; when build_mentor_index bumps
+it, the first lookup with the new version drops everything older.
+"""
+import threading
+from collections import OrderedDict
+
+from mentor_engine.answer_cache import normalize_question
+
+
+class RetrievalCache:
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def key(self, version, question):
+        return (version, normalize_question(question))
+
+    def _check_version(self, version):
+        """Drop every entry when the index version changed (call with the lock held)"""
+        if version != self._version:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key):
+        with self._lock:
+            self._check_version(key[0])
+            value = self._entries.get(key)
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._check_version(key[0])
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["version"] = self._version
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        return stats
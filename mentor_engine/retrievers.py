@@ -0,0 +1,401 @@
+"""
+Retrieval backends for the RAG mentor
+
+Every backend answers search(embedding, k) with the k most similar chunks.
+- ChromaRetriever: the wealthplay_mentor Chroma collection (default).
+- NumpyRetriever: a memory-mapped matrix of L2-normalized embeddings, as
+  float32 or int8 with one scale per row. Top-k is one matrix-vector
+  product plus argpartition; with a few thousand chunks that is well under a
+  millisecond and needs no database process.
+- HybridRetriever: one of the above plus the BM25 keyword index (bm25.py),
+  merged with reciprocal-rank fusion, so exact terms like "80C" or "CIBIL"
+  are found even when the embedding misses them.
+
+The NumPy index is written by NumpyIndexWriter, which has the same get /
+upsert / delete methods as a Chroma collection, so build_mentor_index syncs
+it incrementally the same way. Selected by settings.MENTOR_RETRIEVER.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+# Rows per block when scoring an int8 matrix (bounds the float32 upcast)
+INT8_BLOCK_ROWS = 4096
+
+
+@dataclass
+class RetrievedChunk:
+    id: str
+    text: str
+    score: float                 # cosine similarity
+    metadata: dict = field(default_factory=dict)
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_int8(matrix):
+    """Per-row symmetric int8 quantization: matrix ~= q * scales[:, None]"""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+def top_k(scores, k):
+    """Indexes of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def rrf_fuse(ranked_lists, k=4, rrf_k=60):
+    """
+    Reciprocal-rank fusion: each list adds 1 / (rrf_k + rank) to a chunk's
+    score. Only ranks matter, so BM25 and cosine scores need no calibration.
+    """
+    fused = {}
+    for results in ranked_lists:
+        for rank, chunk in enumerate(results, start=1):
+            score, first = fused.get(chunk.id, (0.0, chunk))
+            fused[chunk.id] = (score + 1.0 / (rrf_k + rank), first)
+    best = sorted(fused.values(), key=lambda item: -item[0])[:k]
+    return [RetrievedChunk(chunk.id, chunk.text, score, chunk.metadata) for score, chunk in best]
+
+
+class StageTimings:
+    """Recent per-stage retrieval times (ms) with percentiles, for the stats endpoint"""
+
+    def __init__(self, max_samples=1000):
+        self._samples = {}
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+
+    def record(self, timings):
+        with self._lock:
+            for stage, ms in timings.items():
+                self._samples.setdefault(stage, deque(maxlen=self._max_samples)).append(ms)
+
+    def stats(self):
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "p50": round(values[len(values) // 2], 3),
+                "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "max": round(values[-1], 3),
+                "samples": len(values),
+            }
+            for stage, values in samples.items() if values
+        }
+
+
+class Retriever:
+    name = "base"
+
+    def search(self, embedding, k=4):
+        """[RetrievedChunk] for the k chunks most similar to embedding"""
+        raise NotImplementedError
+
+    def retrieve(self, query, embedding, k=4, timings=None):
+        """Chunks for a user question; adds per-stage milliseconds to timings"""
+        started = time.perf_counter()
+        results = self.search(embedding, k)
+        if timings is not None:
+            timings["dense_ms"] = (time.perf_counter() - started) * 1000
+        return results
+
+    @property
+    def version(self):
+        """Changes whenever the indexed content changes"""
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class ChromaRetriever(Retriever):
+    name = "chroma"
+
+    def __init__(self, collection, version_fn=lambda: 0):
+        self.collection = collection
+        self._version_fn = version_fn
+
+    def search(self, embedding, k=4):
+        results = self.collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        ids = results["ids"][0]
+        documents = results["documents"][0]
+        metadatas = (results.get("metadatas") or [[None] * len(ids)])[0]
+        distances = (results.get("distances") or [[None] * len(ids)])[0]
+        return [
+            RetrievedChunk(
+                id=chunk_id,
+                text=document,
+                # Squared L2 between unit vectors is 2 - 2cos
+                score=1.0 - distance / 2.0 if distance is not None else 0.0,
+                metadata=metadata or {},
+            )
+            for chunk_id, document, metadata, distance in zip(ids, documents, metadatas, distances)
+        ]
+
+    @property
+    def version(self):
+        return self._version_fn()
+
+    def __len__(self):
+        return self.collection.count()
+
+
+# --- NumPy index on disk ---
+#   manifest.json      {"version", "dtype", "dim", "count", "model", "updated_at"}
+#   chunks.json        {"ids": [...], "documents": [...], "metadatas": [...]}
+#   embeddings.f32.npy normalized float32 matrix (always kept; the writer's source of truth)
+#   embeddings.i8.npy + scales.npy  when dtype is int8
+
+def _read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _replace_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _replace_npy(path, array):
+    tmp = f"{path}.tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+class NumpyIndexWriter:
+    """Collection-like writer for the NumPy index; call save() when done"""
+
+    def __init__(self, directory, dtype="float32", model_name=""):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported dtype '{dtype}', use float32 or int8")
+        self.directory = Path(directory)
+        self.dtype = dtype
+        self.model_name = model_name
+        self.manifest = _read_json(self.directory / "manifest.json", {"version": 0})
+        chunks = _read_json(self.directory / "chunks.json", {"ids": [], "documents": [], "metadatas": []})
+        self.rows = {}
+        matrix_path = self.directory / "embeddings.f32.npy"
+        matrix = np.load(matrix_path) if matrix_path.exists() and chunks["ids"] else None
+        if matrix is not None and len(matrix) == len(chunks["ids"]):
+            for i, chunk_id in enumerate(chunks["ids"]):
+                self.rows[chunk_id] = (chunks["documents"][i], chunks["metadatas"][i], matrix[i])
+        self.changed = self.manifest.get("dtype") != dtype
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include=(), limit=None, offset=0):
+        ids = sorted(self.rows)[offset:offset + limit if limit else None]
+        return {"ids": ids, "metadatas": [self.rows[i][1] for i in ids]}
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for chunk_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            self.rows[chunk_id] = (document, metadata, np.asarray(embedding, dtype=np.float32))
+        self.changed = self.changed or bool(ids)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            if self.rows.pop(chunk_id, None) is not None:
+                self.changed = True
+
+    def save(self):
+        """Write the index if anything changed; returns the manifest"""
+        if not self.changed and self.manifest.get("version"):
+            return self.manifest
+        self.directory.mkdir(parents=True, exist_ok=True)
+        ids = sorted(self.rows)
+        dim = len(self.rows[ids[0]][2]) if ids else 0
+        matrix = normalize_rows(np.stack([self.rows[i][2] for i in ids])) if ids else np.zeros((0, dim), np.float32)
+
+        _replace_npy(self.directory / "embeddings.f32.npy", matrix)
+        if self.dtype == "int8":
+            q, scales = quantize_int8(matrix) if ids else (np.zeros((0, dim), np.int8), np.zeros(0, np.float32))
+            _replace_npy(self.directory / "embeddings.i8.npy", q)
+            _replace_npy(self.directory / "scales.npy", scales)
+        _replace_json(self.directory / "chunks.json", {
+            "ids": ids,
+            "documents": [self.rows[i][0] for i in ids],
+            "metadatas": [self.rows[i][1] for i in ids],
+        })
+        # Manifest last: readers reload when its version changes
+        self.manifest = {
+            "version": self.manifest.get("version", 0) + 1,
+            "dtype": self.dtype,
+            "dim": dim,
+            "count": len(ids),
+            "model": self.model_name,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        _replace_json(self.directory / "manifest.json", self.manifest)
+        self.changed = False
+        return self.manifest
+
+
+class NumpyRetriever(Retriever):
+    """Brute-force cosine search over a memory-mapped embedding matrix"""
+    name = "numpy"
+
+    def __init__(self, directory, dtype=None, check_interval=10.0):
+        self.directory = Path(directory)
+        self.requested_dtype = dtype
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._state = None
+        self._load()
+
+    def _load(self):
+        manifest = _read_json(self.directory / "manifest.json", None)
+        if manifest is None:
+            raise FileNotFoundError(f"No NumPy mentor index in {self.directory}. Run: python manage.py build_mentor_index --backend numpy")
+        built_dtype = manifest.get("dtype", "float32")
+        dtype = self.requested_dtype or built_dtype
+        if dtype == "int8" and built_dtype != "int8":
+            # Only int8 builds write the quantized matrix (float32 is always kept)
+            raise ValueError(
+                f"The NumPy mentor index in {self.directory} was built as {built_dtype}, not int8. "
+                f"Rebuild it: python manage.py build_mentor_index --backend numpy --dtype int8"
+            )
+        chunks = _read_json(self.directory / "chunks.json", {"ids": [], "documents": [], "metadatas": []})
+        if dtype == "int8":
+            matrix = np.load(self.directory / "embeddings.i8.npy", mmap_mode="r")
+            scales = np.load(self.directory / "scales.npy")
+        else:
+            matrix = np.load(self.directory / "embeddings.f32.npy", mmap_mode="r")
+            scales = None
+        self._state = (manifest, dtype, matrix, scales, chunks)
+        self._checked_at = time.monotonic()
+
+    def _current(self):
+        """Loaded index, reloaded if build_mentor_index wrote a newer version"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    manifest = _read_json(self.directory / "manifest.json", None)
+                    if manifest and manifest.get("version") != self._state[0].get("version"):
+                        self._load()
+                    self._checked_at = time.monotonic()
+        return self._state
+
+    @property
+    def dtype(self):
+        return self._current()[1]
+
+    @property
+    def ids(self):
+        """Chunk ids, in the row order of matrix"""
+        return self._current()[4]["ids"]
+
+    @property
+    def matrix(self):
+        """The (memory-mapped) normalized embedding matrix search scores, float32 or int8"""
+        return self._current()[2]
+
+    @property
+    def version(self):
+        return self._current()[0].get("version", 0)
+
+    def __len__(self):
+        return len(self._current()[4]["ids"])
+
+    @property
+    def nbytes(self):
+        """Bytes of the embedding matrix (and scales) that search touches"""
+        _, _, matrix, scales, _ = self._current()
+        return matrix.nbytes + (scales.nbytes if scales is not None else 0)
+
+    def scores(self, embedding):
+        """Cosine similarity of every chunk to embedding"""
+        return self._scores(self._current(), embedding)
+
+    @staticmethod
+    def _scores(state, embedding):
+        _, dtype, matrix, scales, _ = state
+        query = normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        if dtype != "int8":
+            return matrix @ query
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), INT8_BLOCK_ROWS):
+            block = matrix[start:start + INT8_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores * scales
+
+    def search(self, embedding, k=4):
+        # One snapshot, so a reload mid-search cannot pair new scores with old chunks
+        state = self._current()
+        chunks = state[4]
+        if not chunks["ids"]:
+            return []
+        scores = self._scores(state, embedding)
+        return [
+            RetrievedChunk(
+                id=chunks["ids"][i],
+                text=chunks["documents"][i],
+                score=float(scores[i]),
+                metadata=chunks["metadatas"][i] or {},
+            )
+            for i in top_k(scores, k)
+        ]
+
+
+class HybridRetriever(Retriever):
+    """Dense retriever + BM25, each asked for `candidates` chunks, fused with RRF"""
+
+    def __init__(self, dense, lexical, candidates=20, rrf_k=60):
+        self.dense = dense
+        self.lexical = lexical
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.name = f"{dense.name}+{lexical.name}"
+
+    def search(self, embedding, k=4):
+        return self.dense.search(embedding, k)
+
+    def retrieve(self, query, embedding, k=4, timings=None):
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        dense = self.dense.search(embedding, max(k, self.candidates))
+        timings["dense_ms"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        lexical = self.lexical.search(query, max(k, self.candidates))
+        timings["bm25_ms"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        results = rrf_fuse([dense, lexical], k, self.rrf_k)
+        timings["fuse_ms"] = (time.perf_counter() - started) * 1000
+        return results
+
+    @property
+    def version(self):
+        return f"{self.dense.version}:{self.lexical.version}"
+
+    def __len__(self):
+        return len(self.dense)
@@ -0,0 +1,183 @@
+"""
+Single-flight coalescing of identical in-flight LLM generations
+
+When many learners ask the same question at once, only the first request
+(the leader) calls Ollama; the rest wait for its result instead of starting
+their own generation.
+
+SingleFlight coalesces blocking calls across threads, AsyncSingleFlight
+coroutines on one event loop. StreamFlight does the same for async token
+streams: the generation runs in its own task and every
+subscriber gets the chunks produced so far, then the rest as they arrive,
+so a leader disconnecting doesn't cut off the followers.
+"""
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Run fn once per key among concurrent callers and share its outcome"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key, fn):
+        """(result, shared). shared is True when another caller's run was reused"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._stats["followers"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["leaders"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+
+class AsyncSingleFlight:
+    """Await fn() once per key among concurrent coroutines and share its outcome"""
+
+    def __init__(self):
+        # Tasks belong to one event loop: loop -> {key: Task}
+        self._tasks = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    async def do(self, key, fn):
+        """(result, shared). The work runs in its own task, so a cancelled caller doesn't cancel the others"""
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        shared = task is not None
+        with self._lock:
+            self._stats["followers" if shared else "leaders"] += 1
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            tasks[key] = task
+
+            def finished(_task):
+                if tasks.get(key) is task:
+                    del tasks[key]
+            task.add_done_callback(finished)
+        return await asyncio.shield(task), shared
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = sum(len(tasks) for tasks in list(self._tasks.values()))
+        return stats
+
+
+class _Broadcast:
+    """Chunks of one running generation, replayable by late subscribers"""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.changed = asyncio.Condition()
+        self.task = None
+
+    async def run(self, source):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                async with self.changed:
+                    self.changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            async with self.changed:
+                self.changed.notify_all()
+
+    async def subscribe(self):
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self.changed:
+                if sent == len(self.chunks) and not self.finished:
+                    await self.changed.wait()
+
+
+class StreamFlight:
+    """Share one async chunk stream per key among concurrent subscribers"""
+
+    def __init__(self):
+        # Tasks and conditions belong to one event loop: loop -> {key: _Broadcast}
+        self._flights = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def stream(self, key, start):
+        """
+        Async iterator of chunks for key. start() returns the source async
+        iterator and is only called when no stream for key is running.
+        """
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        broadcast = flights.get(key)
+        with self._lock:
+            if broadcast is not None:
+                self._stats["followers"] += 1
+            else:
+                self._stats["leaders"] += 1
+        if broadcast is None:
+            broadcast = _Broadcast()
+            flights[key] = broadcast
+
+            def finished(_task):
+                if flights.get(key) is broadcast:
+                    del flights[key]
+
+            broadcast.task = asyncio.ensure_future(broadcast.run(start()))
+            broadcast.task.add_done_callback(finished)
+        return broadcast.subscribe()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = sum(len(flights) for flights in list(self._flights.values()))
+        return stats
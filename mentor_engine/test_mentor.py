@@ -1,12 +1,19 @@
 from mentor_engine.mentor import generate_response
 
-print("💬 WealthPlay Mentor Ready. Type your message.")
 
-while True:
-    user = input("\nYou: ")
-    if user.lower() in ["exit", "quit"]:
-        print("👋 Goodbye!")
-        break
+def main():
+    print("💬 WealthPlay Mentor Ready. Type your message.")
 
-    reply = generate_response(user)
-    print("\nMentor:", reply)
+    while True:
+        user = input("\nYou: ")
+        if user.lower() in ["exit", "quit"]:
+            print("👋 Goodbye!")
+            break
+
+        reply = generate_response(user)
+        print("\nMentor:", reply)
+
+
+# Interactive loop only when run directly, so the test runner can import this module
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Preloading for the mentor engines
+
+warm_mentors() loads what the first mentor question would otherwise pay
+for: the course lookup index, the RAG vector DB collection and embedding
+model, and optionally the Ollama model list. Used by the warm_mentor
+command and by WarmupLifespan when MENTOR_WARM_ON_STARTUP is set.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+
+
+def warm_mentors(course=True, rag=True, ollama=False):
+    """{step: seconds or error message}; failures are reported, not raised"""
+    results = {}
+
+    if course:
+        started = time.perf_counter()
+        try:
+            from mentor_engine.course_mentor import get_course_index
+            get_course_index()
+            results["course_index"] = time.perf_counter() - started
+        except Exception as e:
+            results["course_index"] = f"failed: {e}"
+
+    if rag:
+        from mentor_engine import mentor
+        if not mentor.dependencies_installed():
+            results["rag"] = "skipped: chromadb and sentence-transformers are not installed"
+        else:
+            try:
+                for step, seconds in mentor.warm().items():
+                    results[f"rag_{step}"] = seconds
+            except Exception as e:
+                results["rag"] = f"failed: {e}"
+
+    if ollama:
+        started = time.perf_counter()
+        try:
+            from mentor_engine import ollama_client
+            model = ollama_client.resolve_model()
+            results[f"ollama_model ({model})"] = time.perf_counter() - started
+        except Exception as e:
+            results["ollama_model"] = f"failed: {e}"
+
+    return results
+
+
+class WarmupLifespan:
+    """
+    ASGI lifespan app: on startup, warm the mentors in a worker thread so the
+    server starts accepting connections right away.
+    """
+
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if getattr(settings, "MENTOR_WARM_ON_STARTUP", False):
+                    asyncio.get_running_loop().run_in_executor(None, self.warm)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    def warm():
+        for step, result in warm_mentors(ollama=True).items():
+            if isinstance(result, float):
+                print(f"Mentor warm-up: {step} {result:.2f}s")
+            else:
+                print(f"Mentor warm-up: {step} {result}")
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, UserProgress, QuizAttempt, DemoPortfolio
+from .models import UserProfile, UserProgress, UserCourseSummary, QuizAttempt, DemoPortfolio, PortfolioSnapshot, PortfolioTransaction
 
 
 @admin.register(UserProfile)
@@ -19,6 +19,14 @@ class UserProgressAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
 
 
+@admin.register(UserCourseSummary)
+class UserCourseSummaryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'course_id', 'completed_modules', 'total_modules', 'xp_earned', 'last_activity']
+    list_filter = ['course_id']
+    search_fields = ['user__username', 'course_id']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
     list_display = ['user', 'course_id', 'module_id', 'score', 'max_score', 'completed_at']
@@ -33,3 +41,21 @@ class DemoPortfolioAdmin(admin.ModelAdmin):
     list_display = ['user', 'total_value', 'created_at', 'updated_at']
     search_fields = ['user__username']
     readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(PortfolioTransaction)
+class PortfolioTransactionAdmin(admin.ModelAdmin):
+    list_display = ['portfolio', 'side', 'symbol', 'quantity', 'price', 'amount', 'created_at']
+    list_filter = ['side', 'symbol']
+    search_fields = ['portfolio__user__username', 'symbol']
+    ordering = ['-created_at']
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PortfolioSnapshot)
+class PortfolioSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['portfolio', 'day', 'value', 'cash']
+    search_fields = ['portfolio__user__username']
+    ordering = ['-day']
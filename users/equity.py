@@ -0,0 +1,97 @@
+"""
+Portfolio equity curves from the PortfolioTransaction ledger
+
+Positions are replayed backwards from the portfolio's current state: the
+holdings at the end of day d are today's holdings minus every trade made
+after day d, and cash likewise. Portfolios that traded before the ledger
+existed are therefore valued as if they held their earliest known
+position. With trades bucketed into a (portfolios, days, symbols) delta
+array, one reversed cumulative sum gives every position and the values are
+(positions * closes).sum(axis=-1) + cash; the only per-trade Python work is
+reading the rows. replay() values a whole batch of portfolios at once, for
+the snapshot job (users/portfolio_snapshots.py).
+"""
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+
+from .market import SECONDS_PER_DAY
+from .models import PortfolioTransaction
+from .price_history import get_price_history
+
+
+def market_day(market, moment):
+    """Market day number of a datetime (0 before the epoch)"""
+    return max(0, int((moment.timestamp() - market.epoch) // SECONDS_PER_DAY))
+
+
+def day_start(market, day):
+    return datetime.fromtimestamp(market.epoch + day * SECONDS_PER_DAY, tz=dt_timezone.utc)
+
+
+def current_positions(portfolio, symbols_index):
+    """Quantities of the portfolio's holdings as an array indexed like the market's symbols"""
+    positions = np.zeros(len(symbols_index))
+    for symbol, holding in (portfolio.holdings or {}).items():
+        i = symbols_index.get(symbol)
+        if i is not None and isinstance(holding, dict):
+            positions[i] = float(holding.get('quantity', 0) or 0)
+    return positions
+
+
+def replay(portfolios, trades, market, first_day, closes):
+    """
+    (values, cash), each (portfolios, days), at the closes of days
+    first_day..first_day + len(closes) - 1.
+
+    trades are (portfolio index, created_at, side, symbol, quantity, amount)
+    rows for every trade of these portfolios since the start of first_day.
+    """
+    count, days = len(portfolios), len(closes)
+    quantities = np.zeros((count, days, len(market.symbols)))
+    cash_flows = np.zeros((count, days))
+    if trades:
+        owners, created_at, sides, symbols, qty, amounts = zip(*trades)
+        owners = np.array(owners, dtype=np.int64)
+        timestamps = np.array([t.timestamp() for t in created_at])
+        rows = np.clip(((timestamps - market.epoch) // SECONDS_PER_DAY).astype(np.int64) - first_day, 0, days - 1)
+        sign = np.where(np.array(sides) == 'buy', 1.0, -1.0)
+        cols = np.array([market.index.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+        known = cols >= 0
+        np.add.at(quantities, (owners[known], rows[known], cols[known]), sign[known] * np.array(qty, dtype=np.float64)[known])
+        np.add.at(cash_flows, (owners, rows), -sign * np.array(amounts, dtype=np.float64))
+
+    # Trades after the end of day d, summed: reversed cumulative sum shifted by one day
+    later_quantities = np.zeros_like(quantities)
+    later_quantities[:, :-1] = np.cumsum(quantities[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    later_cash = np.zeros_like(cash_flows)
+    later_cash[:, :-1] = np.cumsum(cash_flows[:, ::-1], axis=1)[:, ::-1][:, 1:]
+
+    positions = np.array([current_positions(p, market.index) for p in portfolios]).reshape(count, 1, -1) - later_quantities
+    cash = np.array([float(p.balance) for p in portfolios]).reshape(count, 1) - later_cash
+    values = np.einsum('pdn,dn->pd', positions, closes) + cash
+    return values, cash
+
+
+def equity_curve(portfolio, days=30, store=None):
+    """[{date, value, cash}] at each day's close for the last `days` days, today at the current price"""
+    store = store or get_price_history()
+    market = store.market
+    today, _ = market.position()
+    first_day = max(0, today - max(1, int(days)) + 1)
+    closes = store.bars(first_day, today)['close']
+
+    trades = [
+        (0,) + row for row in
+        PortfolioTransaction.objects.filter(portfolio=portfolio, created_at__gte=day_start(market, first_day))
+        .values_list('created_at', 'side', 'symbol', 'quantity', 'amount')
+    ]
+    values, cash = replay([portfolio], trades, market, first_day, closes)
+    return [
+        {
+            'date': market.day_date(first_day + i).isoformat(),
+            'value': round(float(values[0, i]), 2),
+            'cash': round(float(cash[0, i]), 2),
+        }
+        for i in range(len(closes))
+    ]
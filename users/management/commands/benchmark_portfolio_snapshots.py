@@ -0,0 +1,95 @@
+"""
+Django management command to measure snapshot_portfolios throughput
+Run: python manage.py benchmark_portfolio_snapshots [--portfolios 2000] [--trades 20] [--days 30]
+
+Creates synthetic users, portfolios and ledger trades inside a transaction,
+runs a full backfill and then an incremental run (nothing new to write),
+reports portfolios/s for both and rolls everything back.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.equity import day_start
+from users.models import DemoPortfolio, PortfolioHolding, PortfolioTransaction
+from users.portfolio_snapshots import snapshot_portfolios
+from users.price_history import get_price_history
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the daily portfolio snapshot job on synthetic portfolios (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--portfolios', type=int, default=2000, help='Synthetic portfolios to create')
+        parser.add_argument('--trades', type=int, default=20, help='Ledger trades per portfolio')
+        parser.add_argument('--days', type=int, default=30, help='Days of history to backfill')
+        parser.add_argument('--batch-size', type=int, default=500, help='Portfolios per batch')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        store = get_price_history()
+        market = store.market
+        today, _ = market.position()
+        store.ensure(today)
+        rng = random.Random(options['seed'])
+
+        try:
+            with transaction.atomic():
+                portfolios = self._create(options, market, today, rng)
+                queryset = DemoPortfolio.objects.filter(pk__in=[p.pk for p in portfolios])
+                for label in ('backfill', 'incremental'):
+                    stats = snapshot_portfolios(
+                        batch_size=options['batch_size'], backfill_days=options['days'],
+                        store=store, queryset=queryset,
+                    )
+                    self.stdout.write(
+                        f"  {label:12s} {stats['portfolios']} portfolios, {stats['snapshots']} snapshots "
+                        f"in {stats['seconds']}s: {stats['portfolios_per_s']} portfolios/s"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS('Synthetic data rolled back'))
+
+    def _create(self, options, market, today, rng):
+        prefix = f"snapshot-bench-{rng.randrange(10 ** 9)}-"
+        User.objects.bulk_create([User(username=f'{prefix}{i}') for i in range(options['portfolios'])])
+        users = User.objects.filter(username__startswith=prefix).order_by('pk')
+        created_at = day_start(market, max(0, today - options['days']))
+        DemoPortfolio.objects.bulk_create([
+            DemoPortfolio(user=user, balance=Decimal('50000.00'), total_value=Decimal('50000.00'))
+            for user in users
+        ])
+        portfolios = list(DemoPortfolio.objects.filter(user__in=users).order_by('pk'))
+        DemoPortfolio.objects.filter(pk__in=[p.pk for p in portfolios]).update(created_at=created_at)
+
+        # Buys only, with holdings and balance matching the ledger
+        trades = []
+        positions = []
+        for portfolio in portfolios:
+            holdings = {}
+            for _ in range(options['trades']):
+                symbol = rng.choice(market.symbols)
+                price = Decimal(str(round(market.price(symbol), 2)))
+                quantity = rng.randint(1, 10)
+                trades.append(PortfolioTransaction(
+                    portfolio=portfolio, side='buy', symbol=symbol, quantity=quantity,
+                    price=price, amount=price * quantity,
+                    created_at=created_at + timedelta(seconds=rng.randrange(options['days'] * 86400)),
+                ))
+                holding = holdings.setdefault(symbol, PortfolioHolding(portfolio=portfolio, symbol=symbol, avg_price=price))
+                holding.quantity += quantity
+                portfolio.balance -= price * quantity
+            positions.extend(holdings.values())
+        PortfolioTransaction.objects.bulk_create(trades, batch_size=1000)
+        PortfolioHolding.objects.bulk_create(positions, batch_size=1000)
+        DemoPortfolio.objects.bulk_update(portfolios, ['balance'], batch_size=500)
+        self.stdout.write(f"Created {len(portfolios)} portfolios with {len(trades)} trades")
+        return portfolios
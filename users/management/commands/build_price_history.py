@@ -0,0 +1,22 @@
+"""
+Django management command to generate the simulated market's daily price history
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from users.price_history import get_price_history
+
+
+class Command(BaseCommand):
+    help = 'Generate and store daily OHLCV bars for every completed simulated day (only missing days)'
+
+    def handle(self, *args, **options):
+        store = get_price_history()
+        today, _ = store.market.position()
+        before = store.days
+        started = time.perf_counter()
+        store.ensure(today)
+        self.stdout.write(self.style.SUCCESS(
+            f'{store.days} days of history in {store.directory} '
+            f'({store.days - before} generated in {time.perf_counter() - started:.1f}s)'
+        ))
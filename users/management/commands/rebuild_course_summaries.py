@@ -0,0 +1,22 @@
+"""
+Django management command to rebuild the UserCourseSummary table from UserProgress
+"""
+from django.core.management.base import BaseCommand
+from users.progress_summary import rebuild_course_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user course progress summaries from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of summary rows written per bulk insert'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding course progress summaries...')
+        count = rebuild_course_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} course summaries'))
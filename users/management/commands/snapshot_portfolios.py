@@ -0,0 +1,32 @@
+"""
+Django management command to snapshot every demo portfolio's value per simulated day
+Run after each simulated day (e.g. from cron): python manage.py snapshot_portfolios
+"""
+from django.core.management.base import BaseCommand
+from users.portfolio_snapshots import snapshot_portfolios
+
+
+class Command(BaseCommand):
+    help = 'Write daily value snapshots for every demo portfolio, from each one\'s latest snapshot onwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Portfolios valued and written per batch'
+        )
+        parser.add_argument(
+            '--backfill-days',
+            type=int,
+            default=30,
+            help='Days to backfill for portfolios without snapshots'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Snapshotting demo portfolios...')
+        stats = snapshot_portfolios(batch_size=options['batch_size'], backfill_days=options['backfill_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {stats['snapshots']} snapshots for {stats['portfolios']} portfolios "
+            f"in {stats['seconds']}s ({stats['portfolios_per_s']} portfolios/s)"
+        ))
@@ -0,0 +1,291 @@
+"""
+Simulated stock market for the demo trading portfolio
+
+All symbols move together on one shared clock, so every endpoint (and
+every server process) sees the same price for a symbol at the same moment:
+
+- Daily closes follow a geometric Brownian motion in log price with mild
+  mean reversion towards each stock's base price (so a demo market doesn't
+  drift off over months). Daily shocks are correlated: every stock shares
+  a market factor and stocks in the same sector move together more.
+- Within a day, prices move every TICK_SECONDS along a Brownian bridge
+  between the previous close and today's close, with the same correlation.
+
+Both are generated from a fixed seed (the day number seeds the intraday
+path), so the market is a deterministic function of time. The current
+tick's prices live in one float64 array indexed by symbol position, so a
+price read is a dict lookup plus an array index.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+
+SECONDS_PER_DAY = 86400
+
+# prices: float64 per symbol at the tick; prev_close: the previous daily close
+MarketSnapshot = namedtuple('MarketSnapshot', 'day tick prices prev_close')
+
+# Sample stock data - in production, this would come from an external API
+SAMPLE_STOCKS = [
+    {
+        'symbol': 'RELIANCE',
+        'name': 'Reliance Industries Ltd',
+        'current_price': 2456.50,
+        'change_percent': 1.25,
+        'category': 'Large Cap',
+        'sector': 'Energy',
+        'market_cap': '₹16.5L Cr',
+    },
+    {
+        'symbol': 'TCS',
+        'name': 'Tata Consultancy Services',
+        'current_price': 3521.00,
+        'change_percent': -0.75,
+        'category': 'Large Cap',
+        'sector': 'IT',
+        'market_cap': '₹12.8L Cr',
+    },
+    {
+        'symbol': 'HDFCBANK',
+        'name': 'HDFC Bank Ltd',
+        'current_price': 1658.75,
+        'change_percent': 0.50,
+        'category': 'Large Cap',
+        'sector': 'Banking',
+        'market_cap': '₹12.1L Cr',
+    },
+    {
+        'symbol': 'INFY',
+        'name': 'Infosys Ltd',
+        'current_price': 1523.25,
+        'change_percent': 1.10,
+        'category': 'Large Cap',
+        'sector': 'IT',
+        'market_cap': '₹6.3L Cr',
+    },
+    {
+        'symbol': 'HINDUNILVR',
+        'name': 'Hindustan Unilever Ltd',
+        'current_price': 2489.00,
+        'change_percent': -0.25,
+        'category': 'Large Cap',
+        'sector': 'FMCG',
+        'market_cap': '₹5.8L Cr',
+    },
+    {
+        'symbol': 'ICICIBANK',
+        'name': 'ICICI Bank Ltd',
+        'current_price': 1098.50,
+        'change_percent': 0.80,
+        'category': 'Large Cap',
+        'sector': 'Banking',
+        'market_cap': '₹7.7L Cr',
+    },
+    {
+        'symbol': 'SBIN',
+        'name': 'State Bank of India',
+        'current_price': 724.75,
+        'change_percent': 0.60,
+        'category': 'Large Cap',
+        'sector': 'Banking',
+        'market_cap': '₹6.5L Cr',
+    },
+    {
+        'symbol': 'BHARTIARTL',
+        'name': 'Bharti Airtel Ltd',
+        'current_price': 1245.00,
+        'change_percent': 1.50,
+        'category': 'Large Cap',
+        'sector': 'Telecom',
+        'market_cap': '₹6.9L Cr',
+    },
+    {
+        'symbol': 'ITC',
+        'name': 'ITC Ltd',
+        'current_price': 456.25,
+        'change_percent': -0.40,
+        'category': 'Large Cap',
+        'sector': 'FMCG',
+        'market_cap': '₹5.7L Cr',
+    },
+    {
+        'symbol': 'LTIM',
+        'name': 'LTI Mindtree Ltd',
+        'current_price': 5234.00,
+        'change_percent': 2.10,
+        'category': 'Mid Cap',
+        'sector': 'IT',
+        'market_cap': '₹1.2L Cr',
+    },
+]
+
+STOCKS_BY_SYMBOL = {stock['symbol']: stock for stock in SAMPLE_STOCKS}
+
+# Annualised volatility by category
+VOLATILITY = {'Large Cap': 0.22, 'Mid Cap': 0.30, 'Small Cap': 0.38}
+DEFAULT_VOLATILITY = 0.25
+MARKET_CORRELATION = 0.30   # any two stocks
+SECTOR_CORRELATION = 0.65   # two stocks in the same sector
+MEAN_REVERSION_HALF_LIFE_DAYS = 90
+
+
+def correlation_matrix(sectors, market=MARKET_CORRELATION, sector=SECTOR_CORRELATION):
+    same_sector = np.equal.outer(np.asarray(sectors, dtype=object), np.asarray(sectors, dtype=object))
+    corr = np.where(same_sector, sector, market).astype(np.float64)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+class MarketEngine:
+
+    def __init__(self, stocks, seed=42, tick_seconds=5, epoch=date(2025, 1, 1), clock=time.time):
+        self.symbols = [stock['symbol'] for stock in stocks]
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.base_prices = np.array([stock['current_price'] for stock in stocks], dtype=np.float64)
+        self.seed = seed
+        self.tick_seconds = tick_seconds
+        self.ticks_per_day = SECONDS_PER_DAY // tick_seconds
+        if isinstance(epoch, str):
+            epoch = date.fromisoformat(epoch)
+        self.epoch_date = epoch
+        self.epoch = datetime(epoch.year, epoch.month, epoch.day, tzinfo=dt_timezone.utc).timestamp()
+        self.clock = clock
+
+        vol = np.array([VOLATILITY.get(stock.get('category'), DEFAULT_VOLATILITY) for stock in stocks])
+        self.daily_vol = vol / np.sqrt(365.0)
+        self.chol = np.linalg.cholesky(correlation_matrix([stock.get('sector') for stock in stocks]))
+        self.mu = np.log(self.base_prices)
+        self.phi = 0.5 ** (1.0 / MEAN_REVERSION_HALF_LIFE_DAYS)
+
+        self._lock = threading.RLock()   # log_closes runs both under _advance and on its own
+        self._closes = self.mu[None, :].copy()   # log close of day 0 .. len-1 (day 0 = epoch)
+        self._intraday = (None, None)            # (day, (ticks_per_day + 1, n) log prices)
+        self._prev_close = None
+        self._snapshot = None
+
+    # --- daily closes ---
+
+    def _daily_shocks(self, start_day, end_day):
+        """Correlated log-return shocks for days [start_day, end_day)"""
+        rows = []
+        for day in range(start_day, end_day):
+            z = np.random.default_rng((self.seed, day, 0)).standard_normal(len(self.symbols))
+            rows.append((self.chol @ z) * self.daily_vol)
+        return np.array(rows).reshape(-1, len(self.symbols))
+
+    def log_closes(self, last_day):
+        """(last_day + 1, n) log closes for days 0..last_day; extended incrementally"""
+        known = self._closes
+        if last_day < len(known):
+            return known[:last_day + 1]
+        with self._lock:
+            known = self._closes
+            if last_day >= len(known):
+                shocks = self._daily_shocks(len(known), last_day + 1)
+                closes = np.empty((len(shocks), len(self.symbols)))
+                x = known[-1]
+                for i, shock in enumerate(shocks):
+                    x = self.mu + (x - self.mu) * self.phi + shock
+                    closes[i] = x
+                known = np.vstack([known, closes])
+                self._closes = known
+            return known[:last_day + 1]
+
+    # --- intraday ---
+
+    def intraday_path(self, day):
+        """Brownian bridge of log prices from yesterday's close to today's close"""
+        closes = self.log_closes(day)
+        start = closes[day - 1] if day > 0 else self.mu
+        end = closes[day]
+        steps = self.ticks_per_day
+        n = len(self.symbols)
+        z = np.random.default_rng((self.seed, day, 1)).standard_normal((steps, n))
+        path = np.empty((steps + 1, n))
+        path[0] = 0.0
+        np.cumsum(z @ self.chol.T, axis=0, out=path[1:])
+        path *= self.daily_vol / np.sqrt(steps)
+        # Pin the walk to both closes: start + t * (end - start + bridge correction)
+        t = np.linspace(0.0, 1.0, steps + 1)[:, None]
+        path += t * (end - start - path[-1])
+        path += start
+        return path
+
+    def intraday(self, day):
+        """intraday_path(day), reusing the path of the day being served"""
+        cached_day, path = self._intraday
+        return path if cached_day == day else self.intraday_path(day)
+
+    def day_date(self, day):
+        return self.epoch_date + timedelta(days=day)
+
+    def position(self, now=None):
+        """(day, tick) on the shared clock"""
+        elapsed = max(0.0, (self.clock() if now is None else now) - self.epoch)
+        day = int(elapsed // SECONDS_PER_DAY)
+        tick = int((elapsed - day * SECONDS_PER_DAY) // self.tick_seconds)
+        return day, tick
+
+    def _advance(self):
+        position = self.position()
+        snapshot = self._snapshot
+        if snapshot is not None and (snapshot.day, snapshot.tick) == position:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and (snapshot.day, snapshot.tick) == position:
+                return snapshot
+            day, tick = position
+            if day != self._intraday[0]:
+                self._intraday = (day, self.intraday_path(day))
+                self._prev_close = np.exp(self.log_closes(day)[day - 1]) if day > 0 else self.base_prices.copy()
+                self._prev_close.setflags(write=False)
+            prices = np.round(np.exp(self._intraday[1][tick]), 2)
+            prices.setflags(write=False)
+            self._snapshot = MarketSnapshot(day, tick, prices, self._prev_close)
+            return self._snapshot
+
+    # --- reads ---
+
+    def snapshot(self):
+        """Every symbol's price at the current tick; take one per request for consistent prices"""
+        return self._advance()
+
+    def price(self, symbol, snapshot=None):
+        """Current price of symbol, 0 if unknown"""
+        i = self.index.get(symbol)
+        if i is None:
+            return 0
+        return float((snapshot or self.snapshot()).prices[i])
+
+    def change_percent(self, symbol, snapshot=None):
+        """Change since the previous daily close"""
+        i = self.index.get(symbol)
+        if i is None:
+            return 0
+        snapshot = snapshot or self.snapshot()
+        return round(float((snapshot.prices[i] / snapshot.prev_close[i] - 1) * 100), 2)
+
+
+_market = None
+_market_lock = threading.Lock()
+
+
+def get_market():
+    """The process-wide MarketEngine from settings.MARKET_SIMULATION"""
+    global _market
+    if _market is None:
+        with _market_lock:
+            if _market is None:
+                config = getattr(settings, 'MARKET_SIMULATION', {})
+                _market = MarketEngine(
+                    SAMPLE_STOCKS,
+                    seed=config.get('SEED', 42),
+                    tick_seconds=config.get('TICK_SECONDS', 5),
+                    epoch=config.get('EPOCH', date(2025, 1, 1)),
+                )
+    return _market
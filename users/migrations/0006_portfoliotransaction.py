@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_usercoursesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell')], max_length=4)),
+                ('symbol', models.CharField(max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='users.demoportfolio')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['portfolio', 'created_at'], name='users_portf_portfol_01931c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_portfoliotransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cash', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='users.demoportfolio')),
+            ],
+            options={
+                'ordering': ['day'],
+                'unique_together': {('portfolio', 'day')},
+            },
+        ),
+    ]
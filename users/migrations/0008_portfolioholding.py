@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:39
+
+import django.db.models.deletion
+from decimal import Decimal, InvalidOperation
+from django.db import migrations, models
+
+
+def holdings_to_rows(apps, schema_editor):
+    """Copy each DemoPortfolio.holdings JSON entry into a PortfolioHolding row"""
+    DemoPortfolio = apps.get_model('users', 'DemoPortfolio')
+    PortfolioHolding = apps.get_model('users', 'PortfolioHolding')
+    rows = []
+    for portfolio in DemoPortfolio.objects.all().iterator():
+        holdings = portfolio.holdings if isinstance(portfolio.holdings, dict) else {}
+        for symbol, holding in holdings.items():
+            if not isinstance(holding, dict):
+                continue
+            try:
+                quantity = int(round(float(holding.get('quantity', 0) or 0)))
+                avg_price = Decimal(str(holding.get('avg_price', 0) or 0)).quantize(Decimal('0.0001'))
+            except (TypeError, ValueError, InvalidOperation):
+                continue
+            if quantity > 0:
+                rows.append(PortfolioHolding(portfolio=portfolio, symbol=symbol, quantity=quantity, avg_price=avg_price))
+    PortfolioHolding.objects.bulk_create(rows, batch_size=500)
+
+
+def rows_to_holdings(apps, schema_editor):
+    DemoPortfolio = apps.get_model('users', 'DemoPortfolio')
+    PortfolioHolding = apps.get_model('users', 'PortfolioHolding')
+    holdings = {}
+    for row in PortfolioHolding.objects.all().iterator():
+        holdings.setdefault(row.portfolio_id, {})[row.symbol] = {'quantity': row.quantity, 'avg_price': float(row.avg_price)}
+    for portfolio_id, value in holdings.items():
+        DemoPortfolio.objects.filter(pk=portfolio_id).update(holdings=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_portfoliosnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioHolding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=20)),
+                ('quantity', models.IntegerField(default=0)),
+                ('avg_price', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='users.demoportfolio')),
+            ],
+            options={
+                'ordering': ['symbol'],
+                'unique_together': {('portfolio', 'symbol')},
+            },
+        ),
+        migrations.RunPython(holdings_to_rows, rows_to_holdings),
+        migrations.RemoveField(
+            model_name='demoportfolio',
+            name='holdings',
+        ),
+    ]
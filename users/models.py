@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -122,6 +123,26 @@ class UserProgress(models.Model):
         return f"{self.user.username} - {self.course_id} - {self.module_id} - {self.status}"
 
 
+class UserCourseSummary(models.Model):
+    """Denormalized per-course rollup of UserProgress, kept in sync by progress_summary"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_summaries')
+    course_id = models.CharField(max_length=100)  # Course ID from JSON
+    completed_modules = models.IntegerField(default=0)
+    total_modules = models.IntegerField(default=0)
+    xp_earned = models.IntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+    modules = models.JSONField(default=dict, blank=True)  # {module_id: {status, xp_awarded, completed_at}}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [
+            ['user', 'course_id'],
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.course_id} - {self.completed_modules}/{self.total_modules}"
+
+
 class QuizAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
     course_id = models.CharField(max_length=100, blank=True, default='')  # For JSON-based courses
@@ -142,7 +163,6 @@ class DemoPortfolio(models.Model):
     """Demo portfolio for practice trading"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='demo_portfolio')
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=50000.00)
-    holdings = models.JSONField(default=dict)  # {stock_symbol: {quantity, avg_price, current_price}}
     total_value = models.DecimalField(max_digits=12, decimal_places=2, default=50000.00)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -150,6 +170,78 @@ class DemoPortfolio(models.Model):
     def __str__(self):
         return f"{self.user.username} - Demo Portfolio"
 
+    @property
+    def holdings(self):
+        """{symbol: {quantity, avg_price}} from the PortfolioHolding rows (uses prefetch_related('positions'))"""
+        return {
+            position.symbol: {'quantity': position.quantity, 'avg_price': float(position.avg_price)}
+            for position in self.positions.all()
+        }
+
+
+class PortfolioHolding(models.Model):
+    """Shares of one symbol in a DemoPortfolio; changed only with F() updates by users/orders.py"""
+    portfolio = models.ForeignKey(DemoPortfolio, on_delete=models.CASCADE, related_name='positions')
+    symbol = models.CharField(max_length=20)
+    quantity = models.IntegerField(default=0)
+    avg_price = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+
+    class Meta:
+        ordering = ['symbol']
+        unique_together = [
+            ['portfolio', 'symbol'],
+        ]
+
+    def __str__(self):
+        return f"{self.portfolio.user.username} - {self.quantity} {self.symbol} @ {self.avg_price}"
+
+
+class PortfolioTransaction(models.Model):
+    """Append-only ledger of demo trades; rows are never edited (see users/equity.py)"""
+    SIDE_CHOICES = [
+        ('buy', 'Buy'),
+        ('sell', 'Sell'),
+    ]
+
+    portfolio = models.ForeignKey(DemoPortfolio, on_delete=models.CASCADE, related_name='transactions')
+    side = models.CharField(max_length=4, choices=SIDE_CHOICES)
+    symbol = models.CharField(max_length=20)
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)  # quantity * price
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['portfolio', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Portfolio transactions are append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.portfolio.user.username} - {self.side} {self.quantity} {self.symbol} @ {self.price}"
+
+
+class PortfolioSnapshot(models.Model):
+    """Value of a DemoPortfolio at the close of one simulated market day, written by snapshot_portfolios"""
+    portfolio = models.ForeignKey(DemoPortfolio, on_delete=models.CASCADE, related_name='snapshots')
+    day = models.DateField()
+    value = models.DecimalField(max_digits=14, decimal_places=2)
+    cash = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        ordering = ['day']
+        unique_together = [
+            ['portfolio', 'day'],
+        ]
+
+    def __str__(self):
+        return f"{self.portfolio.user.username} - {self.day} - {self.value}"
+
 
 class FinancialGoal(models.Model):
     """User's financial goals"""
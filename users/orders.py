@@ -0,0 +1,103 @@
+"""
+Order execution for the demo trading portfolio
+
+An order runs in one transaction that locks the portfolio row
+(select_for_update). SQLite has no row locks: two orders that both read
+before writing make one of them fail with "database is locked" when it
+upgrades its read lock. There, orders placed in one process take turns on
+a process-wide lock (SQLite serializes writers anyway), and an order that
+still collides with another process or writer is rolled back and run again
+after a short randomized wait. The cash
+and the holding are changed with conditional F() updates, so the balance
+check and the debit are a single statement. The row is only written when
+the guard still holds, and nothing is read back into Python and saved
+over a concurrent change. The ledger row (PortfolioTransaction) is written
+in the same transaction.
+"""
+import random
+import threading
+import time
+from contextlib import nullcontext
+from decimal import Decimal
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .market import get_market
+from .models import DemoPortfolio, PortfolioHolding, PortfolioTransaction
+
+STARTING_BALANCE = Decimal('50000.00')
+LOCK_RETRIES = 30
+LOCK_RETRY_WAIT = 0.002   # seconds, doubled per attempt up to LOCK_RETRY_MAX_WAIT
+LOCK_RETRY_MAX_WAIT = 0.1
+
+_sqlite_order_lock = threading.Lock()
+
+
+class OrderError(Exception):
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def get_user_portfolio(user):
+    portfolio, _ = DemoPortfolio.objects.get_or_create(
+        user=user,
+        defaults={'balance': STARTING_BALANCE, 'total_value': STARTING_BALANCE}
+    )
+    return portfolio
+
+
+def execute_order(user, side, symbol, quantity, snapshot=None):
+    """
+    Buy or sell quantity shares of symbol at the market price of snapshot
+    (the current tick if None). Returns the updated portfolio with its
+    positions prefetched; raises OrderError when the order is rejected.
+    """
+    if side not in ('buy', 'sell'):
+        raise OrderError(f'Unknown order side {side}')
+    if not symbol or quantity <= 0:
+        raise OrderError('Invalid symbol or quantity')
+    price = Decimal(str(get_market().price(symbol, snapshot)))
+    if price <= 0:
+        raise OrderError('Stock not found', status=404)
+    amount = price * quantity
+
+    for attempt in range(LOCK_RETRIES):
+        try:
+            with _sqlite_order_lock if connection.vendor == 'sqlite' else nullcontext():
+                return _execute(get_user_portfolio(user).pk, side, symbol, quantity, price, amount)
+        except OperationalError as e:
+            # Retrying is only safe when the whole order was rolled back
+            if 'locked' not in str(e) or transaction.get_connection().in_atomic_block or attempt == LOCK_RETRIES - 1:
+                raise
+        time.sleep(random.uniform(0.5, 1.0) * min(LOCK_RETRY_MAX_WAIT, LOCK_RETRY_WAIT * 2 ** attempt))
+
+
+def _execute(portfolio_id, side, symbol, quantity, price, amount):
+    with transaction.atomic():
+        portfolio = DemoPortfolio.objects.select_for_update().get(pk=portfolio_id)
+        portfolios = DemoPortfolio.objects.filter(pk=portfolio_id)
+        positions = PortfolioHolding.objects.filter(portfolio_id=portfolio_id, symbol=symbol)
+        if side == 'buy':
+            if not portfolios.filter(balance__gte=amount).update(balance=F('balance') - amount, updated_at=timezone.now()):
+                raise OrderError('Insufficient balance')
+            updated = positions.update(
+                # SQLite stores whole-number decimals as integers and would divide them as integers
+                avg_price=Cast(F('quantity') * F('avg_price') + amount, FloatField()) / (F('quantity') + quantity),
+                quantity=F('quantity') + quantity,
+            )
+            if not updated:
+                PortfolioHolding.objects.create(portfolio=portfolio, symbol=symbol, quantity=quantity, avg_price=price)
+        else:
+            if not positions.filter(quantity__gte=quantity).update(quantity=F('quantity') - quantity):
+                raise OrderError('Insufficient shares')
+            positions.filter(quantity__lte=0).delete()
+            portfolios.update(balance=F('balance') + amount, updated_at=timezone.now())
+        PortfolioTransaction.objects.create(
+            portfolio=portfolio, side=side, symbol=symbol, quantity=quantity, price=price, amount=amount,
+        )
+        return DemoPortfolio.objects.prefetch_related('positions').get(pk=portfolio_id)
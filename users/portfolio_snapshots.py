@@ -0,0 +1,116 @@
+"""
+Daily portfolio value snapshots
+
+snapshot_portfolios() walks DemoPortfolio in primary key batches and, for
+each portfolio, writes a PortfolioSnapshot for every completed market day
+after its latest snapshot (the first run backfills up to backfill_days, not
+before the portfolio was created). A batch is valued in one vectorized
+replay of the ledger (equity.replay) and written with bulk_create, so the
+job is incremental and cheap to run after every simulated day.
+
+snapshot_history() serves the portfolio chart from the snapshots plus a
+live point for today, and falls back to replaying the ledger when a day
+has not been snapshotted yet.
+"""
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, prefetch_related_objects
+
+from .equity import day_start, equity_curve, market_day, replay
+from .models import DemoPortfolio, PortfolioSnapshot, PortfolioTransaction
+from .price_history import get_price_history
+
+
+def _snapshot_batch(batch, store, today, backfill_days):
+    market = store.market
+    ids = [portfolio.pk for portfolio in batch]
+    latest = dict(
+        PortfolioSnapshot.objects.filter(portfolio_id__in=ids)
+        .values('portfolio_id').annotate(last=Max('day')).values_list('portfolio_id', 'last')
+    )
+    pending = []
+    for portfolio in batch:
+        if portfolio.pk in latest:
+            start = (latest[portfolio.pk] - market.epoch_date).days + 1
+        else:
+            start = max(market_day(market, portfolio.created_at), today - backfill_days)
+        if start < today:
+            pending.append((portfolio, start))
+    if not pending:
+        return 0
+
+    first_day = min(start for _, start in pending)
+    closes = store.bars(first_day, today)['close']
+    portfolios = [portfolio for portfolio, _ in pending]
+    prefetch_related_objects(portfolios, 'positions')
+    owner = {portfolio.pk: i for i, portfolio in enumerate(portfolios)}
+    trades = [
+        (owner[row[0]],) + row[1:] for row in
+        PortfolioTransaction.objects.filter(portfolio_id__in=owner, created_at__gte=day_start(market, first_day))
+        .values_list('portfolio_id', 'created_at', 'side', 'symbol', 'quantity', 'amount')
+    ]
+    values, cash = replay(portfolios, trades, market, first_day, closes)
+
+    rows = [
+        PortfolioSnapshot(
+            portfolio_id=portfolio.pk,
+            day=market.day_date(day),
+            value=Decimal(f'{values[i, day - first_day]:.2f}'),
+            cash=Decimal(f'{cash[i, day - first_day]:.2f}'),
+        )
+        for i, (portfolio, start) in enumerate(pending)
+        for day in range(start, today)
+    ]
+    PortfolioSnapshot.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def snapshot_portfolios(batch_size=500, backfill_days=30, store=None, queryset=None):
+    """Snapshot every completed day not stored yet; returns {portfolios, snapshots, seconds, portfolios_per_s}"""
+    store = store or get_price_history()
+    today, _ = store.market.position()
+    queryset = (queryset if queryset is not None else DemoPortfolio.objects.all()).order_by('pk')
+
+    started = time.perf_counter()
+    portfolios = snapshots = 0
+    last_pk = 0
+    while True:
+        # Portfolio rows and their trades are read in one transaction so they agree
+        with transaction.atomic():
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            snapshots += _snapshot_batch(batch, store, today, backfill_days)
+        portfolios += len(batch)
+        last_pk = batch[-1].pk
+
+    seconds = time.perf_counter() - started
+    return {
+        'portfolios': portfolios,
+        'snapshots': snapshots,
+        'seconds': round(seconds, 3),
+        'portfolios_per_s': round(portfolios / seconds, 1) if seconds else 0.0,
+    }
+
+
+def snapshot_history(portfolio, days=30, store=None):
+    """[{date, value, cash}] for the last `days` days (from the portfolio's creation), today live"""
+    store = store or get_price_history()
+    market = store.market
+    today, _ = market.position()
+    first_day = max(0, today - max(1, int(days)) + 1, market_day(market, portfolio.created_at))
+
+    snapshots = list(
+        portfolio.snapshots.filter(day__gte=market.day_date(first_day), day__lt=market.day_date(today))
+        .values_list('day', 'value', 'cash')
+    )
+    if len(snapshots) < today - first_day:
+        # The job has not covered every completed day yet
+        return equity_curve(portfolio, today - first_day + 1, store)
+    history = [
+        {'date': day.isoformat(), 'value': float(value), 'cash': float(cash)}
+        for day, value, cash in snapshots
+    ]
+    return history + equity_curve(portfolio, 1, store)
@@ -0,0 +1,246 @@
+"""
+Daily OHLCV history of the simulated market
+
+Bars are derived from the market engine itself (users/market.py): a day's
+open is the previous close, high/low are the extremes of that day's
+intraday path and close is where the path ends, so charts agree with the
+live prices. Volume is seeded per day and grows with the size of the move.
+
+Completed days are generated once and stored in HISTORY_DIR as one .npy
+file per column, each a (days, symbols) array covering a contiguous range
+of days. Every save writes a fresh generation directory and then swaps in
+manifest.json, which names that directory and records its range and the
+market configuration the bars were generated with, so a reader never
+pairs one writer's columns with another's range. Files are memory-mapped
+on load. A request generates only the days it needs that are missing (each
+day replays its whole intraday path, ~10ms), extending the stored range
+backwards or forwards; python manage.py build_price_history generates
+every day since the epoch ahead of time, e.g. on deploy. Today's bar is
+built from the live intraday path up to the current tick. Processes that
+save concurrently each write their own generation; the last manifest
+swapped in wins and older generations are removed.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .market import get_market
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+MEDIAN_VOLUME = 4_000_000
+
+
+class PriceHistoryStore:
+
+    def __init__(self, directory, market):
+        self.directory = Path(directory)
+        self.market = market
+        # (first stored day, {column: (days, n) array}), swapped as one so readers see a consistent pair
+        self._stored = (0, None)
+        self._partial = None   # ((day, tick), today's bar)
+        self._lock = threading.Lock()
+
+    def _config(self):
+        return {
+            "seed": self.market.seed,
+            "epoch": self.market.epoch_date.isoformat(),
+            "tick_seconds": self.market.tick_seconds,
+            "symbols": self.market.symbols,
+            "base_prices": self.market.base_prices.tolist(),
+        }
+
+    @staticmethod
+    def _length(columns):
+        return 0 if columns is None else len(columns['close'])
+
+    @property
+    def days(self):
+        """Number of stored days"""
+        return self._length(self._stored[1])
+
+    @property
+    def first_day(self):
+        return self._stored[0]
+
+    @property
+    def end_day(self):
+        """One past the last stored day"""
+        first, columns = self._stored
+        return first + self._length(columns)
+
+    def _covers(self, first_day, end_day):
+        first, columns = self._stored
+        return first_day >= end_day or (columns is not None and first <= first_day and end_day <= first + self._length(columns))
+
+    # --- generation ---
+
+    def _bar(self, day, ticks=None):
+        """open, high, low, close, volume arrays of one day, up to tick index ticks if given"""
+        market = self.market
+        path = market.intraday(day)
+        if ticks is not None:
+            path = path[:ticks + 1]
+        open_, close = np.exp(path[0]), np.exp(path[-1])
+        high, low = np.exp(path.max(axis=0)), np.exp(path.min(axis=0))
+        rng = np.random.default_rng((market.seed, day, 2))
+        volume = rng.lognormal(np.log(MEDIAN_VOLUME), 0.35, len(market.symbols))
+        volume *= 1 + 25 * np.abs(path[-1] - path[0])
+        if ticks is not None:
+            volume *= len(path) / (market.ticks_per_day + 1)
+        return open_, high, low, close, np.rint(volume)
+
+    def _today(self, day, tick):
+        """Today's bar so far, recomputed once per tick"""
+        cached = self._partial
+        if cached is None or cached[0] != (day, tick):
+            cached = ((day, tick), self._bar(day, tick))
+            self._partial = cached
+        return cached[1]
+
+    def _generate(self, first_day, last_day):
+        rows = [self._bar(day) for day in range(first_day, last_day)]
+        return {
+            column: np.array([row[i] for row in rows]).reshape(-1, len(self.market.symbols))
+            for i, column in enumerate(COLUMNS)
+        }
+
+    # --- storage ---
+
+    def _load(self):
+        """(first day, columns) from disk if they were generated with this configuration"""
+        try:
+            manifest = json.loads((self.directory / 'manifest.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        generation = manifest.get('generation')
+        if manifest.get('config') != self._config() or not generation:
+            return None
+        try:
+            columns = {column: np.load(self.directory / generation / f'{column}.npy', mmap_mode='r') for column in COLUMNS}
+        except (OSError, ValueError):
+            return None
+        shape = (manifest.get('days', 0), len(self.market.symbols))
+        if any(array.shape != shape for array in columns.values()):
+            return None
+        return manifest.get('first_day', 0), columns
+
+    def _save(self, first_day, columns):
+        """Write columns to a new generation directory, then point manifest.json at it"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        generation = f'gen-{uuid.uuid4().hex}'
+        tmp = self.directory / f'{generation}.tmp'
+        tmp.mkdir()
+        for column, array in columns.items():
+            np.save(tmp / f'{column}.npy', np.ascontiguousarray(array, dtype=np.float64))
+        os.replace(tmp, self.directory / generation)
+        manifest = {
+            "config": self._config(),
+            "generation": generation,
+            "first_day": first_day,
+            "days": len(columns['close']),
+            "columns": list(COLUMNS),
+        }
+        tmp = self.directory / f'manifest.{os.getpid()}.tmp'
+        tmp.write_text(json.dumps(manifest), encoding='utf-8')
+        os.replace(tmp, self.directory / 'manifest.json')
+        # Readers that already mapped an old generation keep their open files; a concurrent writer
+        # whose generation is removed before its manifest lands only costs readers a regeneration
+        for path in self.directory.glob('gen-*'):
+            if path.name != generation and path.suffix != '.tmp':
+                shutil.rmtree(path, ignore_errors=True)
+
+    def ensure(self, end_day, first_day=0):
+        """Make sure completed days first_day..end_day-1 are stored; generates only the missing ones"""
+        if self._covers(first_day, end_day):
+            return
+        with self._lock:
+            if self._covers(first_day, end_day):
+                return
+            # Another process may have extended the files already
+            stored = self._load()
+            if stored is not None and self._length(stored[1]) > self.days:
+                self._stored = stored
+            if self._covers(first_day, end_day):
+                return
+            stored_first, stored = self._stored
+            if stored is None:
+                first, columns = first_day, self._generate(first_day, end_day)
+            else:
+                # The stored range stays contiguous: generate the days before and after it
+                first = min(first_day, stored_first)
+                stored_end = stored_first + self._length(stored)
+                parts = []
+                if first < stored_first:
+                    parts.append(self._generate(first, stored_first))
+                parts.append(stored)
+                if end_day > stored_end:
+                    parts.append(self._generate(stored_end, end_day))
+                columns = {column: np.concatenate([part[column] for part in parts]) for column in COLUMNS}
+            self._save(first, columns)
+            self._stored = (first, columns)
+
+    # --- queries ---
+
+    def bars(self, first_day, last_day):
+        """{column: (m, n) array} for days first_day..last_day, today's bar up to the current tick"""
+        market = self.market
+        today, tick = market.position()
+        last_day = min(last_day, today)
+        first_day = max(0, min(first_day, last_day))
+        end_day = min(last_day + 1, today)
+        self.ensure(end_day, first_day)
+        if first_day >= end_day:
+            columns = {column: np.empty((0, len(market.symbols))) for column in COLUMNS}
+        else:
+            stored_first, stored = self._stored
+            rows = slice(first_day - stored_first, end_day - stored_first)
+            columns = {column: np.asarray(stored[column][rows]) for column in COLUMNS}
+        if last_day == today:
+            partial = self._today(today, tick)
+            columns = {column: np.vstack([columns[column], partial[i][None, :]]) for i, column in enumerate(COLUMNS)}
+        return columns
+
+    def history(self, symbol, days=30):
+        """The last `days` daily bars of symbol (ending today), oldest first"""
+        market = self.market
+        i = market.index.get(symbol)
+        if i is None:
+            return []
+        today, _ = market.position()
+        days = max(1, int(days))
+        columns = self.bars(today - days + 1, today)
+        first_day = today - len(columns['close']) + 1
+        return [
+            {
+                'date': market.day_date(first_day + row).isoformat(),
+                'open': round(float(columns['open'][row, i]), 2),
+                'high': round(float(columns['high'][row, i]), 2),
+                'low': round(float(columns['low'][row, i]), 2),
+                'close': round(float(columns['close'][row, i]), 2),
+                'price': round(float(columns['close'][row, i]), 2),   # what the charts plot
+                'volume': int(columns['volume'][row, i]),
+            }
+            for row in range(len(columns['close']))
+        ]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_history():
+    """The process-wide PriceHistoryStore in MARKET_SIMULATION['HISTORY_DIR']"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'MARKET_SIMULATION', {})
+                directory = config.get('HISTORY_DIR', Path(settings.BASE_DIR) / 'market_data')
+                _store = PriceHistoryStore(directory, get_market())
+    return _store
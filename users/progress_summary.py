@@ -0,0 +1,116 @@
+"""
+Maintain the denormalized UserCourseSummary table from UserProgress rows.
+
+Progress views call refresh_course_summary() inside the same transaction that
+changes UserProgress, so course listings can read one summary row per course
+instead of scanning every progress row.
+"""
+from django.db import transaction
+
+from courses.load_from_folders import course_catalog
+from .models import UserProgress, UserCourseSummary
+
+PROGRESS_FIELDS = ('module_id', 'status', 'xp_awarded', 'completed_at', 'last_accessed')
+
+
+def catalog_module_ids(course_id):
+    """Module ids of a course as currently listed in course_modules"""
+    course = course_catalog.get_course(course_id)
+    return [m['id'] for m in course['modules']] if course else []
+
+
+def summarize_progress(progress_rows, module_ids):
+    """Build UserCourseSummary field values from UserProgress value dicts"""
+    modules = {}
+    xp_earned = 0
+    last_activity = None
+
+    for row in progress_rows:
+        xp_earned += row['xp_awarded'] or 0
+        if row['last_accessed'] and (last_activity is None or row['last_accessed'] > last_activity):
+            last_activity = row['last_accessed']
+        if row['module_id']:
+            modules[row['module_id']] = {
+                'status': row['status'],
+                'xp_awarded': row['xp_awarded'],
+                'completed_at': row['completed_at'].isoformat() if row['completed_at'] else None,
+            }
+
+    completed_modules = sum(
+        1 for module_id in module_ids
+        if modules.get(module_id, {}).get('status') == 'completed'
+    )
+
+    return {
+        'completed_modules': completed_modules,
+        'total_modules': len(module_ids),
+        'xp_earned': xp_earned,
+        'last_activity': last_activity,
+        'modules': modules,
+    }
+
+
+def refresh_course_summary(user, course_id):
+    """Recompute the summary row for one user and course"""
+    if not course_id:
+        return None
+    rows = UserProgress.objects.filter(user=user, course_id=course_id).values(*PROGRESS_FIELDS)
+    summary, _ = UserCourseSummary.objects.update_or_create(
+        user=user,
+        course_id=course_id,
+        defaults=summarize_progress(rows, catalog_module_ids(course_id)),
+    )
+    return summary
+
+
+def rebuild_course_summaries(batch_size=500, progress_model=UserProgress, summary_model=UserCourseSummary):
+    """
+    Drop every summary row and rebuild the table from UserProgress. Returns the row count.
+    The models can be swapped for their historical versions in a data migration.
+    """
+    module_ids_by_course = {}
+    summaries = []
+    created = 0
+
+    def flush():
+        nonlocal created
+        summary_model.objects.bulk_create(summaries)
+        created += len(summaries)
+        summaries.clear()
+
+    rows = (
+        progress_model.objects.exclude(course_id='')
+        .order_by('user_id', 'course_id')
+        .values('user_id', 'course_id', *PROGRESS_FIELDS)
+    )
+
+    with transaction.atomic():
+        summary_model.objects.all().delete()
+
+        group_key = None
+        group = []
+        for row in rows.iterator(chunk_size=batch_size):
+            key = (row['user_id'], row['course_id'])
+            if key != group_key and group:
+                summaries.append(_summary_for_group(summary_model, group_key, group, module_ids_by_course))
+                group = []
+                if len(summaries) >= batch_size:
+                    flush()
+            group_key = key
+            group.append(row)
+        if group:
+            summaries.append(_summary_for_group(summary_model, group_key, group, module_ids_by_course))
+        flush()
+
+    return created
+
+
+def _summary_for_group(summary_model, key, rows, module_ids_by_course):
+    user_id, course_id = key
+    if course_id not in module_ids_by_course:
+        module_ids_by_course[course_id] = catalog_module_ids(course_id)
+    return summary_model(
+        user_id=user_id,
+        course_id=course_id,
+        **summarize_progress(rows, module_ids_by_course[course_id]),
+    )
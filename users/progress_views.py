@@ -4,15 +4,18 @@ Progress tracking views for flashcards, MCQs, and module completion
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from .models import UserProgress, UserProfile
+from .progress_summary import refresh_course_summary
 import json
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def flashcard_flip(request):
     """Record flashcard flip and award XP"""
     course_id = request.data.get('course_id')
@@ -59,6 +62,7 @@ def flashcard_flip(request):
     progress.flashcards_flipped = flipped_cards
     progress.xp_awarded += xp_per_flashcard
     progress.save()
+    refresh_course_summary(request.user, course_id)
     
     return Response({
         "xp_awarded": xp_per_flashcard,
@@ -170,6 +174,7 @@ def get_module_progress(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def mcq_answer(request):
     """Record MCQ answer and award XP if correct"""
     course_id = request.data.get('course_id')
@@ -223,6 +228,7 @@ def mcq_answer(request):
     }
     progress.mcqs_progress = mcqs_progress
     progress.save()
+    refresh_course_summary(request.user, course_id)
     
     return Response({
         "correct": is_correct,
@@ -234,6 +240,7 @@ def mcq_answer(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def complete_module(request):
     """Mark module as completed when all flashcards and MCQs are done"""
     course_id = request.data.get('course_id')
@@ -266,6 +273,7 @@ def complete_module(request):
         progress.xp_awarded += xp_bonus
         progress.completed_at = timezone.now()
         progress.save()
+        refresh_course_summary(request.user, course_id)
     
     return Response({
         "completed": True,
@@ -1,3 +1,292 @@
-from django.test import TestCase
+import json
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+
+from .market import SAMPLE_STOCKS, MarketEngine, SECONDS_PER_DAY, get_market
+from .equity import equity_curve
+from .models import DemoPortfolio, PortfolioHolding, PortfolioSnapshot, PortfolioTransaction
+from . import orders
+from .orders import OrderError, execute_order, get_user_portfolio
+from .portfolio_snapshots import snapshot_history, snapshot_portfolios
+from .price_history import PriceHistoryStore
+
+
+class FixedClock:
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MarketEngineTests(TestCase):
+
+    def setUp(self):
+        self.epoch = date(2025, 1, 1)
+        start = MarketEngine(SAMPLE_STOCKS, epoch=self.epoch).epoch
+        self.clock = FixedClock(start + 40 * SECONDS_PER_DAY + 3600)
+
+    def engine(self, seed=42):
+        return MarketEngine(SAMPLE_STOCKS, seed=seed, epoch=self.epoch, clock=self.clock)
+
+    def test_prices_are_a_function_of_seed_and_time(self):
+        a, b = self.engine(), self.engine()
+        self.assertEqual(a.snapshot().prices.tolist(), b.snapshot().prices.tolist())
+        self.assertNotEqual(a.snapshot().prices.tolist(), self.engine(seed=7).snapshot().prices.tolist())
+        self.assertEqual(a.price('TCS'), a.price('TCS'))
+        self.assertEqual(a.price('UNKNOWN'), 0)
+
+        before = a.snapshot().prices.tolist()
+        self.clock.now += a.tick_seconds
+        self.assertNotEqual(a.snapshot().prices.tolist(), before)
+        self.assertEqual(a.snapshot().prices.tolist(), b.snapshot().prices.tolist())
+
+    def test_intraday_path_ends_at_the_daily_close(self):
+        engine = self.engine()
+        day, _ = engine.position()
+        path = engine.intraday_path(day)
+        self.assertAlmostEqual(path[-1][0], engine.log_closes(day)[day][0])
+        self.assertAlmostEqual(path[0][0], engine.log_closes(day)[day - 1][0])
+
+    def test_concurrent_log_closes_extend_the_series_once(self):
+        expected = self.engine().log_closes(300)
+        for _ in range(5):
+            engine = self.engine()
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(engine.log_closes, [300, 30, 150, 5, 299, 60, 300, 1]))
+            closes = engine.log_closes(300)
+            self.assertEqual(len(engine._closes), 301)
+            self.assertTrue((closes == expected).all())
+
+    def test_price_history_is_stored_and_extended(self):
+        self.clock.now = self.engine().epoch + 12 * SECONDS_PER_DAY + 7200
+        directory = tempfile.mkdtemp()
+        market = self.engine()
+        store = PriceHistoryStore(directory, market)
+
+        # Only the requested window is generated
+        with mock.patch.object(store, '_generate', wraps=store._generate) as generate:
+            history = store.history('ITC', 5)
+        generate.assert_called_once_with(8, 12)
+        self.assertEqual(len(history), 5)
+        self.assertEqual((store.first_day, store.days), (8, 4))
+        self.assertEqual(history[-1]['date'], '2025-01-13')
+        self.assertEqual(history[-1]['close'], market.price('ITC'))
+        self.assertEqual(history[-1]['open'], history[-2]['close'])
+        for bar in history:
+            self.assertLessEqual(bar['low'], min(bar['open'], bar['close']))
+            self.assertGreaterEqual(bar['high'], max(bar['open'], bar['close']))
+        self.assertEqual(store.history('ITC', 1000)[-5:], history)
+        self.assertEqual((store.first_day, store.days), (0, 12))
+
+        # A new process reads the same bars from disk and only generates the new day
+        self.clock.now += SECONDS_PER_DAY
+        reloaded = PriceHistoryStore(directory, self.engine())
+        with mock.patch.object(reloaded, '_generate', wraps=reloaded._generate) as generate:
+            later = reloaded.history('ITC', 6)
+        generate.assert_called_once_with(12, 13)
+        self.assertEqual(later[:4], history[:4])
+
+    def test_price_history_saves_swap_in_whole_generations(self):
+        directory = Path(tempfile.mkdtemp())
+        first = PriceHistoryStore(directory, self.engine())
+        second = PriceHistoryStore(directory, self.engine())
+        # Two processes that each generated a different range before seeing the other's files
+        first._save(8, first._generate(8, 12))
+        expected = second._generate(20, 25)
+        second._save(20, expected)
+
+        # The last save wins as a whole and replaces the older generation
+        first_day, columns = PriceHistoryStore(directory, self.engine())._load()
+        self.assertEqual(first_day, 20)
+        self.assertTrue((columns['close'] == expected['close']).all())
+        self.assertEqual([path.name for path in directory.glob('gen-*')], [json.loads((directory / 'manifest.json').read_text())['generation']])
+
+        # A range that does not match the stored columns is rejected, not served under the wrong dates
+        manifest = json.loads((directory / 'manifest.json').read_text())
+        (directory / 'manifest.json').write_text(json.dumps(dict(manifest, first_day=8, days=4)))
+        self.assertIsNone(PriceHistoryStore(directory, self.engine())._load())
+
+    def test_views_share_one_snapshot(self):
+        user = User.objects.create_user('trader', password='pw')
+        DemoPortfolio.objects.create(user=user, balance=50000, total_value=50000)
+        self.client.force_login(user)
+
+        response = self.client.post('/api/users/portfolio/buy/', {'symbol': 'INFY', 'quantity': 2}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        holding = response.json()['holdings'][0]
+        self.assertEqual(holding['avg_price'], holding['current_price'])
+
+
+class EquityCurveTests(TestCase):
+
+    def test_curve_matches_a_day_by_day_replay(self):
+        market = MarketEngine(SAMPLE_STOCKS, epoch=date(2025, 1, 1))
+        market.clock = FixedClock(market.epoch + 20 * SECONDS_PER_DAY + 600)
+        store = PriceHistoryStore(tempfile.mkdtemp(), market)
+        user = User.objects.create_user('ledger', password='pw')
+        portfolio = DemoPortfolio.objects.create(user=user, balance=Decimal('50000'))
+
+        # Trades on days 3..20; ITC was held before the ledger started
+        trades = [(3, 'buy', 'TCS', 4), (8, 'buy', 'ITC', 10), (8, 'sell', 'TCS', 1), (15, 'buy', 'INFY', 6), (20, 'sell', 'ITC', 3)]
+        closes = store.bars(0, 20)['close']
+        holdings = {'ITC': 5}
+        balance = Decimal('50000')
+        expected = []
+        for day in range(21):
+            for trade_day, side, symbol, quantity in trades:
+                if trade_day != day:
+                    continue
+                price = Decimal(str(round(float(closes[day, market.index[symbol]]), 2)))
+                sign = 1 if side == 'buy' else -1
+                holdings[symbol] = holdings.get(symbol, 0) + sign * quantity
+                balance -= sign * price * quantity
+                PortfolioTransaction.objects.create(
+                    portfolio=portfolio, side=side, symbol=symbol, quantity=quantity, price=price, amount=price * quantity,
+                    created_at=datetime.fromtimestamp(market.epoch + day * SECONDS_PER_DAY + 3600, tz=dt_timezone.utc),
+                )
+            expected.append(float(balance) + sum(q * closes[day, market.index[s]] for s, q in holdings.items()))
+        portfolio.balance = balance
+        portfolio.save()
+        PortfolioHolding.objects.bulk_create([
+            PortfolioHolding(portfolio=portfolio, symbol=symbol, quantity=q, avg_price=1) for symbol, q in holdings.items()
+        ])
+
+        curve = equity_curve(portfolio, 30, store)
+        self.assertEqual(len(curve), 21)
+        self.assertEqual(curve[0]['date'], '2025-01-01')
+        for point, value in zip(curve, expected):
+            self.assertAlmostEqual(point['value'], value, places=1)
+        self.assertEqual([p['value'] for p in equity_curve(portfolio, 5, store)], [p['value'] for p in curve[-5:]])
+
+        with self.assertRaises(ValueError):
+            PortfolioTransaction.objects.first().save()
+
+
+class PortfolioSnapshotTests(TestCase):
+
+    def test_snapshots_are_incremental_and_match_the_ledger(self):
+        market = MarketEngine(SAMPLE_STOCKS, epoch=date(2025, 1, 1))
+        market.clock = FixedClock(market.epoch + 10 * SECONDS_PER_DAY + 600)
+        store = PriceHistoryStore(tempfile.mkdtemp(), market)
+        portfolios = []
+        for i in range(3):
+            user = User.objects.create_user(f'snap{i}', password='pw')
+            portfolio = DemoPortfolio.objects.create(user=user, balance=Decimal('49000'))
+            PortfolioHolding.objects.create(portfolio=portfolio, symbol='SBIN', quantity=2, avg_price=500)
+            PortfolioTransaction.objects.create(
+                portfolio=portfolio, side='buy', symbol='SBIN', quantity=2, price=Decimal('500'), amount=Decimal('1000'),
+                created_at=datetime.fromtimestamp(market.epoch + (4 + i) * SECONDS_PER_DAY, tz=dt_timezone.utc),
+            )
+            portfolios.append(portfolio)
+        DemoPortfolio.objects.update(created_at=datetime.fromtimestamp(market.epoch, tz=dt_timezone.utc))
+
+        stats = snapshot_portfolios(batch_size=2, backfill_days=7, store=store)
+        self.assertEqual((stats['portfolios'], stats['snapshots']), (3, 21))   # days 3..9
+        self.assertEqual(snapshot_portfolios(store=store)['snapshots'], 0)
+
+        market.clock.now += SECONDS_PER_DAY
+        self.assertEqual(snapshot_portfolios(store=store)['snapshots'], 3)
+        self.assertEqual(PortfolioSnapshot.objects.filter(portfolio=portfolios[0]).count(), 8)
+
+        portfolio = DemoPortfolio.objects.get(pk=portfolios[1].pk)
+        history = snapshot_history(portfolio, 7, store)
+        expected = equity_curve(portfolio, 7, store)
+        self.assertEqual([p['date'] for p in history], [p['date'] for p in expected])
+        for point, exact in zip(history, expected):
+            self.assertAlmostEqual(point['value'], exact['value'], places=2)
+        # Bought on day 5: the day before it held only the cash it started with
+        self.assertEqual(history[0]['cash'], 49000.0)
+        self.assertEqual(portfolio.snapshots.get(day=market.day_date(4)).value, Decimal('50000.00'))
+
+
+class OrderExecutionTests(TransactionTestCase):
+
+    def test_concurrent_orders_keep_cash_and_shares_consistent(self):
+        market = get_market()
+        user = User.objects.create_user('racer', password='pw')
+        portfolio = get_user_portfolio(user)
+        DemoPortfolio.objects.filter(pk=portfolio.pk).update(balance=Decimal('1000000.00'))
+        start_balance = Decimal('1000000.00')
+
+        orders = [('buy', 'TCS', 1)] * 24 + [('buy', 'ITC', 3)] * 12 + [('sell', 'TCS', 1)] * 16
+        random.Random(3).shuffle(orders)
+        errors = []
+
+        def place(side, symbol, quantity):
+            # Lock conflicts are retried inside execute_order, so none may surface here
+            try:
+                execute_order(user, side, symbol, quantity, snapshot)
+            except OrderError as e:
+                errors.append(str(e))
+            finally:
+                connection.close()
+
+        snapshot = market.snapshot()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(place, *order) for order in orders]
+        for future in futures:
+            future.result()
+
+        portfolio = DemoPortfolio.objects.get(pk=portfolio.pk)
+        ledger = list(PortfolioTransaction.objects.filter(portfolio=portfolio))
+        self.assertEqual(len(ledger) + len(errors), len(orders))
+        self.assertTrue(all(error == 'Insufficient shares' for error in errors), errors)
+
+        # Balance and positions are exactly what the accepted orders imply
+        cash = start_balance
+        shares = {}
+        for trade in ledger:
+            sign = 1 if trade.side == 'buy' else -1
+            cash -= sign * trade.amount
+            shares[trade.symbol] = shares.get(trade.symbol, 0) + sign * trade.quantity
+        self.assertEqual(portfolio.balance, cash)
+        self.assertEqual({s: h['quantity'] for s, h in portfolio.holdings.items()}, {s: q for s, q in shares.items() if q})
+        self.assertEqual(shares['ITC'], 36)
+        self.assertGreaterEqual(shares['TCS'], 8)
+        self.assertAlmostEqual(portfolio.holdings['ITC']['avg_price'], market.price('ITC', snapshot), places=2)
+
+        with self.assertRaises(OrderError):
+            execute_order(user, 'buy', 'LTIM', 10000, snapshot)
+        self.assertEqual(DemoPortfolio.objects.get(pk=portfolio.pk).balance, cash)
+
+    def test_average_price_is_weighted_by_quantity(self):
+        user = User.objects.create_user('averager', password='pw')
+        for price, quantity in [(500, 2), (501, 2), (333.33, 3)]:
+            with mock.patch.object(MarketEngine, 'price', return_value=price):
+                portfolio = execute_order(user, 'buy', 'ITC', quantity)
+        self.assertEqual(portfolio.holdings['ITC'], {'quantity': 7, 'avg_price': 428.8557})
+        self.assertEqual(portfolio.balance, Decimal('46998.01'))
+
+    def test_lock_conflicts_are_retried_and_other_errors_raised(self):
+        user = User.objects.create_user('retrier', password='pw')
+        real_execute = orders._execute
+        calls = []
+
+        def flaky(*args):
+            calls.append(args)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return real_execute(*args)
+
+        with mock.patch.object(orders, '_execute', side_effect=flaky), mock.patch.object(orders.time, 'sleep'):
+            portfolio = execute_order(user, 'buy', 'ITC', 2)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(portfolio.holdings['ITC']['quantity'], 2)
+        self.assertEqual(PortfolioTransaction.objects.filter(portfolio=portfolio).count(), 1)
+
+        with mock.patch.object(orders, '_execute', side_effect=OperationalError('no such table')):
+            with self.assertRaises(OperationalError):
+                execute_order(user, 'buy', 'ITC', 2)
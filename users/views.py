@@ -191,7 +191,6 @@ def save_onboarding(request):
         DemoPortfolio.objects.get_or_create(
             user=request.user,
             defaults={
-                'holdings': {},
                 'total_value': 50000.00
             }
         )
@@ -1,16 +1,23 @@
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wealthplay.settings')
+
+# Set up Django before importing consumers (they import models)
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import chat.routing
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wealthplay.settings')
+from mentor_engine.warmup import WarmupLifespan
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             chat.routing.websocket_urlpatterns
         )
     ),
+    # Preloads the mentors when MENTOR_WARM_ON_STARTUP is set
+    "lifespan": WarmupLifespan(),
 })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -189,3 +190,84 @@ CHANNEL_LAYERS = {
         'BACKEND': 'channels.layers.InMemoryChannelLayer',
     },
 }
+
+# Course catalog: seconds between mtime checks of course_modules/
+COURSE_CATALOG_CHECK_INTERVAL = 2.0
+
+# Course mentor: seconds before the course/Q&A lookup index is rebuilt
+MENTOR_COURSE_INDEX_TTL = 300
+
+# Ollama (mentor LLM): shared client connection pool and model discovery cache
+OLLAMA_MAX_CONNECTIONS = 10
+OLLAMA_TIMEOUT = None  # seconds; None waits for the full generation
+OLLAMA_MODEL_CACHE_TTL = 300
+# How long Ollama keeps the model loaded after a request (e.g. "30m"; a bare number is
+# seconds, "-1" = forever, "0" = unload immediately); avoids reloading the model
+# between sparse questions
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+
+# Course mentor answer cache: reuse LLM answers per (course, module, normalized question).
+# BACKEND is 'memory' (per process) or 'sqlite' (PATH, shared by all workers).
+# SIMILARITY (e.g. 0.92) also reuses answers to semantically similar questions (needs sentence-transformers).
+MENTOR_ANSWER_CACHE = {
+    'ENABLED': True,
+    'BACKEND': 'memory',
+    'PATH': BASE_DIR / 'mentor_answer_cache.sqlite3',
+    'MAX_ENTRIES': 2000,
+    'TTL': 7 * 24 * 3600,
+    'SIMILARITY': None,
+}
+
+# Admission control in front of Ollama: concurrent generations, bounded per-user round-robin
+# queue, and seconds a question may wait before the mentor answers from module content instead.
+MENTOR_LLM_QUEUE = {
+    'MAX_CONCURRENT': 2,
+    'MAX_WAITING': 20,
+    'MAX_WAITING_PER_USER': 3,
+    'WAIT_TIMEOUT': 30.0,
+}
+
+# RAG mentor retrieval backend: 'chroma' (vector_db collection) or 'numpy' (memory-mapped
+# embedding matrix in NUMPY_DIR, DTYPE float32 or int8). Build either with build_mentor_index.
+MENTOR_RETRIEVER = {
+    'BACKEND': 'chroma',
+    'NUMPY_DIR': BASE_DIR / 'vector_db' / 'numpy_index',
+    'DTYPE': None,  # None: whatever the index was built with
+    # Fuse BM25 keyword matches (exact terms like "80C", "CIBIL") with the vector results
+    'HYBRID': True,
+    'BM25_PATH': BASE_DIR / 'vector_db' / 'bm25_index.json',
+    'CANDIDATES': 20,  # results taken from each list before fusion
+    'RRF_K': 60,
+}
+
+# RAG mentor retrieval results, keyed by (index version, normalized question);
+# cleared automatically when build_mentor_index bumps the version.
+MENTOR_RETRIEVAL_CACHE = {
+    'MAX_ENTRIES': 2048,
+}
+
+# RAG mentor: number of recent query embeddings kept in memory (LRU)
+MENTOR_QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# RAG mentor: concurrent query embeddings are encoded together, up to MAX_BATCH texts,
+# holding a batch open at most MAX_WAIT_MS while more queries keep arriving;
+# a question gives up on its embedding after TIMEOUT seconds
+MENTOR_EMBEDDING_BATCH = {
+    'MAX_BATCH': 32,
+    'MAX_WAIT_MS': 5,
+    'TIMEOUT': 60,
+}
+
+# Load the RAG vector DB/embedding model and course index in the background when the ASGI server
+# starts (lifespan startup). Otherwise they load on the first question, or run: python manage.py warm_mentor
+MENTOR_WARM_ON_STARTUP = os.environ.get('MENTOR_WARM_ON_STARTUP', '').lower() in ('1', 'true', 'yes')
+
+# Demo trading market simulation (users/market.py): prices are a deterministic function of
+# SEED and time since EPOCH, so every process serves the same price; they move every TICK_SECONDS.
+# Daily OHLCV bars are stored in HISTORY_DIR (python manage.py build_price_history)
+MARKET_SIMULATION = {
+    'SEED': 42,
+    'TICK_SECONDS': 5,
+    'EPOCH': '2025-01-01',
+    'HISTORY_DIR': BASE_DIR / 'market_data',
+}